@@ -0,0 +1,69 @@
+"""Eager vs compiled (torch.compile) embed/extract on CPU: startup cost, per-call time, agreement.
+
+The first compile in a process also pays for importing inductor; later
+processes reuse the on-disk compile cache, so run twice to see both costs.
+
+    python benchmarks/bench_compiled.py [--repeat 20] [--shapes 1x2048,2x16000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.compiled import kernel_cache
+from cpu.stego_decode import Decode
+from cpu.stego_encode import Encode
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--shapes', default='1x2048,2x16000,2x262144')
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    shapes = [tuple(int(n) for n in shape.split('x')) for shape in args.shapes.split(',')]
+    eager_enc, eager_dec = Encode(device='cpu'), Decode(device='cpu')
+    fused_enc, fused_dec = Encode(device='cpu', compiled=True), Decode(device='cpu', compiled=True)
+
+    print(f"{'op':>12} {'shape':>10} {'compile s':>10} {'eager ms':>9} {'fused ms':>9} {'speedup':>8} {'max diff':>9}")
+    with torch.no_grad():
+        for shape in shapes:
+            cover = torch.round(torch.randn(shape) * 0.1 * 32767) / 32767
+            secret = torch.randn(shape) * 0.3
+            stego = eager_enc.fft_embed(cover, secret)
+            ops = {
+                'lsb_embed': (eager_enc.lsb_embed, fused_enc.lsb_embed, (cover, secret)),
+                'decode_lsb': (eager_dec.decode_lsb, fused_dec.decode_lsb, (stego,)),
+                'fft_embed': (eager_enc.fft_embed, fused_enc.fft_embed, (cover, secret)),
+                'decode_fft': (eager_dec.decode_fft, fused_dec.decode_fft, (stego,)),
+                'echo_hide': (eager_enc.echo_hide, fused_enc.echo_hide, (cover, secret)),
+                'decode_echo': (eager_dec.decode_echo, fused_dec.decode_echo, (stego,)),
+            }
+            for name, (eager, fused, inputs) in ops.items():
+                start = time.perf_counter()
+                result = fused(*inputs)
+                compile_s = time.perf_counter() - start
+                diff = (result - eager(*inputs)).abs().max().item()
+                eager_ms = timed(lambda: eager(*inputs), args.repeat)
+                fused_ms = timed(lambda: fused(*inputs), args.repeat)
+                print(f"{name:>12} {'x'.join(map(str, shape)):>10} {compile_s:>10.2f} {eager_ms:>9.3f} "
+                      f"{fused_ms:>9.3f} {eager_ms / fused_ms:>7.2f}x {diff:>9.2e}")
+
+    cache = kernel_cache()
+    print(f"kernel cache: {len(cache)} entries, {cache.hits} hits, {cache.misses} compiles, "
+          f"{cache.fallbacks} eager fallbacks")
+
+
+if __name__ == '__main__':
+    main()
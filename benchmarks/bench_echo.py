@@ -0,0 +1,65 @@
+"""Shifted-add EchoEngine vs the FFT-convolution echo path it replaced.
+
+    python benchmarks/bench_echo.py [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+import torchaudio
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.echo_engine import EchoEngine
+
+
+def fft_hide(cover, secret, delay=0.1, decay=0.3, sample_rate=16000):
+    delay_samples = int(delay * sample_rate)
+    echo_filter = torch.zeros(delay_samples + 1)
+    echo_filter[0] = 1
+    echo_filter[-1] = decay
+    secret_echo = torchaudio.functional.fftconvolve(secret, echo_filter)
+    padded_secret = torch.nn.functional.pad(secret_echo, (0, cover.shape[-1] - secret_echo.shape[-1]))
+    return cover + padded_secret * 0.1
+
+
+def fft_extract(stego, delay=0.1, decay=0.3, sample_rate=16000):
+    delay_samples = int(delay * sample_rate)
+    echo_kernel = torch.zeros(delay_samples + 1)
+    echo_kernel[0] = 1.0
+    echo_kernel[-1] = -decay
+    return torchaudio.functional.fftconvolve(stego, echo_kernel, mode='same') / (1 + decay)
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    engine = EchoEngine(device='cpu')
+    print(f"{'samples':>10} {'fft hide':>10} {'add hide':>10} {'fft extr':>10} {'add extr':>10}  max err")
+    for samples in (2048, 16000, 160000, 1600000):
+        cover, secret = torch.randn(samples), torch.randn(samples)
+        stego = fft_hide(cover, secret)
+        err = max(
+            (engine.hide(cover, secret) - stego).abs().max().item(),
+            (engine.extract(stego) - fft_extract(stego)).abs().max().item(),
+        )
+        print(f"{samples:>10} "
+              f"{timed(lambda: fft_hide(cover, secret), args.repeat):>8.3f}ms "
+              f"{timed(lambda: engine.hide(cover, secret), args.repeat):>8.3f}ms "
+              f"{timed(lambda: fft_extract(stego), args.repeat):>8.3f}ms "
+              f"{timed(lambda: engine.extract(stego), args.repeat):>8.3f}ms  {err:.1e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Lock time, BER and per-chunk cost of the sync-marked lsb receiver joining mid-stream.
+
+    python benchmarks/bench_frame_sync.py [--seconds 30] [--channels 2] [--flips 0,2,20]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.frame_sync import FrameSync, SyncedPayload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=30.0)
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--chunk-frames', type=int, default=2048)
+    parser.add_argument('--payload-bytes', type=int, default=512)
+    parser.add_argument('--flips', default='0,2,20', help="random low-bit flips per second")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    sample_rate, num_bits = 16000, 2
+    data = rng.integers(0, 256, args.payload_bytes, dtype=np.uint8).tobytes()
+    samples = int(args.seconds * sample_rate) * args.channels
+    symbols = SyncedPayload(data, num_bits).take(samples)
+    chunk = args.chunk_frames * args.channels
+
+    for flips in (int(f) for f in args.flips.split(',')):
+        received = symbols.copy()
+        where = rng.integers(0, samples, int(flips * args.seconds))
+        received[where] ^= 1
+        # Join at a random point, as a receiver tuning in late would
+        join = int(rng.integers(0, samples // 4)) // args.channels * args.channels
+        sync = FrameSync(num_bits, channels=args.channels, reference=data)
+        start = time.perf_counter()
+        for offset in range(join, samples, chunk):
+            began = time.perf_counter()
+            sync.push(received[offset:offset + chunk])
+            sync.stats.chunk_times.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - start
+        stream_seconds = (samples - join) / args.channels / sample_rate
+        print(f"{flips:>5} flips/s: {sync.stats.summary(sample_rate)}; "
+              f"{stream_seconds / elapsed:.0f}x real time")
+
+
+if __name__ == '__main__':
+    main()
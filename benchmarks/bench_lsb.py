@@ -0,0 +1,53 @@
+"""In-place int16 LSBEngine vs the float lsb_embed/decode_lsb round trip.
+
+    python benchmarks/bench_lsb.py [--repeat 50] [--num-bits 2]
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.lsb_engine import LSBEngine
+from cpu.stego_decode import Decode
+from cpu.stego_encode import Encode
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--num-bits', type=int, default=2)
+    args = parser.parse_args()
+
+    encoder, decoder = Encode(device='cpu'), Decode(device='cpu')
+    print(f"{'samples':>10} {'float emb':>10} {'int emb':>10} {'float ext':>10} {'int ext':>10}"
+          f"  int Msamples/s  lossless")
+    for samples in (2048, 16000, 160000, 1600000):
+        engine = LSBEngine(args.num_bits, max_samples=samples)
+        pcm = (torch.randn(samples) * 3000).short()
+        cover, secret = pcm.float() / 32767.0, torch.rand(samples)
+        payload = torch.randint(0, 256, (engine.capacity_bytes(samples),), dtype=torch.uint8)
+
+        engine.embed_bytes_(pcm, payload)
+        lossless = torch.equal(engine.extract_bytes(pcm), payload)
+        int_embed = timed(lambda: engine.embed_bytes_(pcm, payload), args.repeat)
+        print(f"{samples:>10} "
+              f"{timed(lambda: encoder.lsb_embed(cover, secret, args.num_bits), args.repeat):>8.3f}ms "
+              f"{int_embed:>8.3f}ms "
+              f"{timed(lambda: decoder.decode_lsb(cover, args.num_bits), args.repeat):>8.3f}ms "
+              f"{timed(lambda: engine.extract_bytes(pcm), args.repeat):>8.3f}ms "
+              f"{samples / int_embed / 1e3:>14.1f}  {lossless}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Embed + extract cost per audio-second as the channel count grows, batched vs one channel at a time.
+
+Every method runs once over the whole (channels, samples) tensor; the
+per-channel loop is what callers had to write before secrets of any
+channel count were accepted. The payload column is how many seconds of
+mono secret each second of cover carries with --spread-channels. Expect
+the batched cost to grow linearly with channels and the speedup to stay
+near 1x on CPU: spreading buys capacity, not throughput.
+
+    python benchmarks/bench_multichannel.py [--seconds 4] [--channels 1,2,4,8] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.multichannel import gather, spread
+from cpu.stego_decode import Decode
+from cpu.stego_encode import Encode
+
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=4.0)
+    parser.add_argument('--channels', default='1,2,4,8')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sample-rate', type=int, default=16000)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    encoder, decoder = Encode(device='cpu'), Decode(device='cpu')
+    embed = {'lsb': encoder.lsb_embed, 'fft': encoder.fft_embed, 'echo': encoder.echo_hide}
+    extract = {'lsb': decoder.decode_lsb, 'fft': decoder.decode_fft, 'echo': decoder.decode_echo}
+    samples = int(args.seconds * args.sample_rate)
+
+    print(f"{'method':>6} {'ch':>3} {'batched ms/s':>13} {'per ch':>8} {'looped ms/s':>12} {'speedup':>8} "
+          f"{'payload s/s':>12}")
+    with torch.no_grad():
+        for method in ('lsb', 'fft', 'echo'):
+            for channels in (int(c) for c in args.channels.split(',')):
+                cover = torch.randn(channels, samples) * 0.1
+                secret = spread(torch.randn(1, samples * channels) * 0.3, channels, frames=samples)
+
+                def batched():
+                    extract[method](embed[method](cover, secret))
+
+                def looped():
+                    for c in range(channels):
+                        extract[method](embed[method](cover[c:c + 1], secret[c:c + 1]))
+
+                fast = timed(batched, args.repeat) / args.seconds * 1e3
+                slow = timed(looped, args.repeat) / args.seconds * 1e3
+                carried = gather(secret, samples * channels).shape[-1] / samples
+                print(f"{method:>6} {channels:>3} {fast:>13.2f} {fast / channels:>8.2f} {slow:>12.2f} "
+                      f"{slow / fast:>7.2f}x {carried:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""End-to-end latency of the capture -> embed -> playback pipeline without audio hardware.
+
+A FileSource paced at real time stands in for the microphone and a NullSink
+for the speaker, so the run is deterministic apart from scheduling noise.
+Latency is arrival to playback (see RealTimePipeline): it includes the
+capture block itself, so the chunk size bounds it from below, and fft's
+frame_size - hop_length samples of lookahead.
+
+    python benchmarks/bench_pipeline.py [--seconds 5] [--chunk 256] [--target-ms 50]
+"""
+import argparse
+import os
+import sys
+
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.audio_io import FileSource, NullSink
+from cpu.echo_engine import EchoEngine
+from cpu.pipeline import RealTimePipeline
+from cpu.stego_encode import Encode
+from cpu.stego_stream import StreamingFFTEmbedder
+
+
+def build(method, encoder, payload, sample_rate):
+    if method == 'lsb':
+        return lambda cover: encoder.lsb_embed(cover, payload.take_samples(cover.shape[-1])), None, 0
+    if method == 'fft':
+        stream = StreamingFFTEmbedder(encoder.frame_size, encoder.hop_length, device='cpu')
+        return lambda cover: stream.push(cover, payload), stream.flush, stream.lookahead
+    echo = EchoEngine(sample_rate=sample_rate, device='cpu')
+    return lambda cover: echo.hide_chunk(cover, payload.take_samples(cover.shape[-1])), None, 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--chunk', type=int, default=256)
+    parser.add_argument('--sample-rate', type=int, default=16000)
+    parser.add_argument('--target-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    samples = int(args.seconds * args.sample_rate)
+    cover = torch.randn(1, samples) * 0.1
+    secret = torch.randn(1, samples) * 0.1
+    encoder = Encode(device='cpu')
+
+    failed = False
+    print(f"block {args.chunk / args.sample_rate * 1e3:.0f} ms; latency from arrival to playback")
+    print(f"{'method':>6} {'p50':>8} {'p99':>8} {'max':>8} {'lookahead':>10} "
+          f"{'over':>5} {'dropped':>8} {'under':>6} {'depth':>6}")
+    for method in ('lsb', 'fft', 'echo'):
+        process, finish, delay = build(method, encoder, encoder.secret_payload(secret), args.sample_rate)
+        source = FileSource(cover, args.chunk, args.sample_rate, realtime=True)
+        pipeline = RealTimePipeline(
+            source, process, NullSink(), chunk_frames=args.chunk, sample_rate=args.sample_rate,
+            finish=finish, algorithmic_delay=delay
+        )
+        stats = pipeline.run()
+        p99 = stats.percentile_ms(0.99)
+        # Lost output is a failure however fast the rest was
+        missed = p99 > args.target_ms or stats.dropped_frames > 0
+        failed |= missed
+        print(f"{method:>6} {stats.percentile_ms(0.5):>6.2f}ms {p99:>6.2f}ms {stats.percentile_ms(1.0):>6.2f}ms "
+              f"{delay / args.sample_rate * 1e3:>8.1f}ms {stats.overruns:>5} {stats.dropped_frames:>8} "
+              f"{stats.underruns:>6} {stats.max_capture_depth // args.chunk:>6}{'  MISSED' if missed else ''}")
+
+    print(f"pipeline {'misses' if failed else 'meets'} the {args.target_ms:.0f} ms p99 target")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Per-method deadline misses, jitter and processing time of the real-time path, no sound card needed.
+
+By default chunks are replayed on a simulated clock, which is as fast as
+the CPU allows; --realtime paces them on the wall clock instead.
+
+    python benchmarks/bench_replay.py [--seconds 10] [--chunk 2048] [--realtime] [--max-misses 0]
+"""
+import argparse
+import os
+import sys
+
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.replay import replay_method
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--chunk', type=int, default=2048)
+    parser.add_argument('--sample-rate', type=int, default=16000)
+    parser.add_argument('--channels', type=int, default=1)
+    parser.add_argument('--methods', default='lsb,fft,echo')
+    parser.add_argument('--realtime', action='store_true')
+    parser.add_argument('--max-misses', type=int, default=0,
+                        help="exit non-zero if any method misses more deadlines than this")
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    samples = int(args.seconds * args.sample_rate)
+    cover = torch.randn(args.channels, samples) * 0.1
+    secret = torch.randn(args.channels, samples) * 0.1
+
+    failed = False
+    for method in args.methods.split(','):
+        stats = replay_method(method, cover, secret, args.sample_rate, args.chunk, realtime=args.realtime)
+        failed |= stats.deadline_misses > args.max_misses
+        print(stats.summary())
+        print("  jitter ms: " + "  ".join(f"{label}:{count}" for label, count in stats.jitter_histogram()))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
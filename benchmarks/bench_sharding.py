@@ -0,0 +1,74 @@
+"""Sharded file encode/decode across a process pool vs the chunked single-process path.
+
+Reports wall time per worker count and the largest difference from one
+Encode/Decode call over the whole signal, in 16-bit LSBs.
+
+    python benchmarks/bench_sharding.py [--seconds 600] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.audio_io import AudioChunkReader, float_to_pcm16
+from cpu.echo_engine import EchoEngine
+from cpu.sharding import sharded_encode_file
+from cpu.stego_encode import Encode
+from cpu.stego_file import encode_file
+from cpu.wav_mmap import MappedWav
+
+SAMPLE_RATE = 16000
+
+
+def write_wav(path, audio):
+    with MappedWav.create(path, SAMPLE_RATE, audio.shape[0], audio.shape[-1]) as wav:
+        wav.tensor.copy_(float_to_pcm16(audio))
+
+
+def load(path):
+    with AudioChunkReader(path) as reader:
+        return torch.cat(list(reader), dim=-1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=int, default=600)
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4, 8])
+    parser.add_argument('--methods', nargs='+', default=['fft', 'echo'])
+    args = parser.parse_args()
+
+    frames = args.seconds * SAMPLE_RATE
+    with tempfile.TemporaryDirectory() as scratch:
+        cover_path, secret_path = os.path.join(scratch, 'cover.wav'), os.path.join(scratch, 'secret.wav')
+        output_path = os.path.join(scratch, 'stego.wav')
+        write_wav(cover_path, 0.2 * torch.randn(2, frames))
+        write_wav(secret_path, 0.2 * torch.randn(2, frames))
+        cover, secret = load(cover_path), load(secret_path)
+        reference = {
+            'fft': lambda: Encode(device='cpu').fft_embed(cover, secret),
+            'echo': lambda: EchoEngine(device='cpu').hide(cover, secret),
+        }
+
+        for method in args.methods:
+            single_pass = float_to_pcm16(reference[method]())
+            start = time.perf_counter()
+            encode_file(cover_path, secret_path, output_path, method)
+            chunked = time.perf_counter() - start
+            chunked_err = (float_to_pcm16(load(output_path)) - single_pass).abs().max().item()
+            print(f"{method}: chunked single process {chunked:6.2f} s, max err {chunked_err} LSB")
+
+            for workers in args.workers:
+                start = time.perf_counter()
+                sharded_encode_file(cover_path, secret_path, output_path, method, workers=workers)
+                elapsed = time.perf_counter() - start
+                err = (float_to_pcm16(load(output_path)) - single_pass).abs().max().item()
+                print(f"{method}: {workers:>2} workers {elapsed:6.2f} s"
+                      f" ({chunked / elapsed:4.2f}x chunked), max err {err} LSB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Cold-start wall time and peak RSS of a short stegano-cli job per backend.
+
+Each run is a fresh interpreter, so the numbers include every import the
+backend pulls in.
+
+    python benchmarks/bench_startup.py [--seconds 10] [--repeat 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, '..', 'src'))
+from cpu.wav_mmap import MappedWav
+
+CLI = os.path.join(HERE, '..', 'src', 'main.py')
+# Runs one CLI job in a child and reports that child's peak RSS
+PROBE = """
+import resource, subprocess, sys
+subprocess.run(sys.argv[1:], check=True, capture_output=True)
+print(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+"""
+
+
+def write_wav(path, frames, seed):
+    rng = np.random.default_rng(seed)
+    with MappedWav.create(path, 16000, 1, frames) as wav:
+        wav.array[:] = rng.integers(-6000, 6000, (frames, 1), dtype=np.int16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        cover, secret = os.path.join(scratch, 'cover.wav'), os.path.join(scratch, 'secret.wav')
+        write_wav(cover, args.seconds * 16000, 0)
+        write_wav(secret, args.seconds * 16000, 1)
+        print(f"{'backend':<8} {'method':<6} {'best wall':>10} {'peak RSS':>10}")
+        for backend in ('torch', 'numpy'):
+            for method in ('lsb', 'fft', 'echo'):
+                command = [sys.executable, CLI, 'encode', cover, secret, os.path.join(scratch, 'stego.wav'),
+                           '--method', method, '--backend', backend, '--device', 'cpu']
+                best, rss = float('inf'), 0
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    probe = subprocess.run([sys.executable, '-c', PROBE, *command],
+                                           check=True, capture_output=True, text=True)
+                    best = min(best, time.perf_counter() - start)
+                    rss = max(rss, int(probe.stdout.split()[-1]))
+                print(f"{backend:<8} {method:<6} {best:>9.2f}s {rss / 1024:>8.0f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+"""Benchmark suite for the README performance table.
+
+Sweeps frame size, chunk size, channel count and device over every Encode
+and Decode method, and records per-chunk latency percentiles, throughput,
+stego SNR and recovered-payload accuracy as JSON. The results are compared
+against a stored baseline and regressions are flagged with a non-zero exit.
+
+    python benchmarks/bench_suite.py                    # run and compare
+    python benchmarks/bench_suite.py --update-baseline  # accept current numbers
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.metrics import payload_accuracy, snr_db
+from cpu.stego_decode import Decode
+from cpu.stego_encode import Encode
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_RATE = 16000
+METHODS = ('lsb', 'fft', 'echo')
+
+# README targets: embed time per chunk and stego quality
+TARGET_EMBED_MS = 10.0
+TARGET_SNR_DB = 30.0
+
+
+def make_signals(channels, samples, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    t = torch.arange(samples) / SAMPLE_RATE
+    tones = sum(a * torch.sin(2 * math.pi * f * t) for a, f in ((0.2, 220), (0.1, 660), (0.05, 1870)))
+    cover = tones + 0.02 * torch.randn(channels, samples, generator=generator)
+    secret = 0.3 * torch.randn(channels, samples, generator=generator)
+    # Quantize the cover to 16-bit PCM, as it would be when read from a file
+    return torch.round(cover * 32767) / 32767, secret
+
+
+def sync(device):
+    if device.startswith('cuda'):
+        torch.cuda.synchronize()
+
+
+def time_op(fn, device, repeat):
+    fn()
+    sync(device)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        sync(device)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    stats = {f"p{q}_ms": times[min(len(times) - 1, len(times) * q // 100)] * 1e3 for q in (50, 95, 99)}
+    stats['min_ms'] = times[0] * 1e3
+    return stats
+
+
+def run_suite(devices, frame_sizes, chunk_sizes, channel_counts, repeat):
+    results = {}
+    for device in devices:
+        for frame_size in frame_sizes:
+            encoder = Encode(device=device, frame_size=frame_size)
+            decoder = Decode(device=device, frame_size=frame_size)
+            embed = {'lsb': encoder.lsb_embed, 'fft': encoder.fft_embed, 'echo': encoder.echo_hide}
+            extract = {
+                'lsb': decoder.decode_lsb, 'fft': decoder.decode_fft,
+                'echo': decoder.decode_echo, 'adaptive': decoder.decode_adaptive,
+            }
+
+            for channels in channel_counts:
+                cover, secret = make_signals(channels, 2 * SAMPLE_RATE)
+                cover, secret = cover.to(device), secret.to(device)
+
+                for method in METHODS:
+                    stego = embed[method](cover, secret)
+                    results[f"{device}/fs{frame_size}/ch{channels}/{method}/quality"] = {
+                        'snr_db': snr_db(cover, stego),
+                        'payload_accuracy': payload_accuracy(secret, extract[method](stego)),
+                    }
+
+                for chunk in chunk_sizes:
+                    if chunk <= frame_size // 2:
+                        # Centre-padded STFT needs more than frame_size // 2 samples
+                        print(f"skipping chunk {chunk} with frame size {frame_size}")
+                        continue
+                    cover_chunk, secret_chunk = cover[:, :chunk], secret[:, :chunk]
+                    ops = {f"embed_{m}": (lambda m=m: embed[m](cover_chunk, secret_chunk)) for m in METHODS}
+                    stego_chunk = encoder.fft_embed(cover_chunk, secret_chunk)
+                    ops.update({f"decode_{m}": (lambda m=m: extract[m](stego_chunk)) for m in extract})
+
+                    for name, fn in ops.items():
+                        stats = time_op(fn, device, repeat)
+                        stats['samples_per_s'] = chunk * channels / (stats['p50_ms'] / 1e3)
+                        results[f"{device}/fs{frame_size}/ch{channels}/chunk{chunk}/{name}"] = stats
+                        print(f"{device:>5} fs{frame_size:<5} ch{channels} chunk{chunk:<6} {name:<16}"
+                              f" p50 {stats['p50_ms']:7.3f} ms  p99 {stats['p99_ms']:7.3f} ms"
+                              f"  {stats['samples_per_s']:.3e} samples/s")
+    return results
+
+
+def compare(results, baseline, latency_tolerance, snr_tolerance, accuracy_tolerance, latency_floor_ms=0.1):
+    regressions = []
+    for key, base in baseline.items():
+        current = results.get(key)
+        if current is None:
+            continue
+        # Best-of-N is far less sensitive to scheduler noise than the median;
+        # sub-floor differences on tiny ops are timer noise
+        if 'min_ms' in base:
+            limit = max(base['min_ms'] * (1 + latency_tolerance), base['min_ms'] + latency_floor_ms)
+            if current['min_ms'] > limit:
+                regressions.append(f"{key}: best {current['min_ms']:.3f} ms vs baseline {base['min_ms']:.3f} ms")
+        if 'snr_db' in base and current['snr_db'] < base['snr_db'] - snr_tolerance:
+            regressions.append(f"{key}: SNR {current['snr_db']:.2f} dB vs baseline {base['snr_db']:.2f} dB")
+        if 'payload_accuracy' in base and \
+                current['payload_accuracy'] < base['payload_accuracy'] - accuracy_tolerance:
+            regressions.append(f"{key}: accuracy {current['payload_accuracy']:.3f}"
+                               f" vs baseline {base['payload_accuracy']:.3f}")
+    return regressions
+
+
+def readme_report(results):
+    print("\nREADME targets")
+    for key, value in sorted(results.items()):
+        if key.endswith('/quality'):
+            verdict = 'ok' if value['snr_db'] > TARGET_SNR_DB else 'below target'
+            print(f"  {key:<34} SNR {value['snr_db']:7.2f} dB ({verdict})"
+                  f"  payload accuracy {value['payload_accuracy']:.3f}")
+        elif '/chunk2048/embed_' in key:
+            verdict = 'ok' if value['p50_ms'] < TARGET_EMBED_MS else 'above target'
+            print(f"  {key:<34} {value['p50_ms']:7.3f} ms per chunk ({verdict})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--devices', nargs='+', default=['cpu'] + (['cuda'] if torch.cuda.is_available() else []))
+    parser.add_argument('--frame-sizes', nargs='+', type=int, default=[1024, 2048])
+    parser.add_argument('--chunk-sizes', nargs='+', type=int, default=[2048, 8192, 32768])
+    parser.add_argument('--channels', nargs='+', type=int, default=[1, 2])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--output', default=os.path.join(HERE, 'results.json'))
+    parser.add_argument('--baseline', default=os.path.join(HERE, 'baseline.json'))
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--latency-tolerance', type=float, default=0.5,
+                        help="allowed relative best-of-N slowdown before flagging")
+    parser.add_argument('--snr-tolerance', type=float, default=1.0, help="allowed SNR drop in dB")
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.02)
+    args = parser.parse_args()
+
+    results = run_suite(args.devices, args.frame_sizes, args.chunk_sizes, args.channels, args.repeat)
+    report = {
+        'meta': {
+            'torch': torch.__version__,
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'threads': torch.get_num_threads(),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    readme_report(results)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nBaseline updated: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(results, baseline, args.latency_tolerance, args.snr_tolerance, args.accuracy_tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
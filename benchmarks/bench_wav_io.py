@@ -0,0 +1,66 @@
+"""Throughput and resident memory of encode_file on a large memory-mapped WAV.
+
+Writes a synthetic 16-bit stereo WAV of --size-mb, embeds into it and reports
+disk throughput and peak RSS. Peak RSS should track the chunk size, not
+the file size.
+
+    python benchmarks/bench_wav_io.py [--size-mb 2048] [--method lsb] [--dir /tmp]
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.stego_file import decode_file, encode_file
+from cpu.wav_mmap import MappedWav
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_wav(path, frames, channels=2, sample_rate=16000, block=1 << 20):
+    rng = np.random.default_rng(0)
+    with MappedWav.create(path, sample_rate, channels, frames) as wav:
+        for start in range(0, frames, block):
+            stop = min(frames, start + block)
+            wav.array[start:stop] = rng.integers(-8000, 8000, (stop - start, channels), dtype=np.int16)
+            wav.flush(start, stop)
+            wav.release(start, stop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=2048)
+    parser.add_argument('--method', default='lsb', choices=['lsb', 'fft', 'echo'])
+    parser.add_argument('--dir', default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    frames = args.size_mb * (1 << 20) // 4
+    cover, secret = os.path.join(args.dir, 'bench_cover.wav'), os.path.join(args.dir, 'bench_secret.wav')
+    stego, recovered = os.path.join(args.dir, 'bench_stego.wav'), os.path.join(args.dir, 'bench_recovered.wav')
+    try:
+        make_wav(cover, frames)
+        make_wav(secret, frames // 4, channels=1)
+        print(f"{args.size_mb} MB cover, peak RSS after setup {peak_rss_mb():.0f} MB")
+
+        for name, run in (('encode', lambda: encode_file(cover, secret, stego, args.method)),
+                          ('decode', lambda: decode_file(stego, recovered, args.method))):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            print(f"{name} {args.method}: {elapsed:6.2f} s, {2 * args.size_mb / elapsed:7.1f} MB/s read+write,"
+                  f" peak RSS {peak_rss_mb():.0f} MB")
+    finally:
+        for path in (cover, secret, stego, recovered):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
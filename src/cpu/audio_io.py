@@ -0,0 +1,291 @@
+import struct
+import sys
+import time
+from typing import Iterator, Optional
+
+import torch
+import torchaudio
+
+from cpu.wav_mmap import PCM16_SCALE, MappedWav
+
+
+def pcm16_to_float(pcm: torch.Tensor) -> torch.Tensor:
+    return pcm.float() / PCM16_SCALE
+
+
+def float_to_pcm16(audio: torch.Tensor) -> torch.Tensor:
+    return torch.round(audio * PCM16_SCALE).clamp_(-32768, 32767).short()
+
+
+class AudioChunkReader:
+    """Reads an audio file as fixed-size (channels, frames) float chunks.
+
+    Uncompressed WAVs are memory-mapped and each chunk is converted straight
+    from the mapped pages, which are released once read; other formats are
+    decoded by torchaudio.
+    """
+
+    def __init__(self, path: str, chunk_frames: int = 1 << 18):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.offset = 0
+        self._mapped: Optional[MappedWav] = None
+
+        if path.lower().endswith('.wav'):
+            try:
+                self._mapped = MappedWav(path)
+            except (ValueError, OSError, struct.error):
+                # Compressed or unusual WAVs fall back to torchaudio
+                self._mapped = None
+
+        if self._mapped is not None:
+            self.sample_rate = self._mapped.sample_rate
+            self.num_channels = self._mapped.num_channels
+            self.num_frames = self._mapped.num_frames
+        else:
+            info = torchaudio.info(path)
+            self.sample_rate = info.sample_rate
+            self.num_channels = info.num_channels
+            self.num_frames = info.num_frames
+
+    @property
+    def num_chunks(self) -> int:
+        return -(-self.num_frames // self.chunk_frames)
+
+    def read(self, num_frames: Optional[int] = None) -> Optional[torch.Tensor]:
+        num_frames = num_frames or self.chunk_frames
+        num_frames = min(num_frames, self.num_frames - self.offset)
+        if num_frames <= 0:
+            return None
+
+        if self._mapped is not None:
+            start, stop = self.offset, self.offset + num_frames
+            pcm = self._mapped.frames(start, stop)
+            if pcm.dtype == torch.int16:
+                chunk = pcm16_to_float(pcm)
+            else:
+                chunk = pcm.clone(memory_format=torch.contiguous_format)
+            self._mapped.release(start, stop)
+        else:
+            chunk, _ = torchaudio.load(self.path, frame_offset=self.offset, num_frames=num_frames)
+
+        self.offset += chunk.shape[-1]
+        return chunk
+
+    def read_pcm(self, num_frames: Optional[int] = None) -> Optional[torch.Tensor]:
+        """Next chunk as (frames, channels) int16, copied straight from the mapping for 16-bit WAVs"""
+        if self._mapped is None or self._mapped.array.dtype.itemsize != 2:
+            chunk = self.read(num_frames)
+            return None if chunk is None else float_to_pcm16(chunk).t().contiguous()
+        num_frames = min(num_frames or self.chunk_frames, self.num_frames - self.offset)
+        if num_frames <= 0:
+            return None
+        start, stop = self.offset, self.offset + num_frames
+        pcm = self._mapped.frames(start, stop).t().clone()
+        self._mapped.release(start, stop)
+        self.offset = stop
+        return pcm
+
+    def __iter__(self) -> Iterator[torch.Tensor]:
+        while True:
+            chunk = self.read()
+            if chunk is None:
+                return
+            yield chunk
+
+    def close(self):
+        if self._mapped is not None:
+            self._mapped.close()
+            self._mapped = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MappedWavWriter:
+    """Writes (channels, frames) float chunks into a preallocated, memory-mapped 16-bit WAV.
+
+    Each chunk is quantized straight into the mapped output pages, which
+    are unmapped behind the write cursor and left to kernel writeback. If fewer than
+    num_frames frames arrive, close() truncates the file to what was written,
+    so write to a cpu.instrument.atomic_output path to keep a failed run's
+    short file from standing in for a finished one.
+    """
+
+    def __init__(self, path: str, sample_rate: int, num_channels: int, num_frames: int):
+        self.path = path
+        self.num_frames = num_frames
+        self.offset = 0
+        self._mapped: Optional[MappedWav] = MappedWav.create(path, sample_rate, num_channels, num_frames)
+
+    def write(self, chunk: torch.Tensor):
+        self.write_pcm(float_to_pcm16(chunk.detach()))
+
+    def write_pcm(self, pcm: torch.Tensor):
+        """Write a (channels, frames) int16 chunk as is"""
+        start, stop = self.offset, self.offset + pcm.shape[-1]
+        if stop > self.num_frames:
+            raise ValueError(f"{self.path} was sized for {self.num_frames} frames, got {stop}")
+        self._mapped.frames(start, stop).copy_(pcm)
+        # Dropping the mapping keeps the dirty pages in the page cache for writeback
+        self._mapped.release(start, stop)
+        self.offset = stop
+
+    def close(self):
+        if self._mapped is None:
+            return
+        self._mapped.close()
+        if self.offset < self.num_frames:
+            self._mapped.resize(self.offset)
+        self._mapped = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class WallClock:
+    """Real time: sleep_until() blocks and time advances on its own"""
+
+    def now(self) -> float:
+        return time.perf_counter()
+
+    def sleep_until(self, deadline: float):
+        delay = deadline - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def advance(self, seconds: float):
+        pass
+
+
+class SimulatedClock:
+    """Virtual time that only moves when told to.
+
+    sleep_until() jumps straight to the deadline and advance() adds measured
+    work, so a replay runs as fast as the CPU allows while every chunk still
+    sees the schedule a real device would impose.
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.time = start
+
+    def now(self) -> float:
+        return self.time
+
+    def sleep_until(self, deadline: float):
+        self.time = max(self.time, deadline)
+
+    def advance(self, seconds: float):
+        self.time += seconds
+
+
+class FileSource:
+    """Yields (channels, frames) chunks from a file or tensor in place of a capture device.
+
+    With realtime=True each chunk is released at the time a device would
+    deliver it on clock: real capture pacing on the default WallClock, or
+    back to back on a SimulatedClock.
+    """
+
+    def __init__(self, audio, chunk_frames: int = 2048, sample_rate: Optional[int] = None,
+                 realtime: bool = True, clock=None):
+        if isinstance(audio, str):
+            with AudioChunkReader(audio) as reader:
+                self.audio = torch.cat(list(reader), dim=-1)
+                sample_rate = sample_rate or reader.sample_rate
+        else:
+            self.audio = audio if audio.dim() == 2 else audio.unsqueeze(0)
+        self.sample_rate = sample_rate or 16000
+        self.chunk_frames = chunk_frames
+        self.realtime = realtime
+        self.clock = clock or WallClock()
+
+    @property
+    def num_channels(self) -> int:
+        return self.audio.shape[0]
+
+    def __iter__(self) -> Iterator[torch.Tensor]:
+        period = self.chunk_frames / self.sample_rate
+        start = self.clock.now()
+        for index, offset in enumerate(range(0, self.audio.shape[-1], self.chunk_frames), start=1):
+            if self.realtime:
+                self.clock.sleep_until(start + index * period)
+            yield self.audio[:, offset:offset + self.chunk_frames]
+
+
+class StreamReaderSource:
+    """Adapts a torchaudio StreamReader (frames, channels) to (channels, frames) chunks"""
+
+    def __init__(self, stream, sample_rate: int = 16000, chunk_frames: int = 2048):
+        self.stream = stream
+        self.sample_rate = sample_rate
+        self.chunk_frames = chunk_frames
+
+    def __iter__(self) -> Iterator[torch.Tensor]:
+        for chunk in self.stream.stream():
+            if chunk is None or len(chunk) == 0 or chunk[0] is None:
+                continue
+            yield chunk[0].t()
+
+
+def open_capture_source(sample_rate: int = 16000, chunk_frames: int = 2048, src: str = ":0",
+                        format: Optional[str] = None) -> StreamReaderSource:
+    """The default input device (alsa on Linux, avfoundation on macOS) as a source"""
+    stream = torchaudio.io.StreamReader(
+        src=src,
+        format=format or ("alsa" if 'linux' in sys.platform else "avfoundation")
+    )
+    stream.add_basic_audio_stream(
+        frames_per_chunk=chunk_frames,
+        buffer_chunk_size=4,
+        sample_rate=sample_rate
+    )
+    return StreamReaderSource(stream, sample_rate, chunk_frames)
+
+
+class NullSink:
+    """Discards output, counting what it was given"""
+
+    def __init__(self):
+        self.frames = 0
+        self.chunks = 0
+
+    def write(self, chunk: torch.Tensor):
+        self.frames += chunk.shape[-1]
+        self.chunks += 1
+
+    def close(self):
+        pass
+
+
+class CaptureSink:
+    """Keeps every chunk it is given; audio() joins them into one (channels, frames) tensor"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, chunk: torch.Tensor):
+        self.chunks.append(chunk.detach().cpu().clone())
+
+    def audio(self) -> torch.Tensor:
+        return torch.cat(self.chunks, dim=-1) if self.chunks else torch.empty(0, 0)
+
+    def close(self):
+        pass
+
+
+class PlaybackSink:
+    def __init__(self, sample_rate: int = 16000):
+        self.sample_rate = sample_rate
+
+    def write(self, chunk: torch.Tensor):
+        torchaudio.io.play_audio(chunk.t(), self.sample_rate)
+
+    def close(self):
+        pass
@@ -0,0 +1,44 @@
+import importlib
+from types import SimpleNamespace
+
+# backend -> (module, attribute) for each entry point; nothing is imported until a backend is loaded
+BACKENDS = {
+    'torch': {
+        'Encode': ('cpu.stego_encode', 'Encode'),
+        'Decode': ('cpu.stego_decode', 'Decode'),
+        'encode_file': ('cpu.stego_file', 'encode_file'),
+        'decode_file': ('cpu.stego_file', 'decode_file'),
+    },
+    'numpy': {
+        'Encode': ('cpu.stego_numpy', 'NumpyEncode'),
+        'Decode': ('cpu.stego_numpy', 'NumpyDecode'),
+        'encode_file': ('cpu.stego_numpy', 'encode_file'),
+        'decode_file': ('cpu.stego_numpy', 'decode_file'),
+    },
+}
+
+_loaded = {}
+
+
+def load_backend(name: str = 'torch') -> SimpleNamespace:
+    """Encode, Decode, encode_file and decode_file of one backend.
+
+    Importing this module is free. Heavy dependencies load only here: the
+    torch backend pulls in torch and torchaudio, the numpy backend only
+    NumPy. Both take the same arguments and return arrays of the same shape.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend: {name}; expected one of {sorted(BACKENDS)}")
+    if name not in _loaded:
+        _loaded[name] = SimpleNamespace(name=name, **{
+            key: getattr(importlib.import_module(module), attr)
+            for key, (module, attr) in BACKENDS[name].items()
+        })
+    return _loaded[name]
+
+
+def default_device(backend: str = 'torch') -> str:
+    if backend != 'torch':
+        return 'cpu'
+    import torch
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
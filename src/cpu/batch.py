@@ -0,0 +1,242 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import torch
+
+from cpu.instrument import DEFAULT_CHUNK_FRAMES
+from cpu.stego_decode import Decode
+from cpu.stego_encode import Encode
+from cpu.stego_file import decode_file, encode_file
+from cpu.wav_mmap import read_wav_info
+from gpu.config import GPUConfig
+
+# Manifest params any job may set, on top of its method's GPUConfig.ALGORITHM_PARAMS; anything else is rejected
+JOB_PARAMS = ('frame_size', 'chunk_frames')
+
+
+@dataclass
+class Job:
+    """One manifest entry: input is the cover for encode jobs and the stego file for decode jobs"""
+    input: str
+    output: str
+    secret: Optional[str] = None
+    method: str = 'fft'
+    mode: str = 'encode'
+    params: Dict[str, float] = field(default_factory=dict)
+    id: str = ''
+
+    def __post_init__(self):
+        if self.mode not in ('encode', 'decode'):
+            raise ValueError(f"Unknown mode: {self.mode}")
+        if self.method not in ('lsb', 'fft', 'echo'):
+            raise ValueError(f"Unknown method: {self.method}")
+        if self.mode == 'encode' and not self.secret:
+            raise ValueError(f"Encode job for {self.input} has no secret")
+        allowed = JOB_PARAMS + tuple(GPUConfig.ALGORITHM_PARAMS[self.method])
+        unknown = set(self.params) - set(allowed)
+        if unknown:
+            raise ValueError(f"Unsupported {self.method} job params {sorted(unknown)}; expected {allowed}")
+        if not self.id:
+            # Stable across runs so the journal can recognise finished jobs
+            spec = json.dumps([self.mode, self.method, self.input, self.secret, self.output, self.params],
+                              sort_keys=True)
+            self.id = hashlib.sha1(spec.encode()).hexdigest()[:16]
+
+
+def load_manifest(path: str) -> List[Job]:
+    """Jobs from a JSON list or a JSON Lines file; relative paths resolve against the manifest"""
+    with open(path) as f:
+        text = f.read()
+    if path.endswith('.json'):
+        entries = json.loads(text)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip() and not line.startswith('#')]
+
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for entry in entries:
+        entry = dict(entry)
+        if 'cover' in entry:
+            entry['input'] = entry.pop('cover')
+        for key in ('input', 'secret', 'output'):
+            if entry.get(key):
+                entry[key] = os.path.join(base, entry[key])
+        jobs.append(Job(**entry))
+    return jobs
+
+
+class Journal:
+    """Append-only JSON Lines record of finished jobs.
+
+    Each line is flushed and fsynced as soon as its job completes, so after
+    an interruption at most the jobs that were still running are redone. A
+    torn final line from a crash mid-write is ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if record.get('status') == 'done':
+                        self.done[record['id']] = record
+                    else:
+                        self.done.pop(record.get('id'), None)
+        self._file = open(path, 'a')
+        if self._file.tell() and not self._ends_with_newline():
+            # Start after a torn line rather than appending the next record to it
+            self._file.write('\n')
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    def is_done(self, job: Job) -> bool:
+        return job.id in self.done and os.path.exists(job.output)
+
+    def record(self, job: Job, status: str, **fields):
+        record = {'id': job.id, 'status': status, 'output': job.output, **fields}
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if status == 'done':
+            self.done[job.id] = record
+
+    def close(self):
+        self._file.close()
+
+
+@dataclass
+class BatchSummary:
+    completed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    audio_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    errors: List[Tuple[str, str]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        wall = max(self.wall_seconds, 1e-9)
+        return (f"{self.completed} done, {self.skipped} skipped, {self.failed} failed in {self.wall_seconds:.2f} s: "
+                f"{self.completed / wall:.2f} files/s, {self.audio_seconds / 3600 / wall:.4f} audio-hours/s "
+                f"({self.audio_seconds / wall:.1f}x real time)")
+
+
+# Per-process Encode/Decode instances keyed by (mode, frame_size), reused across jobs
+_coders: Dict[Tuple[str, int], Union[Encode, Decode]] = {}
+_device = 'cpu'
+
+
+def _init_worker(device: str, threads: int):
+    global _device
+    _device = device
+    torch.set_num_threads(threads)
+    _coders.clear()
+
+
+def _coder(mode: str, frame_size: int) -> Union[Encode, Decode]:
+    key = (mode, frame_size)
+    if key not in _coders:
+        _coders[key] = (Encode if mode == 'encode' else Decode)(device=_device, frame_size=frame_size)
+    return _coders[key]
+
+
+def run_job(job: Job) -> dict:
+    """Run one job in this process; the output appears atomically when it succeeds"""
+    for path in (job.input, job.secret):
+        if path and not os.path.exists(path):
+            raise FileNotFoundError(f"No such file: {path}")
+    frame_size = int(job.params.get('frame_size', 2048))
+    chunk_frames = int(job.params.get('chunk_frames', DEFAULT_CHUNK_FRAMES))
+    params = {key: value for key, value in job.params.items() if key not in JOB_PARAMS}
+    coder = _coder(job.mode, frame_size)
+    os.makedirs(os.path.dirname(os.path.abspath(job.output)), exist_ok=True)
+
+    start = time.perf_counter()
+    # Both write through atomic_output, so a failed job leaves neither job.output nor a partial file
+    if job.mode == 'encode':
+        frames = encode_file(job.input, job.secret, job.output, job.method, _device, chunk_frames,
+                             encoder=coder, params=params)
+    else:
+        frames = decode_file(job.input, job.output, job.method, _device, chunk_frames, decoder=coder,
+                             params=params)
+    sample_rate = read_wav_info(job.output).sample_rate
+    return {'frames': frames, 'sample_rate': sample_rate, 'seconds': time.perf_counter() - start}
+
+
+def run_batch(jobs: List[Job], journal_path: str, workers: int = 1, device: str = 'cpu',
+              log: Optional[Callable[[str], None]] = print) -> BatchSummary:
+    """Run jobs on a process pool, skipping those the journal already has as done.
+
+    Each worker builds its Encode/Decode instances once and reuses them for
+    every job with the same mode and frame size. With workers=1 jobs run in
+    this process and no pool is started.
+    """
+    log = log or (lambda message: None)
+    journal = Journal(journal_path)
+    summary = BatchSummary()
+    pending = []
+    for job in jobs:
+        if journal.is_done(job):
+            summary.skipped += 1
+        else:
+            pending.append(job)
+    log(f"{len(pending)} job(s) to run, {summary.skipped} already done per {journal_path}")
+
+    def finished(job: Job, result: Optional[dict], error: Optional[BaseException]):
+        if error is None:
+            summary.completed += 1
+            summary.audio_seconds += result['frames'] / result['sample_rate']
+            journal.record(job, 'done', **result)
+            log(f"[{summary.completed + summary.failed}/{len(pending)}] {job.mode} {job.method} "
+                f"{job.output} ({result['seconds']:.2f} s)")
+        else:
+            summary.failed += 1
+            summary.errors.append((job.id, str(error)))
+            journal.record(job, 'failed', error=str(error))
+            log(f"[{summary.completed + summary.failed}/{len(pending)}] FAILED {job.input}: {error}")
+
+    start = time.perf_counter()
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    try:
+        if workers <= 1:
+            _init_worker(device, torch.get_num_threads())
+            for job in pending:
+                try:
+                    result = run_job(job)
+                except Exception as e:
+                    finished(job, None, e)
+                else:
+                    finished(job, result, None)
+        else:
+            # spawn, not fork: forking a process whose torch thread pools are live can deadlock
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                     initargs=(device, threads)) as pool:
+                futures = {pool.submit(run_job, job): job for job in pending}
+                try:
+                    while futures:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            job = futures.pop(future)
+                            error = future.exception()
+                            finished(job, None if error else future.result(), error)
+                except KeyboardInterrupt:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+    finally:
+        summary.wall_seconds = time.perf_counter() - start
+        journal.close()
+    return summary
@@ -0,0 +1,199 @@
+"""Headless command line entry point (stegano-cli).
+
+    stegano-cli batch jobs.jsonl --workers 4
+    stegano-cli encode cover.wav secret.wav stego.wav --method fft
+    stegano-cli decode stego.wav recovered.wav --method fft
+    stegano-cli encode cover.wav secret.wav stego.wav --backend numpy   # no torch import
+    stegano-cli encode cover.wav message.txt stego.wav --payload        # bytes via lsb
+    stegano-cli decode stego.wav message.txt --payload
+    stegano-cli encode stem8.wav long.wav stego.wav --spread-channels    # secret dealt across channels
+    stegano-cli encode cover.wav secret.wav stego.wav --trace trace.json # per-stage timings
+    stegano-cli capacity cover.wav --method lsb
+    stegano-cli sweep corpus/*.wav --grid grid.json --workers 4 --output sweep.json
+
+A batch manifest holds one job per line (or a JSON list of them):
+
+    {"cover": "in/a.wav", "secret": "msg.wav", "output": "out/a.wav", "method": "fft"}
+    {"mode": "decode", "input": "out/a.wav", "output": "rec/a.wav", "params": {"frame_size": 1024}}
+    {"cover": "in/b.wav", "secret": "msg.wav", "output": "out/b.wav", "method": "echo", "params": {"decay": 0.5}}
+
+params may set frame_size, chunk_frames and the method's own
+GPUConfig.ALGORITHM_PARAMS (num_bits, strength, delay, decay).
+
+Finished jobs are journalled next to the manifest, so rerunning the same
+command after an interruption picks up where it stopped.
+"""
+import argparse
+import sys
+import time
+
+from cpu.backends import default_device, load_backend
+
+
+def report_progress(done: int, total: int):
+    print(f"Processed chunk {done}/{total}", end='\r', flush=True)
+
+
+def batch(args):
+    from cpu.batch import load_manifest, run_batch
+
+    jobs = load_manifest(args.manifest)
+    journal = args.journal or args.manifest + '.journal'
+    summary = run_batch(jobs, journal, workers=args.workers, device=args.device)
+    print(summary.summary())
+    return 1 if summary.failed else 0
+
+
+def capacity(args):
+    from cpu.payload import plan_capacity
+    from cpu.wav_mmap import read_wav_info
+
+    info = read_wav_info(args.cover)
+    if info is None:
+        from cpu.audio_io import AudioChunkReader
+        with AudioChunkReader(args.cover) as reader:
+            info = reader
+    params = {'num_bits': args.num_bits} if args.num_bits else None
+    print(plan_capacity(info.num_frames, info.num_channels, info.sample_rate, args.method, params).summary())
+    return 0
+
+
+def sweep(args):
+    import json
+    from cpu.sweep import DEFAULT_GRID, save_results, sweep as run_sweep
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    if args.methods:
+        grid = {method: grid[method] for method in args.methods.split(',')}
+    points = run_sweep(args.corpus, grid, workers=args.workers, quality=args.quality,
+                       progress=report_progress)
+    print()
+    for point in points:
+        print(point.summary())
+    print("* on the capacity/quality Pareto frontier")
+    if args.output:
+        save_results(points, args.output)
+    return 0
+
+
+def payload(args):
+    from cpu.stego_file import embed_payload_file, extract_payload_file
+
+    start = time.perf_counter()
+    num_bits = args.num_bits or 2
+    if args.command == 'encode':
+        size = embed_payload_file(args.cover, args.secret, args.output, num_bits, progress=report_progress)
+    else:
+        size = extract_payload_file(args.stego, args.output, num_bits, progress=report_progress)
+    elapsed = time.perf_counter() - start
+    print(f"{args.command}d {size} payload bytes to {args.output} in {elapsed:.2f} s "
+          f"({size / max(elapsed, 1e-9) / 1e6:.2f} MB/s)")
+    return 0
+
+
+def spread_option(args) -> dict:
+    # Only the torch backend takes the keyword; leave the shared signature alone otherwise
+    return {'spread_channels': True} if args.spread_channels else {}
+
+
+def single(args):
+    if args.payload:
+        return payload(args)
+    start = time.perf_counter()
+    # Sharding parallelises one file over CPU processes; on a GPU one process is enough
+    sharded = args.workers > 1 and args.device == 'cpu' and args.backend == 'torch' and not args.spread_channels
+    if args.spread_channels and args.backend != 'torch':
+        raise SystemExit("--spread-channels needs the torch backend")
+    if args.trace and sharded:
+        raise SystemExit("--trace times one process; use --workers 1")
+    if sharded:
+        from cpu.sharding import sharded_decode_file, sharded_encode_file
+    backend = load_backend(args.backend)
+    encode_file, decode_file = backend.encode_file, backend.decode_file
+    instrument = None
+    if args.trace:
+        from cpu.instrument import Instrument
+        instrument = Instrument(args.device, trace=True)
+
+    if args.command == 'encode':
+        if sharded:
+            frames = sharded_encode_file(args.cover, args.secret, args.output, args.method,
+                                         workers=args.workers, progress=report_progress)
+        else:
+            frames = encode_file(args.cover, args.secret, args.output, args.method, args.device,
+                                 progress=report_progress, instrument=instrument, **spread_option(args))
+    else:
+        if sharded:
+            frames = sharded_decode_file(args.stego, args.output, args.method,
+                                         workers=args.workers, progress=report_progress)
+        else:
+            frames = decode_file(args.stego, args.output, args.method, args.device, progress=report_progress,
+                                 instrument=instrument, **spread_option(args))
+    print(f"Wrote {frames} frames to {args.output} in {time.perf_counter() - start:.2f} s")
+    if instrument is not None:
+        print(instrument.summary())
+        instrument.save_trace(args.trace)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='stegano-cli', description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    batch_parser = commands.add_parser('batch', help="run a manifest of encode/decode jobs")
+    batch_parser.add_argument('manifest')
+    batch_parser.add_argument('--journal', help="progress journal (default: MANIFEST.journal)")
+    batch_parser.set_defaults(run=batch)
+
+    encode_parser = commands.add_parser('encode', help="embed one secret file into one cover file")
+    encode_parser.add_argument('cover')
+    encode_parser.add_argument('secret')
+    encode_parser.add_argument('output')
+    encode_parser.set_defaults(run=single)
+
+    decode_parser = commands.add_parser('decode', help="extract the secret from one stego file")
+    decode_parser.add_argument('stego')
+    decode_parser.add_argument('output')
+    decode_parser.set_defaults(run=single)
+
+    capacity_parser = commands.add_parser('capacity', help="how many payload bytes a cover carries")
+    capacity_parser.add_argument('cover')
+    capacity_parser.add_argument('--method', choices=['lsb', 'fft', 'echo'], default='lsb')
+    capacity_parser.add_argument('--num-bits', type=int, help="default: GPUConfig.ALGORITHM_PARAMS")
+    capacity_parser.set_defaults(run=capacity)
+
+    sweep_parser = commands.add_parser('sweep', help="score a parameter grid over a corpus")
+    sweep_parser.add_argument('corpus', nargs='+', help="cover audio files")
+    sweep_parser.add_argument('--grid', help='JSON {method: {param: [values]}} (default: cpu.sweep.DEFAULT_GRID)')
+    sweep_parser.add_argument('--methods', help="comma-separated subset of the grid's methods")
+    sweep_parser.add_argument('--quality', choices=['seg_snr_db', 'snr_db'], default='seg_snr_db',
+                              help="quality axis of the Pareto frontier")
+    sweep_parser.add_argument('--output', help="write every point as JSON")
+    sweep_parser.add_argument('--workers', type=int, default=1, help="worker processes")
+    sweep_parser.set_defaults(run=sweep)
+
+    for sub in (batch_parser, encode_parser, decode_parser):
+        sub.add_argument('--workers', type=int, default=1, help="worker processes")
+        sub.add_argument('--device', help="default: cuda when available")
+    for sub in (encode_parser, decode_parser):
+        sub.add_argument('--method', choices=['lsb', 'fft', 'echo'], default='fft')
+        sub.add_argument('--backend', choices=['torch', 'numpy'], default='torch',
+                         help="numpy starts in a fraction of the time; uncompressed WAV only, CPU only")
+        sub.add_argument('--payload', action='store_true',
+                         help="treat the secret / output as raw bytes framed into the lsb channel")
+        sub.add_argument('--num-bits', type=int, choices=[1, 2, 4, 8], help="lsb bits per sample for --payload")
+        sub.add_argument('--spread-channels', action='store_true',
+                         help="deal one mono secret across all cover channels (C times the capacity)")
+        sub.add_argument('--trace', help="print per-stage timings and write them as a Chrome trace JSON")
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'device', '') is None:
+        args.device = default_device(getattr(args, 'backend', 'torch'))
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Fused elementwise kernels for the embed/extract hot paths, via torch.compile.
+
+The STFTs stay on the eager path; what is compiled is the chain of
+elementwise ops around them, which eager mode runs as one full-size
+intermediate per op: lsb quantize/mask/shift, the fft phase rotation
+(written on real/imag pairs, since inductor does not fuse complex exp),
+and the echo taps. A compiled kernel is cached per (kernel, shape, dtype,
+device, constants). If torch.compile is unavailable or a compile fails,
+that kernel falls back to its eager function and stays there, so enabling
+compiled mode never changes whether a call succeeds. Errors that are not
+compile failures (bad shapes, out of memory) propagate as they would in
+eager mode.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import torch
+
+log = logging.getLogger(__name__)
+
+
+def lsb_embed_kernel(cover: torch.Tensor, secret: torch.Tensor, num_bits: int) -> torch.Tensor:
+    secret_quantized = torch.round(secret * 2 ** (16 - num_bits)).short()
+    mask = (0xFF << (8 - num_bits)) & 0xFF
+    stego_int = (cover.short() & ~mask) | (secret_quantized << (8 - num_bits))
+    return stego_int.float() / 32767.0
+
+
+def decode_lsb_kernel(stego: torch.Tensor, num_bits: int) -> torch.Tensor:
+    mask = (1 << num_bits) - 1
+    return ((stego * 32767).short() & mask).float() / mask
+
+
+def rotate_phase_kernel(spec: torch.Tensor, phase: torch.Tensor, strength: float) -> torch.Tensor:
+    """spec * exp(1j * strength * phase) on view_as_real(spec) pairs"""
+    re, im = spec[..., 0], spec[..., 1]
+    angle = strength * phase
+    cos, sin = torch.cos(angle), torch.sin(angle)
+    return torch.stack((re * cos - im * sin, re * sin + im * cos), dim=-1)
+
+
+def scale_phase_kernel(spec: torch.Tensor, strength: float) -> torch.Tensor:
+    """|spec| * exp(1j * angle(spec) / strength) on view_as_real(spec) pairs"""
+    re, im = spec[..., 0], spec[..., 1]
+    magnitude = torch.sqrt(re * re + im * im)
+    angle = torch.atan2(im, re) / strength
+    return torch.stack((magnitude * torch.cos(angle), magnitude * torch.sin(angle)), dim=-1)
+
+
+def echo_hide_kernel(cover: torch.Tensor, secret: torch.Tensor, delay_samples: int, decay: float,
+                     gain: float) -> torch.Tensor:
+    """EchoEngine.hide for a secret already fitted to the cover; delay_samples > 0"""
+    delayed = torch.nn.functional.pad(secret, (delay_samples, 0))[..., :secret.shape[-1]]
+    return cover + gain * (secret + decay * delayed)
+
+
+def echo_extract_kernel(stego: torch.Tensor, delay_samples: int, decay: float) -> torch.Tensor:
+    """EchoEngine.extract; delay_samples > 0"""
+    length, shift = stego.shape[-1], delay_samples // 2
+    padded = torch.nn.functional.pad(stego, (0, shift))
+    delayed = torch.nn.functional.pad(padded, (delay_samples, 0))[..., :padded.shape[-1]]
+    return (padded - decay * delayed)[..., shift:shift + length] / (1 + decay)
+
+
+KERNELS: Dict[str, Callable[..., torch.Tensor]] = {
+    'lsb_embed': lsb_embed_kernel,
+    'decode_lsb': decode_lsb_kernel,
+    'rotate_phase': rotate_phase_kernel,
+    'scale_phase': scale_phase_kernel,
+    'echo_hide': echo_hide_kernel,
+    'echo_extract': echo_extract_kernel,
+}
+
+
+def compile_available() -> bool:
+    return hasattr(torch, 'compile')
+
+
+def _compile_errors() -> Tuple[type, ...]:
+    """What a failed compile raises: dynamo tracing/backend failures and inductor codegen errors"""
+    errors = []
+    try:
+        from torch._dynamo.exc import BackendCompilerFailed, Unsupported
+        errors += [BackendCompilerFailed, Unsupported]
+    except ImportError:
+        pass
+    try:
+        # InductorError subclasses BackendCompilerFailed; CppCompileError does not
+        from torch._inductor.exc import CppCompileError, InductorError
+        errors += [InductorError, CppCompileError]
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+COMPILE_ERRORS = _compile_errors()
+
+
+class KernelCache:
+    """torch.compile'd KERNELS, specialised per (kernel, shapes, dtypes, device, constants).
+
+    Each kernel is wrapped once with dynamic=False; every new key compiles
+    a graph for its exact shapes. Past max_per_kernel keys (dynamo's own
+    recompile limit is 8 per function) a kernel runs eagerly rather than
+    paying another compile. hits, misses and fallbacks are counted for
+    benchmarking.
+    """
+
+    def __init__(self, max_per_kernel: int = 8, mode: Optional[str] = None):
+        self.max_per_kernel = max_per_kernel
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self._compiled: Dict[str, Callable[..., torch.Tensor]] = {}
+        self._keys: Dict[str, set] = {}
+        self._broken = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(tensors: Tuple[torch.Tensor, ...], constants: Tuple) -> Hashable:
+        return tuple((tuple(t.shape), t.dtype, str(t.device)) for t in tensors), constants
+
+    def __call__(self, name: str, *tensors: torch.Tensor, constants: Tuple = ()) -> torch.Tensor:
+        eager = KERNELS[name]
+        if not compile_available() or name in self._broken:
+            return eager(*tensors, *constants)
+        key = self._key(tensors, constants)
+        with self._lock:
+            keys = self._keys.setdefault(name, set())
+            if key in keys:
+                self.hits += 1
+            elif len(keys) >= self.max_per_kernel:
+                return eager(*tensors, *constants)
+            else:
+                self.misses += 1
+                keys.add(key)
+            fn = self._compiled.get(name)
+            if fn is None:
+                fn = self._compiled[name] = torch.compile(eager, dynamic=False, fullgraph=True, mode=self.mode)
+        try:
+            return fn(*tensors, *constants)
+        except COMPILE_ERRORS as e:
+            # Most likely no C++ toolchain or an unsupported op: this kernel stays eager from now on
+            log.warning("torch.compile of %s failed, falling back to eager: %s", name, e)
+            with self._lock:
+                self.fallbacks += 1
+                self._broken.add(name)
+            return eager(*tensors, *constants)
+
+    def warmup(self, calls: Iterable[Tuple[str, Tuple[torch.Tensor, ...], Tuple]]):
+        """Compile ahead of time: each call is (kernel, example tensors, constants)"""
+        with torch.no_grad():
+            for name, tensors, constants in calls:
+                self(name, *tensors, constants=constants)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self._broken.clear()
+            self.hits = self.misses = self.fallbacks = 0
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._keys.values())
+
+
+_cache = KernelCache()
+
+
+def kernel_cache() -> KernelCache:
+    return _cache
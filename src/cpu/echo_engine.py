@@ -0,0 +1,110 @@
+from typing import List, Optional
+
+import torch
+
+
+class EchoEngine:
+    """Two-tap echo filter applied as a shifted add instead of a convolution.
+
+    hide()/extract() are drop-in equivalents of Encode.echo_hide and
+    Decode.decode_echo. hide_chunk()/extract_chunk() run the same filters
+    incrementally, carrying a delay line of the last delay_samples inputs
+    between chunks. extract_chunk() lags by delay_samples // 2 (the 'same'
+    alignment of the original convolution); flush_extract() emits the rest.
+    """
+
+    def __init__(self, delay: float = 0.1, decay: float = 0.3, sample_rate: int = 16000,
+                 gain: float = 0.1, device: str = 'cuda'):
+        self.delay = delay
+        self.decay = decay
+        self.sample_rate = sample_rate
+        self.gain = gain
+        self.device = device
+        self.delay_samples = int(delay * sample_rate)
+        self.reset()
+
+    def reset(self):
+        self._hide_line: Optional[torch.Tensor] = None
+        self._extract_line: Optional[torch.Tensor] = None
+        self._extract_skip = self.delay_samples // 2
+
+    def _taps(self, x: torch.Tensor, history: torch.Tensor, last: float) -> torch.Tensor:
+        # y[t] = x[t] + last * x[t - D], with history holding the D samples before x
+        if self.delay_samples == 0:
+            # Both taps land on index 0 and the second overwrites the first
+            return last * x
+        delayed = torch.cat((history, x), dim=-1)[..., :x.shape[-1]]
+        return x + last * delayed
+
+    def _zeros(self, like: torch.Tensor) -> torch.Tensor:
+        return like.new_zeros(*like.shape[:-1], self.delay_samples)
+
+    def fit(self, secret: torch.Tensor, length: int) -> torch.Tensor:
+        """Zero-pad or trim secret to length samples, as hide() does before filtering"""
+        if secret.shape[-1] < length:
+            return torch.nn.functional.pad(secret, (0, length - secret.shape[-1]))
+        return secret[..., :length]
+
+    def hide(self, cover: torch.Tensor, secret: torch.Tensor) -> torch.Tensor:
+        secret = self.fit(secret, cover.shape[-1])
+        return cover + self.gain * self._taps(secret, self._zeros(secret), self.decay)
+
+    def extract(self, stego: torch.Tensor) -> torch.Tensor:
+        length, shift = stego.shape[-1], self.delay_samples // 2
+        padded = torch.nn.functional.pad(stego, (0, shift))
+        filtered = self._taps(padded, self._zeros(stego), -self.decay)
+        return filtered[..., shift:shift + length] / (1 + self.decay)
+
+    def hide_chunk(self, cover: torch.Tensor, secret: torch.Tensor) -> torch.Tensor:
+        secret = self.fit(secret, cover.shape[-1])
+        if self._hide_line is None:
+            self._hide_line = self._zeros(secret)
+        echo = self._taps(secret, self._hide_line, self.decay)
+        self._hide_line = self._advance(self._hide_line, secret)
+        return cover + self.gain * echo
+
+    def extract_chunk(self, stego: torch.Tensor) -> torch.Tensor:
+        if self._extract_line is None:
+            self._extract_line = self._zeros(stego)
+        filtered = self._taps(stego, self._extract_line, -self.decay)
+        self._extract_line = self._advance(self._extract_line, stego)
+
+        skip = min(self._extract_skip, filtered.shape[-1])
+        self._extract_skip -= skip
+        return filtered[..., skip:] / (1 + self.decay)
+
+    def flush_extract(self) -> torch.Tensor:
+        if self._extract_line is None:
+            return torch.zeros(0, device=self.device)
+        # The trailing lookahead sees zeros past the end of the stream
+        tail = torch.zeros_like(self._extract_line[..., :self.delay_samples // 2])
+        filtered = self._taps(tail, self._extract_line, -self.decay)[..., self._extract_skip:]
+        self._extract_line = None
+        self._extract_skip = self.delay_samples // 2
+        return filtered / (1 + self.decay)
+
+    @classmethod
+    def stack(cls, engines: List['EchoEngine']) -> 'EchoEngine':
+        """One engine whose hide delay line holds those of engines on a new leading axis.
+
+        hide_chunk() it the chunks stacked the same way, then unstack() to
+        hand each engine its advanced line back. Engines that have not
+        started yet contribute a silent line.
+        """
+        first = engines[0]
+        merged = cls(first.delay, first.decay, first.sample_rate, first.gain, first.device)
+        lines = [engine._hide_line for engine in engines]
+        like = next((line for line in lines if line is not None), None)
+        if like is not None:
+            merged._hide_line = torch.stack([torch.zeros_like(like) if line is None else line for line in lines])
+        return merged
+
+    def unstack(self, engines: List['EchoEngine']):
+        """Split the hide delay line of a stack()ed engine back into the engines it was built from"""
+        for engine, line in zip(engines, self._hide_line.unbind(0)):
+            engine._hide_line = line
+
+    def _advance(self, line: torch.Tensor, x: torch.Tensor) -> torch.Tensor:
+        if self.delay_samples == 0:
+            return line
+        return torch.cat((line, x), dim=-1)[..., -self.delay_samples:]
@@ -0,0 +1,237 @@
+"""Sync-marked payload framing so a receiver can join a live lsb stream mid-way.
+
+The sender repeats [preamble | payload frame] through the lsb channel.
+The preamble is a 127-bit maximal-length sequence padded to 128 bits.
+A receiver that starts at an arbitrary sample extracts low bits per chunk
+and finds the preamble with one FFT cross-correlation over the chunk.
+Once locked it only compares the next expected preamble bit for bit, so
+the per-chunk cost drops to extraction plus a few vector compares.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+
+from cpu.payload import HEADER, MAGIC, PayloadError, bytes_to_symbols, frame, unframe
+
+
+def _m_sequence(taps=(7, 6), length=127) -> np.ndarray:
+    state = [1] * max(taps)
+    bits = []
+    for _ in range(length):
+        bits.append(state[-1])
+        feedback = state[taps[0] - 1] ^ state[taps[1] - 1]
+        state = [feedback] + state[:-1]
+    return np.array(bits, dtype=np.uint8)
+
+
+PREAMBLE = np.append(_m_sequence(), 0).astype(np.uint8)
+PREAMBLE_BITS = PREAMBLE.shape[0]
+# Largest frame a receiver waits for before its first good frame pins the length
+DEFAULT_MAX_PAYLOAD = 1 << 16
+
+
+def symbols_to_bits(symbols: np.ndarray, num_bits: int) -> np.ndarray:
+    shifts = np.arange(num_bits - 1, -1, -1, dtype=np.uint8)
+    return ((symbols.reshape(-1, 1).astype(np.uint8) >> shifts) & 1).reshape(-1)
+
+
+def bits_to_symbols(bits: np.ndarray, num_bits: int) -> np.ndarray:
+    weights = (1 << np.arange(num_bits - 1, -1, -1)).astype(np.uint8)
+    return (bits.reshape(-1, num_bits) * weights).sum(axis=1, dtype=np.uint8)
+
+
+class SyncedPayload:
+    """Cyclic symbol source: preamble then framed data, repeated for as long as the stream runs"""
+
+    def __init__(self, data: bytes, num_bits: int = 2):
+        self.data = bytes(data)
+        self.num_bits = num_bits
+        self.pattern = np.concatenate((bits_to_symbols(PREAMBLE, num_bits), bytes_to_symbols(frame(data), num_bits)))
+        self.cursor = 0
+
+    def take(self, num: int) -> np.ndarray:
+        index = (self.cursor + np.arange(num)) % self.pattern.shape[0]
+        self.cursor = (self.cursor + num) % self.pattern.shape[0]
+        return self.pattern[index]
+
+
+@dataclass
+class SyncStats:
+    chunks: int = 0
+    samples: int = 0
+    lock_sample: Optional[int] = None
+    lock_wall: Optional[float] = None
+    locks: int = 0
+    lost: int = 0
+    frames_ok: int = 0
+    frames_bad: int = 0
+    sync_bits: int = 0
+    sync_errors: int = 0
+    payload_bits: int = 0
+    payload_errors: int = 0
+    chunk_times: List[float] = field(default_factory=list)
+
+    @property
+    def ber(self) -> float:
+        """Bit error rate measured on the known preamble bits"""
+        return self.sync_errors / self.sync_bits if self.sync_bits else 0.0
+
+    @property
+    def payload_ber(self) -> float:
+        """Bit error rate on payload frames, when a reference payload was given"""
+        return self.payload_errors / self.payload_bits if self.payload_bits else 0.0
+
+    def percentile_ms(self, q: float) -> float:
+        if not self.chunk_times:
+            return 0.0
+        ordered = sorted(self.chunk_times)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+
+    def summary(self, sample_rate: int = 16000) -> str:
+        lock = "never" if self.lock_sample is None else \
+            f"{self.lock_sample / sample_rate * 1e3:.1f} ms of stream ({self.lock_wall * 1e3:.1f} ms wall)"
+        return (f"lock after {lock}; {self.frames_ok} frames ok, {self.frames_bad} bad, "
+                f"{self.lost} lock losses; preamble BER {self.ber:.2e}, payload BER {self.payload_ber:.2e}; "
+                f"per chunk p50 {self.percentile_ms(0.5):.3f} ms, p99 {self.percentile_ms(0.99):.3f} ms")
+
+
+class FrameSync:
+    """Receiver side of SyncedPayload: search, lock, then decode frame by frame.
+
+    push() takes the lsb symbols of each chunk in frame-major order and
+    returns the payloads completed in it. A preamble counts as found when at
+    most max_errors of its bits differ, which also bounds false locks on
+    unmarked audio (a random 128-bit window passes with p < 1e-18).
+
+    A header is only trusted up to max_payload bytes, and once a frame of
+    the current lock has passed its checksum only at that frame's length,
+    since the sender repeats one payload. Any other length is a corrupted
+    header and drops the lock, so the buffer never holds more than one
+    frame and a chunk. The next lock learns the length afresh, so a sender
+    that changes its payload costs one frame.
+    """
+
+    def __init__(self, num_bits: int = 2, channels: int = 1, max_errors: int = PREAMBLE_BITS // 8,
+                 reference: Optional[bytes] = None, max_payload: int = DEFAULT_MAX_PAYLOAD):
+        self.num_bits = num_bits
+        self.channels = channels
+        self.max_errors = max_errors
+        self.max_payload = max_payload
+        self.length: Optional[int] = None
+        self.stats = SyncStats()
+        self.locked = False
+        self._reference = None if reference is None else np.unpackbits(np.frombuffer(frame(reference), np.uint8))
+        self._pattern = 2.0 * PREAMBLE.astype(np.float32) - 1
+        self._bits = np.empty(0, dtype=np.uint8)
+        self._bits_pushed = 0
+        self._frame_bits: Optional[int] = None
+        self._expect_preamble = False
+        self._start = time.perf_counter()
+
+    def push(self, symbols: np.ndarray) -> List[bytes]:
+        self.stats.chunks += 1
+        self.stats.samples += symbols.size // self.channels
+        bits = symbols_to_bits(symbols, self.num_bits)
+        self._bits_pushed += bits.shape[0]
+        self._bits = np.concatenate((self._bits, bits))
+        payloads = []
+        while True:
+            if not self.locked:
+                if not self._search():
+                    break
+            elif self._expect_preamble:
+                if self._bits.shape[0] < PREAMBLE_BITS:
+                    break
+                errors = int(np.count_nonzero(self._bits[:PREAMBLE_BITS] != PREAMBLE))
+                if errors > self.max_errors:
+                    self._lose_lock()
+                    continue
+                self._count_sync(errors)
+                self._bits = self._bits[PREAMBLE_BITS:]
+                self._expect_preamble = False
+            else:
+                payload, complete = self._read_frame()
+                if not complete:
+                    break
+                if payload is not None:
+                    payloads.append(payload)
+        return payloads
+
+    def _search(self) -> bool:
+        bits = self._bits
+        if bits.shape[0] < PREAMBLE_BITS:
+            return False
+        # Cross-correlate the whole buffer with the +/-1 preamble in one FFT
+        signal = 2.0 * bits.astype(np.float32) - 1
+        size = 1 << int(np.ceil(np.log2(signal.shape[0] + PREAMBLE_BITS)))
+        corr = np.fft.irfft(np.fft.rfft(signal, size) * np.conj(np.fft.rfft(self._pattern, size)), size)
+        corr = corr[:signal.shape[0] - PREAMBLE_BITS + 1]
+        # Only sample-aligned offsets can start a symbol run
+        corr[np.arange(corr.shape[0]) % self.num_bits != 0] = -np.inf
+        hits = np.flatnonzero(corr >= PREAMBLE_BITS - 2 * self.max_errors - 0.5)
+        if hits.shape[0] == 0:
+            # Keep just enough tail to catch a preamble straddling the next chunk
+            keep = (PREAMBLE_BITS - 1) // self.num_bits * self.num_bits
+            self._bits = bits[bits.shape[0] - keep:] if bits.shape[0] > keep else bits
+            return False
+
+        start = int(hits[0])
+        errors = int(np.count_nonzero(bits[start:start + PREAMBLE_BITS] != PREAMBLE))
+        self.locked = True
+        self.stats.locks += 1
+        if self.stats.lock_sample is None:
+            # The stream position where the preamble ends, not the chunk boundary
+            end = self._bits_pushed - bits.shape[0] + start + PREAMBLE_BITS
+            self.stats.lock_sample = -(-end // (self.num_bits * self.channels))
+            self.stats.lock_wall = time.perf_counter() - self._start
+        self._count_sync(errors)
+        self._bits = bits[start + PREAMBLE_BITS:]
+        self._frame_bits = None
+        self._expect_preamble = False
+        return True
+
+    def _read_frame(self):
+        """(payload or None, whether a frame was consumed)"""
+        header_bits = HEADER.size * 8
+        if self._frame_bits is None:
+            if self._bits.shape[0] < header_bits:
+                return None, False
+            magic, length, _ = HEADER.unpack(np.packbits(self._bits[:header_bits]).tobytes())
+            expected = length <= self.max_payload if self.length is None else length == self.length
+            if magic != MAGIC or not expected:
+                self._lose_lock()
+                return None, True
+            self._frame_bits = header_bits + 8 * length
+        if self._bits.shape[0] < self._frame_bits:
+            return None, False
+
+        bits, self._bits = self._bits[:self._frame_bits], self._bits[self._frame_bits:]
+        self._frame_bits = None
+        self._expect_preamble = True
+        if self._reference is not None and bits.shape[0] == self._reference.shape[0]:
+            self.stats.payload_bits += bits.shape[0]
+            self.stats.payload_errors += int(np.count_nonzero(bits != self._reference))
+        try:
+            payload = unframe(np.packbits(bits).tobytes())
+        except PayloadError:
+            self.stats.frames_bad += 1
+            return None, True
+        self.stats.frames_ok += 1
+        self.length = len(payload)
+        return payload, True
+
+    def _count_sync(self, errors: int):
+        self.stats.sync_bits += PREAMBLE_BITS
+        self.stats.sync_errors += errors
+
+    def _lose_lock(self):
+        self.locked = False
+        self.stats.lost += 1
+        self._frame_bits = None
+        self._expect_preamble = False
+        self.length = None
+        # Search again from the bits that failed: the preamble or header there is not consumed, and a
+        # preamble that starts right here is still found. A rejected preamble cannot match the search,
+        # and a false lock on a header consumes bits, so the search always moves on.
@@ -0,0 +1,228 @@
+"""Per-stage timings, throughput and memory high-water marks for file processing, and cooperative cancellation.
+
+An Instrument is handed to encode_file / decode_file (either backend) and
+to Encode / Decode; each wraps its work in instrument.stage(name) for the
+load, resample, transfer, embed/extract and save stages. Stages may nest
+('embed' contains 'embed/stft'); the totals of nested stages are not
+subtracted from their parents. snapshot() is safe to call from another
+thread while processing runs, which is how the GUI shows live throughput.
+
+A CancelToken is checked at every chunk boundary: cancelling stops the
+loop before the next chunk and the call raises Cancelled. Outputs are
+written through atomic_output, so a cancelled or failed call leaves
+neither a half-written file nor a truncated one that looks complete.
+
+Nothing here imports torch unless the instrument is bound to a CUDA
+device, so the numpy backend stays torch-free.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Called with (chunks_done, total_chunks) after each chunk is written
+ProgressCallback = Callable[[int, int], None]
+
+# Chunk size of the file paths of both backends
+DEFAULT_CHUNK_FRAMES = 1 << 18
+
+
+class Cancelled(Exception):
+    """Raised at a chunk boundary once the CancelToken of the call has been cancelled"""
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+
+def check_cancelled(cancel: Optional[CancelToken]):
+    if cancel is not None:
+        cancel.check()
+
+
+@contextmanager
+def atomic_output(path: str) -> Iterator[str]:
+    """Yield path + '.partial' to write to, moved over path only if the block completes.
+
+    On any exception, Cancelled included, the partial file is removed and
+    whatever was at path before is left alone. Wrap it around the writer so
+    the file is closed first.
+    """
+    partial = path + '.partial'
+    try:
+        yield partial
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    os.replace(partial, path)
+
+
+def peak_rss_mb() -> float:
+    """Process resident-set high-water mark in MiB (0 where the platform does not report it)"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+
+
+class Instrument:
+    """Accumulates stage timings, processed frames and memory peaks for one run.
+
+    On a CUDA device each stage ends with a synchronize, so kernel time is
+    charged to the stage that launched it rather than to whichever stage
+    next waits on the device. trace=True keeps every stage interval for
+    save_trace().
+    """
+
+    def __init__(self, device: str = 'cpu', trace: bool = False):
+        self.device = device
+        self.frames = 0
+        self.chunks = 0
+        self.sample_rate = 0
+        self.stages: Dict[str, StageStats] = {}
+        self.peak_rss_mb = 0.0
+        self.peak_device_mb = 0.0
+        self._cuda = None
+        if str(device).startswith('cuda'):
+            import torch
+            self._cuda = torch.cuda
+            self._cuda.reset_peak_memory_stats(device)
+        self._events: Optional[List[dict]] = [] if trace else None
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def reset_clock(self):
+        """Measure elapsed time from now, e.g. after startup work that should not count"""
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self._cuda is not None:
+                self._cuda.synchronize(self.device)
+            end = time.perf_counter()
+            with self._lock:
+                stats = self.stages.setdefault(name, StageStats())
+                stats.calls += 1
+                stats.seconds += end - start
+                stats.max_seconds = max(stats.max_seconds, end - start)
+                if self._events is not None:
+                    self._events.append({'name': name, 'ph': 'X', 'pid': os.getpid(),
+                                         'tid': threading.get_ident(),
+                                         'ts': (start - self._start) * 1e6, 'dur': (end - start) * 1e6})
+
+    def chunk_done(self, frames: int):
+        """Count one finished chunk of frames (per channel) and sample the memory peaks"""
+        rss = peak_rss_mb()
+        device = self._cuda.max_memory_allocated(self.device) / (1 << 20) if self._cuda is not None else 0.0
+        with self._lock:
+            self.frames += frames
+            self.chunks += 1
+            self.peak_rss_mb = max(self.peak_rss_mb, rss)
+            self.peak_device_mb = max(self.peak_device_mb, device)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    @property
+    def frames_per_s(self) -> float:
+        return self.frames / max(self.elapsed, 1e-9)
+
+    @property
+    def realtime_factor(self) -> float:
+        """Seconds of audio processed per wall-clock second"""
+        return self.frames_per_s / self.sample_rate if self.sample_rate else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {name: {'calls': s.calls, 'seconds': s.seconds, 'max_ms': s.max_seconds * 1e3}
+                      for name, s in self.stages.items()}
+            return {
+                'device': str(self.device),
+                'elapsed_s': self.elapsed,
+                'chunks': self.chunks,
+                'frames': self.frames,
+                'frames_per_s': self.frames_per_s,
+                'realtime_factor': self.realtime_factor,
+                'peak_rss_mb': self.peak_rss_mb,
+                'peak_device_mb': self.peak_device_mb,
+                'stages': stages,
+            }
+
+    def summary(self) -> str:
+        snap = self.snapshot()
+        elapsed = max(snap['elapsed_s'], 1e-9)
+        lines = [f"{snap['frames']} frames in {snap['chunks']} chunks, {elapsed:.2f} s: "
+                 f"{snap['frames_per_s'] / 1e6:.2f} M frames/s ({snap['realtime_factor']:.1f}x real time), "
+                 f"peak RSS {snap['peak_rss_mb']:.0f} MiB"
+                 + (f", peak device {snap['peak_device_mb']:.0f} MiB" if self._cuda is not None else "")]
+        for name, stage in sorted(snap['stages'].items(), key=lambda item: -item[1]['seconds']):
+            lines.append(f"  {name:<14} {stage['seconds']:>8.3f} s {100 * stage['seconds'] / elapsed:>5.1f}% "
+                         f"{stage['calls']:>6} calls  max {stage['max_ms']:.1f} ms")
+        return "\n".join(lines)
+
+    def save_trace(self, path: str):
+        """Write the stage intervals as Chrome trace-event JSON (chrome://tracing, Perfetto) plus the snapshot"""
+        with self._lock:
+            events = list(self._events or ())
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': self.snapshot()}, f)
+
+
+@contextmanager
+def stage(instrument: Optional[Instrument], name: str) -> Iterator[None]:
+    """instrument.stage(name), or nothing without an instrument"""
+    if instrument is None:
+        yield
+    else:
+        with instrument.stage(name):
+            yield
+
+
+T = TypeVar('T')
+
+
+def timed_iter(iterable: Iterable[T], instrument: Optional[Instrument], name: str) -> Iterator[T]:
+    """iterable, with the time spent producing each item charged to stage name"""
+    iterator = iter(iterable)
+    while True:
+        with stage(instrument, name):
+            item = next(iterator, None)
+        if item is None:
+            return
+        yield item
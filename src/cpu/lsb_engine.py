@@ -0,0 +1,84 @@
+from typing import Optional
+
+import torch
+
+
+class LSBEngine:
+    """Embeds a packed bitstream into the low num_bits of int16 PCM.
+
+    Works on int16 tensors end to end, with no float round trip. embed_()
+    and embed_bytes_() modify the caller's buffer in place, and the symbol
+    scratch space is preallocated and grown only when a larger block comes
+    in, so the steady-state hot loop does no allocation. Bytes are split
+    MSB-first into 8 // num_bits symbols, one per sample, in the buffer's
+    flattened (contiguous) order.
+    """
+
+    def __init__(self, num_bits: int = 2, max_samples: int = 1 << 16, device: str = 'cpu'):
+        if num_bits not in (1, 2, 4, 8):
+            raise ValueError(f"num_bits must divide 8, got {num_bits}")
+        self.num_bits = num_bits
+        self.device = device
+        self.mask = (1 << num_bits) - 1
+        self.keep = ~self.mask
+        self.symbols_per_byte = 8 // num_bits
+        self.shifts = torch.arange(8 - num_bits, -1, -num_bits, dtype=torch.uint8, device=device)
+        self._symbols = torch.empty(0, dtype=torch.uint8, device=device)
+        self._bytes = torch.empty(0, dtype=torch.uint8, device=device)
+        self._reserve(max_samples)
+
+    def _reserve(self, samples: int):
+        if self._symbols.numel() < samples:
+            whole = -(-samples // self.symbols_per_byte)
+            self._symbols = torch.empty(whole * self.symbols_per_byte, dtype=torch.uint8, device=self.device)
+            self._bytes = torch.empty(whole, dtype=torch.uint8, device=self.device)
+
+    def capacity_bytes(self, samples: int) -> int:
+        return samples // self.symbols_per_byte
+
+    def unpack(self, payload: torch.Tensor, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Split uint8 payload into num_bits symbols, MSB first"""
+        count = payload.numel() * self.symbols_per_byte
+        if out is None:
+            self._reserve(count)
+            out = self._symbols[:count]
+        grid = out.view(-1, self.symbols_per_byte)
+        torch.bitwise_right_shift(payload.reshape(-1, 1), self.shifts, out=grid)
+        return out.bitwise_and_(self.mask)
+
+    def pack(self, symbols: torch.Tensor, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Inverse of unpack; symbols.numel() must be a multiple of symbols_per_byte"""
+        grid = symbols.reshape(-1, self.symbols_per_byte)
+        if out is None:
+            self._reserve(symbols.numel())
+            out = self._bytes[:grid.shape[0]]
+        # Horner over the strided columns keeps every step in place
+        out.copy_(grid[:, 0])
+        for column in range(1, self.symbols_per_byte):
+            out.bitwise_left_shift_(self.num_bits).bitwise_or_(grid[:, column])
+        return out
+
+    def embed_(self, pcm: torch.Tensor, symbols: torch.Tensor) -> torch.Tensor:
+        """Overwrite the low bits of the first symbols.numel() samples of pcm in place"""
+        flat = pcm.view(-1)[:symbols.numel()]
+        return flat.bitwise_and_(self.keep).bitwise_or_(symbols)
+
+    def embed_bytes_(self, pcm: torch.Tensor, payload: torch.Tensor) -> int:
+        """Embed as much of payload as fits into pcm in place; returns bytes written"""
+        written = min(payload.numel(), self.capacity_bytes(pcm.numel()))
+        self.embed_(pcm, self.unpack(payload[:written]))
+        return written
+
+    def extract(self, pcm: torch.Tensor, out: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Low num_bits of every sample as uint8 symbols"""
+        flat = pcm.reshape(-1)
+        if out is None:
+            self._reserve(flat.numel())
+            out = self._symbols[:flat.numel()]
+        torch.bitwise_and(flat, self.mask, out=out)
+        return out
+
+    def extract_bytes(self, pcm: torch.Tensor, num_bytes: Optional[int] = None) -> torch.Tensor:
+        num_bytes = self.capacity_bytes(pcm.numel()) if num_bytes is None else num_bytes
+        symbols = self.extract(pcm.reshape(-1)[:num_bytes * self.symbols_per_byte])
+        return self.pack(symbols)
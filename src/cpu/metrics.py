@@ -0,0 +1,111 @@
+from typing import Optional
+
+import torch
+
+
+def snr_db(reference: torch.Tensor, test: torch.Tensor) -> float:
+    """Signal-to-noise ratio of test against reference, in dB"""
+    noise = (test - reference).pow(2).sum()
+    signal = reference.pow(2).sum()
+    return (10 * torch.log10(signal / noise.clamp(min=1e-20))).item()
+
+
+def payload_accuracy(secret: torch.Tensor, recovered: torch.Tensor) -> float:
+    """Pearson correlation of the recovered payload with the secret, floored at 0"""
+    length = min(secret.shape[-1], recovered.shape[-1])
+    a = secret[..., :length].flatten().double()
+    b = recovered[..., :length].flatten().double()
+    a, b = a - a.mean(), b - b.mean()
+    denom = (a.norm() * b.norm()).clamp(min=1e-20)
+    return max(0.0, (a @ b / denom).item())
+
+
+class StreamingSNR:
+    """SNR and segmental SNR of a stack of test signals against one reference, fed chunk by chunk.
+
+    update() takes reference (..., T) and test (G, ..., T), one row per grid
+    point, so every point is scored in the same few tensor ops. Segments of
+    segment samples are scored once complete and clamped to [floor, ceiling]
+    dB, as usual for segmental SNR; the tail carries over to the next chunk.
+    Accumulators from different files combine with merge().
+    """
+
+    def __init__(self, points: int, segment: int = 320, floor: float = -10.0, ceiling: float = 35.0):
+        self.segment = segment
+        self.floor = floor
+        self.ceiling = ceiling
+        self.signal = torch.zeros(points, dtype=torch.float64)
+        self.noise = torch.zeros(points, dtype=torch.float64)
+        self.segment_sum = torch.zeros(points, dtype=torch.float64)
+        self.segments = 0
+        self._reference: Optional[torch.Tensor] = None
+        self._error: Optional[torch.Tensor] = None
+
+    def update(self, reference: torch.Tensor, test: torch.Tensor):
+        reference = reference.double()
+        error = test.double() - reference
+        self.signal += reference.pow(2).sum()
+        self.noise += error.flatten(1).pow(2).sum(1)
+
+        if self._reference is not None:
+            reference = torch.cat((self._reference, reference), dim=-1)
+            error = torch.cat((self._error, error), dim=-1)
+        whole = reference.shape[-1] // self.segment * self.segment
+        self._reference, self._error = reference[..., whole:], error[..., whole:]
+        if whole == 0:
+            return
+        signal = reference[..., :whole].unflatten(-1, (-1, self.segment)).pow(2).sum(-1)
+        noise = error[..., :whole].unflatten(-1, (-1, self.segment)).pow(2).sum(-1)
+        ratio = 10 * torch.log10(signal.clamp(min=1e-20) / noise.clamp(min=1e-20))
+        self.segment_sum += ratio.clamp(self.floor, self.ceiling).flatten(1).sum(1)
+        self.segments += signal.numel()
+
+    def merge(self, other: 'StreamingSNR'):
+        self.signal += other.signal
+        self.noise += other.noise
+        self.segment_sum += other.segment_sum
+        self.segments += other.segments
+
+    def snr_db(self) -> torch.Tensor:
+        return 10 * torch.log10(self.signal / self.noise.clamp(min=1e-20))
+
+    def seg_snr_db(self) -> torch.Tensor:
+        return self.segment_sum / max(1, self.segments)
+
+
+class StreamingCorrelation:
+    """payload_accuracy for a stack of recovered signals, accumulated chunk by chunk.
+
+    update() takes the secret (..., T) and recovered (G, ..., T); only the
+    running sums behind Pearson's r are kept, in float64.
+    """
+
+    def __init__(self, points: int):
+        self.count = 0
+        self.sum_a = torch.zeros((), dtype=torch.float64)
+        self.sum_aa = torch.zeros((), dtype=torch.float64)
+        self.sum_b = torch.zeros(points, dtype=torch.float64)
+        self.sum_bb = torch.zeros(points, dtype=torch.float64)
+        self.sum_ab = torch.zeros(points, dtype=torch.float64)
+
+    def update(self, secret: torch.Tensor, recovered: torch.Tensor):
+        a = secret.double().flatten()
+        b = recovered.double().flatten(1)
+        self.count += a.numel()
+        self.sum_a += a.sum()
+        self.sum_aa += a @ a
+        self.sum_b += b.sum(1)
+        self.sum_bb += b.pow(2).sum(1)
+        self.sum_ab += b @ a
+
+    def merge(self, other: 'StreamingCorrelation'):
+        self.count += other.count
+        for name in ('sum_a', 'sum_aa', 'sum_b', 'sum_bb', 'sum_ab'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def value(self) -> torch.Tensor:
+        n = max(1, self.count)
+        cov = self.sum_ab - self.sum_a * self.sum_b / n
+        var_a = self.sum_aa - self.sum_a ** 2 / n
+        var_b = self.sum_bb - self.sum_b ** 2 / n
+        return (cov / (var_a * var_b).sqrt().clamp(min=1e-20)).clamp(min=0.0)
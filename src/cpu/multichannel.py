@@ -0,0 +1,93 @@
+"""One secret spread across the channels of a multichannel cover.
+
+A C-channel cover can carry a mono secret C times as long as itself: the
+secret is cut into blocks of `block` samples that are dealt to the
+channels in turn, so within frame block b channel c holds secret samples
+[(b * C + c) * block, (b * C + c + 1) * block). The layout is plain index
+arithmetic over the whole (channels, frames) tensor, so every method
+still runs once over all channels. Chunks that start on a block boundary
+map to a contiguous run of the secret, which lets files be spread and
+gathered chunk by chunk.
+
+This is a layout change for capacity, not a speedup: the work per
+audio-second still grows linearly with the channel count, and running all
+channels in one call measures no faster than a per-channel loop on CPU
+(benchmarks/bench_multichannel.py).
+"""
+from typing import Optional
+
+import torch
+
+DEFAULT_BLOCK = 2048
+
+
+def fit_channels(secret: torch.Tensor, channels: int) -> torch.Tensor:
+    """secret as (channels, samples): as is if the counts match, else mixed to mono and repeated"""
+    secret = secret if secret.dim() == 2 else secret.reshape(-1, secret.shape[-1])
+    if secret.shape[0] != channels:
+        secret = secret.mean(dim=0, keepdim=True).expand(channels, -1)
+    return secret
+
+
+def spread_index(frames: int, channels: int, block: int = DEFAULT_BLOCK,
+                 device: Optional[torch.device] = None) -> torch.Tensor:
+    """(channels, frames) positions in the secret stream of each cover sample"""
+    t = torch.arange(frames, device=device)
+    c = torch.arange(channels, device=device).unsqueeze(1)
+    return ((t // block) * channels + c) * block + t % block
+
+
+def spread_frames(samples: int, channels: int, block: int = DEFAULT_BLOCK) -> int:
+    """Cover frames needed to carry samples of secret"""
+    return -(-samples // (channels * block)) * block
+
+
+def spread(secret: torch.Tensor, channels: int, frames: Optional[int] = None,
+           block: int = DEFAULT_BLOCK) -> torch.Tensor:
+    """Deal a secret (mixed to mono) out over channels; (channels, frames), zero past its end"""
+    stream = secret.reshape(-1, secret.shape[-1]).mean(dim=0)
+    frames = spread_frames(stream.numel(), channels, block) if frames is None else frames
+    index = spread_index(frames, channels, block, stream.device)
+    padded = torch.nn.functional.pad(stream, (0, max(0, int(index.max()) + 1 - stream.numel())))
+    return padded[index]
+
+
+def gather(lanes: torch.Tensor, length: Optional[int] = None, block: int = DEFAULT_BLOCK) -> torch.Tensor:
+    """Inverse of spread: (channels, frames) -> (1, length) secret stream.
+
+    Without length, the stream runs to the last position the lanes hold;
+    after a partial final block that includes gaps the cover had no room for.
+    """
+    channels, frames = lanes.shape[-2], lanes.shape[-1]
+    index = spread_index(frames, channels, block, lanes.device)
+    stream = lanes.new_zeros(int(index.max()) + 1)
+    stream[index.reshape(-1)] = lanes.reshape(-1)
+    return (stream if length is None else stream[:length]).unsqueeze(0)
+
+
+class ChannelGatherer:
+    """gather() for a stream of recovered chunks of any length.
+
+    Whole blocks are reassembled as soon as they are in, starting from
+    frame 0, so decoders that lag (echo's extract_chunk) need no alignment
+    of their own; flush() returns the final partial block.
+    """
+
+    def __init__(self, block: int = DEFAULT_BLOCK):
+        self.block = block
+        self._pending: Optional[torch.Tensor] = None
+
+    def push(self, lanes: torch.Tensor) -> torch.Tensor:
+        if self._pending is not None:
+            lanes = torch.cat((self._pending, lanes), dim=-1)
+        whole = lanes.shape[-1] // self.block * self.block
+        self._pending = lanes[..., whole:]
+        if whole == 0:
+            return lanes.new_zeros(1, 0)
+        return gather(lanes[..., :whole], block=self.block)
+
+    def flush(self) -> torch.Tensor:
+        pending, self._pending = self._pending, None
+        if pending is None or pending.shape[-1] == 0:
+            return torch.zeros(1, 0)
+        return gather(pending, block=self.block)
@@ -0,0 +1,150 @@
+"""Framed byte payloads for the bit-carrying (lsb) channel.
+
+A frame is a 12-byte header - magic b'RTAS', payload length and CRC32 of
+the payload, both big-endian uint32 - followed by the payload bytes. Frames
+are split into num_bits symbols MSB first, one per sample in interleaved
+(frame-major) order, matching LSBEngine. Packing is whole-array NumPy
+(unpackbits/packbits and column shifts); nothing loops per bit or per byte.
+"""
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import numpy as np
+
+MAGIC = b'RTAS'
+HEADER = struct.Struct('>4sII')
+
+
+class PayloadError(ValueError):
+    """The carrier holds no valid frame: wrong magic, truncated or failed checksum"""
+
+
+def frame(data: bytes) -> bytes:
+    return HEADER.pack(MAGIC, len(data), zlib.crc32(data)) + bytes(data)
+
+
+def _check_bits(num_bits: int):
+    if num_bits not in (1, 2, 4, 8):
+        raise ValueError(f"num_bits must divide 8, got {num_bits}")
+
+
+def bytes_to_symbols(data: bytes, num_bits: int) -> np.ndarray:
+    """uint8 symbols of num_bits each, MSB first"""
+    _check_bits(num_bits)
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if num_bits == 1:
+        return np.unpackbits(raw)
+    shifts = np.arange(8 - num_bits, -1, -num_bits, dtype=np.uint8)
+    return ((raw.reshape(-1, 1) >> shifts) & ((1 << num_bits) - 1)).reshape(-1)
+
+
+def symbols_to_bytes(symbols: np.ndarray, num_bits: int) -> bytes:
+    """Inverse of bytes_to_symbols; len(symbols) must be a multiple of 8 // num_bits"""
+    _check_bits(num_bits)
+    if num_bits == 1:
+        return np.packbits(symbols.astype(np.uint8)).tobytes()
+    grid = symbols.astype(np.uint8).reshape(-1, 8 // num_bits)
+    # Horner over the symbol columns: a handful of whole-array ops per call
+    out = grid[:, 0].copy()
+    for column in range(1, grid.shape[1]):
+        out <<= num_bits
+        out |= grid[:, column]
+    return out.tobytes()
+
+
+def unframe(framed: bytes) -> bytes:
+    if len(framed) < HEADER.size:
+        raise PayloadError(f"{len(framed)} bytes is shorter than the {HEADER.size}-byte header")
+    magic, length, crc = HEADER.unpack_from(framed)
+    if magic != MAGIC:
+        raise PayloadError("No payload frame found (bad magic)")
+    data = bytes(framed[HEADER.size:HEADER.size + length])
+    if len(data) < length:
+        raise PayloadError(f"Payload truncated: header says {length} bytes, carrier holds {len(data)}")
+    if zlib.crc32(data) != crc:
+        raise PayloadError("Payload checksum mismatch")
+    return data
+
+
+class PayloadReader:
+    """Reassembles a frame from symbols pushed chunk by chunk.
+
+    push() returns True once the whole frame has arrived, so callers can stop
+    reading the carrier early. Bad magic is reported as soon as the header is
+    in, rather than after scanning the whole file.
+    """
+
+    def __init__(self, num_bits: int = 2):
+        _check_bits(num_bits)
+        self.num_bits = num_bits
+        self.symbols_per_byte = 8 // num_bits
+        self.length: Optional[int] = None
+        self._bytes = bytearray()
+        self._leftover = np.empty(0, dtype=np.uint8)
+
+    @property
+    def done(self) -> bool:
+        return self.length is not None and len(self._bytes) >= HEADER.size + self.length
+
+    @property
+    def symbols_needed(self) -> int:
+        """Symbols still to come (a lower bound until the header is in)"""
+        total = HEADER.size + (self.length or 0)
+        return max(0, (total - len(self._bytes)) * self.symbols_per_byte - len(self._leftover))
+
+    def push(self, symbols: np.ndarray) -> bool:
+        if self.done:
+            return True
+        symbols = np.concatenate((self._leftover, symbols.reshape(-1)))
+        whole = len(symbols) // self.symbols_per_byte * self.symbols_per_byte
+        self._bytes += symbols_to_bytes(symbols[:whole], self.num_bits)
+        self._leftover = symbols[whole:]
+        if self.length is None and len(self._bytes) >= HEADER.size:
+            magic, self.length, _ = HEADER.unpack_from(self._bytes)
+            if magic != MAGIC:
+                raise PayloadError("No payload frame found (bad magic)")
+        return self.done
+
+    def result(self) -> bytes:
+        return unframe(self._bytes)
+
+
+@dataclass
+class CapacityPlan:
+    method: str
+    num_frames: int
+    num_channels: int
+    sample_rate: int
+    bits: int
+    payload_bytes: int
+    bits_per_second: float
+    note: str = ''
+
+    def summary(self) -> str:
+        text = (f"{self.method}: {self.bits} bits ({self.payload_bytes} payload bytes after the "
+                f"{HEADER.size}-byte header), {self.bits_per_second / 1000:.1f} kbps")
+        return f"{text}; {self.note}" if self.note else text
+
+
+def plan_capacity(num_frames: int, num_channels: int, sample_rate: int, method: str = 'lsb',
+                  params: Optional[Dict[str, float]] = None) -> CapacityPlan:
+    """How many payload bytes a cover carries with method and its ALGORITHM_PARAMS.
+
+    Only lsb carries bits: fft and echo embed a secret waveform whose decoded
+    form still contains the cover, so they have no byte capacity.
+    """
+    if params is None:
+        from gpu.config import GPUConfig
+        params = GPUConfig.ALGORITHM_PARAMS[method]
+    if method == 'lsb':
+        num_bits = int(params.get('num_bits', 2))
+        _check_bits(num_bits)
+        bits = num_frames * num_channels * num_bits
+        return CapacityPlan(method, num_frames, num_channels, sample_rate, bits,
+                            max(0, bits // 8 - HEADER.size), sample_rate * num_channels * num_bits)
+    if method in ('fft', 'echo'):
+        return CapacityPlan(method, num_frames, num_channels, sample_rate, 0, 0, 0.0,
+                            note=f"{method} hides an audio secret and cannot carry a byte payload")
+    raise ValueError(f"Unknown method: {method}")
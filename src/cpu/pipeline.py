@@ -0,0 +1,255 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional
+
+import torch
+
+
+class RingBuffer:
+    """Preallocated (channels, capacity) sample ring shared by two threads.
+
+    write() never blocks: if the samples do not fit they are dropped and
+    counted as an overrun, as a capture device would. read() waits up to
+    timeout for a full block and counts an underrun when it has to give up.
+    """
+
+    def __init__(self, channels: int, capacity: int, dtype: torch.dtype = torch.float32):
+        self.buffer = torch.zeros(channels, capacity, dtype=dtype)
+        self.capacity = capacity
+        self.overruns = 0
+        self.underruns = 0
+        self.max_depth = 0
+        self.closed = False
+        self._head = 0
+        self._tail = 0
+        self._cond = threading.Condition()
+
+    @property
+    def depth(self) -> int:
+        return self._head - self._tail
+
+    def write(self, data: torch.Tensor) -> bool:
+        n = data.shape[-1]
+        with self._cond:
+            if self.depth + n > self.capacity:
+                self.overruns += 1
+                return False
+            start = self._head % self.capacity
+            first = min(n, self.capacity - start)
+            self.buffer[:, start:start + first] = data[:, :first]
+            self.buffer[:, :n - first] = data[:, first:]
+            self._head += n
+            self.max_depth = max(self.max_depth, self.depth)
+            self._cond.notify_all()
+        return True
+
+    def read(self, out: torch.Tensor, timeout: Optional[float] = None) -> int:
+        """Fill out with the next out.shape[-1] samples; returns how many were read.
+
+        Once the ring is closed a short (possibly empty) final read drains it.
+        """
+        n = out.shape[-1]
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.depth >= n or self.closed, timeout):
+                self.underruns += 1
+                return 0
+            n = min(n, self.depth)
+            start = self._tail % self.capacity
+            first = min(n, self.capacity - start)
+            out[:, :first] = self.buffer[:, start:start + first]
+            out[:, first:n] = self.buffer[:, :n - first]
+            self._tail += n
+            self._cond.notify_all()
+        return n
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+@dataclass
+class PipelineStats:
+    chunks: int = 0
+    # Capture blocks the embed stage had no room for (lost input)
+    capture_overruns: int = 0
+    # Embedded blocks the playback stage had no room for (lost output), and their frames
+    playback_overruns: int = 0
+    dropped_frames: int = 0
+    underruns: int = 0
+    max_capture_depth: int = 0
+    max_playback_depth: int = 0
+    # Seconds from the arrival of the oldest input frame in each played block to the block reaching the sink
+    latencies: List[float] = field(default_factory=list)
+    algorithmic_delay: int = 0
+    sample_rate: int = 16000
+
+    @property
+    def overruns(self) -> int:
+        return self.capture_overruns + self.playback_overruns
+
+    def percentile_ms(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+
+    def summary(self) -> str:
+        return (f"{self.chunks} chunks, arrival to playback p50 {self.percentile_ms(0.5):.1f} ms, "
+                f"p99 {self.percentile_ms(0.99):.1f} ms, max {self.percentile_ms(1.0):.1f} ms "
+                f"(including {self.algorithmic_delay / self.sample_rate * 1e3:.0f} ms lookahead); "
+                f"{self.capture_overruns} capture and {self.playback_overruns} playback overruns "
+                f"({self.dropped_frames} output frames dropped), {self.underruns} underruns")
+
+
+class RealTimePipeline:
+    """Capture -> embed -> playback on three threads joined by ring buffers.
+
+    process(chunk) maps each (channels, chunk_frames) capture block to any
+    number of output samples (streaming embedders may lag); finish() returns
+    whatever they still hold at end of stream. Output frame k must be the
+    embedding of input frame k, so lagging embedders only delay it.
+
+    Latency is arrival to playback: for each played block, from the moment
+    its oldest frame arrived at the capture device (a block's frames arrive
+    over the chunk_frames / sample_rate seconds before it is delivered) to
+    the moment the block reaches the sink. It therefore includes the
+    capture block, algorithmic_delay samples of lookahead, processing and
+    queueing. Output the playback ring has no room for is dropped, as a
+    device would, and counted in the stats. An exception in any stage
+    closes both rings and is re-raised from run().
+    """
+
+    def __init__(self, source: Iterable[torch.Tensor], process: Callable[[torch.Tensor], torch.Tensor],
+                 sink, channels: int = 1, chunk_frames: int = 2048, sample_rate: int = 16000,
+                 ring_chunks: int = 8, finish: Optional[Callable[[], Optional[torch.Tensor]]] = None,
+                 algorithmic_delay: int = 0):
+        self.source = source
+        self.process = process
+        self.sink = sink
+        self.finish = finish
+        self.chunk_frames = chunk_frames
+        self.sample_rate = sample_rate
+        self.period = chunk_frames / sample_rate
+        self.capture_ring = RingBuffer(channels, ring_chunks * chunk_frames)
+        self.playback_ring = RingBuffer(channels, ring_chunks * chunk_frames)
+        self.stats = PipelineStats(algorithmic_delay=algorithmic_delay, sample_rate=sample_rate)
+        # (input frames up to the end of a captured block, delivery time)
+        self._captured = deque()
+        self._captured_total = 0
+        # (playback-ring frame, output frame) where each run of emitted output starts
+        self._produced = deque()
+        self._produced_total = 0
+        self._emitted_total = 0
+        self._played_total = 0
+        self._lock = threading.Lock()
+        self._error: Optional[BaseException] = None
+
+    def run(self) -> PipelineStats:
+        threads = [
+            threading.Thread(target=self._guard, args=(stage,), name=stage.__name__, daemon=True)
+            for stage in (self._capture, self._embed, self._playback)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+
+        self.stats.capture_overruns = self.capture_ring.overruns
+        self.stats.playback_overruns = self.playback_ring.overruns
+        self.stats.underruns = self.playback_ring.underruns
+        self.stats.max_capture_depth = self.capture_ring.max_depth
+        self.stats.max_playback_depth = self.playback_ring.max_depth
+        return self.stats
+
+    def _guard(self, stage):
+        try:
+            stage()
+        except BaseException as e:
+            self._error = e
+            self.capture_ring.close()
+            self.playback_ring.close()
+
+    def _capture(self):
+        try:
+            for chunk in self.source:
+                if self._error is not None:
+                    return
+                if self.capture_ring.write(chunk):
+                    with self._lock:
+                        self._captured_total += chunk.shape[-1]
+                        self._captured.append((self._captured_total, time.perf_counter()))
+        finally:
+            self.capture_ring.close()
+
+    def _embed(self):
+        block = torch.empty_like(self.capture_ring.buffer[:, :self.chunk_frames])
+        try:
+            while True:
+                n = self.capture_ring.read(block)
+                if n == 0 and self.capture_ring.closed:
+                    break
+                if n == 0:
+                    continue
+                self._emit(self.process(block[:, :n]))
+                self.stats.chunks += 1
+            if self.finish is not None:
+                tail = self.finish()
+                if tail is not None:
+                    self._emit(tail)
+        finally:
+            self.playback_ring.close()
+
+    def _emit(self, out: torch.Tensor):
+        n = out.shape[-1]
+        if n == 0:
+            return
+        out = out.detach().cpu()
+        written = self.playback_ring.write(out)
+        with self._lock:
+            if written:
+                self._produced.append((self._produced_total, self._emitted_total))
+                self._produced_total += n
+            else:
+                self.stats.dropped_frames += n
+            self._emitted_total += n
+
+    def _playback(self):
+        block = torch.empty_like(self.playback_ring.buffer[:, :self.chunk_frames])
+        # Before the first block arrives there is nothing to underrun
+        timeout = None
+        try:
+            while True:
+                n = self.playback_ring.read(block, timeout)
+                if n == 0:
+                    if self.playback_ring.closed:
+                        break
+                    continue
+                timeout = 2 * self.period
+                self.sink.write(block[:, :n])
+                self._record_latency(n)
+        finally:
+            self.sink.close()
+
+    def _record_latency(self, played: int):
+        # The block's oldest frame is its first; map it back through dropped output to the input frame it embeds
+        now = time.perf_counter()
+        with self._lock:
+            start, self._played_total = self._played_total, self._played_total + played
+            while len(self._produced) > 1 and self._produced[1][0] <= start:
+                self._produced.popleft()
+            if not self._produced:
+                return
+            ring_start, output_start = self._produced[0]
+            frame = output_start + start - ring_start
+            while self._captured and self._captured[0][0] <= frame:
+                self._captured.popleft()
+            if not self._captured:
+                return
+            end, delivered = self._captured[0]
+            arrived = delivered - (end - frame) / self.sample_rate
+            self.stats.latencies.append(now - arrived)
@@ -0,0 +1,137 @@
+"""Deterministic replay of the real-time path for latency and jitter profiling.
+
+Chunks come from a source paced on a clock and go through process() on
+one thread, straight to a sink. Chunk i is due one period after it
+arrives, at the moment the next one lands. On a SimulatedClock the
+schedule is virtual: measured processing time is added to the clock, so
+the same deadline misses a device would see are counted without waiting
+in real time.
+"""
+import bisect
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import torch
+
+from cpu.audio_io import FileSource, NullSink, SimulatedClock, WallClock
+
+# Bucket edges for |completion interval - period|, in milliseconds
+JITTER_EDGES_MS = (0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0)
+
+
+@dataclass
+class ReplayStats:
+    method: str = ''
+    period: float = 0.0
+    process_times: List[float] = field(default_factory=list)
+    lateness: List[float] = field(default_factory=list)
+    intervals: List[float] = field(default_factory=list)
+
+    @property
+    def chunks(self) -> int:
+        return len(self.process_times)
+
+    @property
+    def deadline_misses(self) -> int:
+        return sum(1 for late in self.lateness if late > 0)
+
+    @staticmethod
+    def _percentile_ms(values: List[float], q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e3
+
+    def percentile_ms(self, q: float) -> float:
+        """Processing-time percentile"""
+        return self._percentile_ms(self.process_times, q)
+
+    def jitter_ms(self) -> List[float]:
+        return [abs(interval - self.period) * 1e3 for interval in self.intervals]
+
+    def jitter_percentile_ms(self, q: float) -> float:
+        return self._percentile_ms([abs(interval - self.period) for interval in self.intervals], q)
+
+    def jitter_histogram(self, edges_ms: Tuple[float, ...] = JITTER_EDGES_MS) -> List[Tuple[str, int]]:
+        counts = [0] * (len(edges_ms) + 1)
+        for jitter in self.jitter_ms():
+            counts[bisect.bisect_right(edges_ms, jitter)] += 1
+        labels = [f"<{edges_ms[0]:g}"] + [f"{lo:g}-{hi:g}" for lo, hi in zip(edges_ms, edges_ms[1:])] \
+            + [f">={edges_ms[-1]:g}"]
+        return list(zip(labels, counts))
+
+    def summary(self) -> str:
+        return (f"{self.method}: {self.chunks} chunks, {self.deadline_misses} deadline misses; "
+                f"process p50 {self.percentile_ms(0.5):.2f} ms, p99 {self.percentile_ms(0.99):.2f} ms, "
+                f"max {self.percentile_ms(1.0):.2f} ms of a {self.period * 1e3:.0f} ms period; "
+                f"jitter p99 {self.jitter_percentile_ms(0.99):.2f} ms")
+
+
+def replay(source: Iterable[torch.Tensor], process: Callable[[torch.Tensor], torch.Tensor], sink=None,
+           clock=None, method: str = '', finish: Optional[Callable[[], Optional[torch.Tensor]]] = None,
+           deadline: Optional[float] = None) -> ReplayStats:
+    """Run process over every chunk of source on clock; deadline defaults to one chunk period.
+
+    clock must be the one pacing source (FileSource.clock) so arrival and
+    completion times are on the same timeline.
+    """
+    sink = sink or NullSink()
+    clock = clock or getattr(source, 'clock', None) or WallClock()
+    period = getattr(source, 'chunk_frames', 2048) / getattr(source, 'sample_rate', 16000)
+    budget = period if deadline is None else deadline
+    stats = ReplayStats(method=method, period=period)
+
+    start = clock.now()
+    previous = None
+    try:
+        for index, chunk in enumerate(source, start=1):
+            # A device hands chunk i over once its last sample is captured
+            arrival = start + index * period
+            began = time.perf_counter()
+            out = process(chunk)
+            if out is not None and out.shape[-1]:
+                sink.write(out.detach().cpu())
+            elapsed = time.perf_counter() - began
+            clock.advance(elapsed)
+
+            done = clock.now()
+            stats.process_times.append(elapsed)
+            stats.lateness.append(done - (arrival + budget))
+            if previous is not None:
+                stats.intervals.append(done - previous)
+            previous = done
+        if finish is not None:
+            tail = finish()
+            if tail is not None and tail.shape[-1]:
+                sink.write(tail.detach().cpu())
+    finally:
+        sink.close()
+    return stats
+
+
+def replay_method(method: str, cover: torch.Tensor, secret, sample_rate: int = 16000,
+                  chunk_frames: int = 2048, realtime: bool = False, device: str = 'cpu',
+                  sink=None) -> ReplayStats:
+    """Replay cover through RealTimeProcessor(method) with no audio hardware.
+
+    realtime=False paces on a SimulatedClock and finishes as fast as the
+    work allows; realtime=True sleeps through each chunk period on the wall clock.
+    """
+    from cpu.stego_encode import RealTimeProcessor
+    from cpu.frame_sync import SyncedPayload
+
+    # encode_chunk embeds a SyncedPayload with lsb whatever the method, so the timings would be lsb's
+    if isinstance(secret, (bytes, bytearray)) and method != 'lsb':
+        raise ValueError(f"{method} cannot carry a byte payload; use the lsb method")
+    clock = WallClock() if realtime else SimulatedClock()
+    source = FileSource(cover, chunk_frames, sample_rate, realtime=True, clock=clock)
+    processor = RealTimeProcessor(method, device=device, source=source, sink=sink or NullSink())
+    if isinstance(secret, (bytes, bytearray)):
+        payload = SyncedPayload(bytes(secret))
+    else:
+        payload = processor.stegano.secret_payload(secret.to(device))
+    return replay(
+        source, lambda chunk: processor.encode_chunk(chunk.to(device), payload), processor.sink, clock,
+        method=method, finish=processor.fft_stream.flush if method == 'fft' else None,
+    )
@@ -0,0 +1,180 @@
+"""Sinc resampling with cached kernels and a chunked mode that carries filter history.
+
+torchaudio.functional.resample rebuilds its windowed-sinc kernel on every
+call and needs the whole signal at once. Here the kernel lives in a
+torchaudio.transforms.Resample kept in a process-wide LRU keyed by the
+rate pair and filter parameters, so every job with the same pair reuses
+it. StreamingResampler runs that kernel over a stream of chunks,
+keeping the last few input samples between them, and its concatenated
+output equals one functional.resample call over the whole signal:
+chunking a secret no longer leaves a seam at every chunk boundary.
+"""
+import math
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import torch
+import torchaudio.transforms as T
+
+# (orig_freq, new_freq, lowpass_filter_width, rolloff, resampling_method, beta, device, dtype)
+ResamplerKey = Tuple[int, int, int, float, str, Optional[float], str, torch.dtype]
+
+
+class ResamplerCache:
+    """Process-wide LRU of Resample modules; least recently used go first past max_resamplers"""
+
+    def __init__(self, max_resamplers: int = 8):
+        self.max_resamplers = max_resamplers
+        self.hits = 0
+        self.misses = 0
+        self._resamplers: 'OrderedDict[ResamplerKey, T.Resample]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, orig_freq: int, new_freq: int, lowpass_filter_width: int = 6, rolloff: float = 0.99,
+            resampling_method: str = 'sinc_interp_hann', beta: Optional[float] = None,
+            device: str = 'cpu', dtype: torch.dtype = torch.float32) -> T.Resample:
+        key = (int(orig_freq), int(new_freq), lowpass_filter_width, rolloff, resampling_method, beta,
+               str(torch.device(device)), dtype)
+        with self._lock:
+            resampler = self._resamplers.get(key)
+            if resampler is not None:
+                self.hits += 1
+                self._resamplers.move_to_end(key)
+                return resampler
+            self.misses += 1
+            resampler = T.Resample(int(orig_freq), int(new_freq), resampling_method, lowpass_filter_width,
+                                   rolloff, beta, dtype=dtype).to(device)
+            self._resamplers[key] = resampler
+            while len(self._resamplers) > self.max_resamplers:
+                self._resamplers.popitem(last=False)
+            return resampler
+
+    def clear(self):
+        with self._lock:
+            self._resamplers.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._resamplers)
+
+
+_cache = ResamplerCache()
+
+
+def get_resampler(orig_freq: int, new_freq: int, device: str = 'cpu', dtype: torch.dtype = torch.float32,
+                  **filter_params) -> T.Resample:
+    return _cache.get(orig_freq, new_freq, device=device, dtype=dtype, **filter_params)
+
+
+def resampler_cache() -> ResamplerCache:
+    return _cache
+
+
+def resample(waveform: torch.Tensor, orig_freq: int, new_freq: int, **filter_params) -> torch.Tensor:
+    """torchaudio.functional.resample with the kernel taken from the cache"""
+    if orig_freq == new_freq:
+        return waveform
+    return get_resampler(orig_freq, new_freq, waveform.device, waveform.dtype, **filter_params)(waveform)
+
+
+def resampled_length(frames: int, orig_freq: int, new_freq: int) -> int:
+    """Frames resample() returns for frames input frames"""
+    g = math.gcd(int(orig_freq), int(new_freq))
+    return -(-frames * (new_freq // g) // (orig_freq // g))
+
+
+class StreamingResampler:
+    """resample() over a stream of (..., frames) chunks.
+
+    push() returns whatever output the chunks so far fully determine
+    (about lowpass_filter_width input periods lag behind); flush() pads the
+    end like the one-shot call and returns the rest. One instance per
+    stream: the history is per instance, the kernel is shared.
+    """
+
+    def __init__(self, orig_freq: int, new_freq: int, device: str = 'cpu', dtype: torch.dtype = torch.float32,
+                 **filter_params):
+        self.orig_freq, self.new_freq = int(orig_freq), int(new_freq)
+        self.identity = self.orig_freq == self.new_freq
+        self.resampler = None if self.identity else get_resampler(orig_freq, new_freq, device, dtype,
+                                                                  **filter_params)
+        g = math.gcd(self.orig_freq, self.new_freq)
+        self._stride = self.orig_freq // g
+        self._pushed = 0
+        self._emitted = 0
+        # Input not yet consumed, starting with the kernel's left zero padding
+        self._history: Optional[torch.Tensor] = None
+
+    def push(self, chunk: torch.Tensor) -> torch.Tensor:
+        if self.identity:
+            return chunk
+        self._pushed += chunk.shape[-1]
+        if self._history is None:
+            self._history = torch.nn.functional.pad(chunk, (self.resampler.width, 0))
+        else:
+            self._history = torch.cat((self._history, chunk), dim=-1)
+        return self._drain()
+
+    def flush(self) -> torch.Tensor:
+        if self.identity or self._history is None:
+            return torch.zeros(0)
+        target = resampled_length(self._pushed, self.orig_freq, self.new_freq)
+        self._history = torch.nn.functional.pad(self._history, (0, self.resampler.width + self._stride))
+        out = self._drain()
+        out = out[..., :max(0, target - (self._emitted - out.shape[-1]))]
+        self._history, self._pushed, self._emitted = None, 0, 0
+        return out
+
+    def _drain(self) -> torch.Tensor:
+        history, kernel = self._history, self.resampler.kernel
+        blocks = (history.shape[-1] - kernel.shape[-1]) // self._stride + 1
+        if blocks <= 0:
+            return history.new_zeros(history.shape[:-1] + (0,))
+        used = (blocks - 1) * self._stride + kernel.shape[-1]
+        flat = history[..., :used].reshape(-1, 1, used)
+        # (lanes, phases, blocks) -> (lanes, blocks * phases), as functional.resample interleaves them
+        out = torch.nn.functional.conv1d(flat, kernel, stride=self._stride).transpose(1, 2)
+        out = out.reshape(history.shape[:-1] + (-1,))
+        self._history = history[..., blocks * self._stride:]
+        self._emitted += out.shape[-1]
+        return out
+
+
+class ResampledReader:
+    """An AudioChunkReader's read(), streamed through a StreamingResampler to new_freq.
+
+    read(frames) returns frames at new_freq (fewer only at the end, None
+    once exhausted), so callers written against AudioChunkReader take it
+    unchanged, and only about one chunk of the secret is held at a time.
+    """
+
+    def __init__(self, reader, new_freq: int, device: str = 'cpu', **filter_params):
+        self.reader = reader
+        self.sample_rate = new_freq
+        self.num_channels = reader.num_channels
+        self.num_frames = resampled_length(reader.num_frames, reader.sample_rate, new_freq)
+        self._resampler = StreamingResampler(reader.sample_rate, new_freq, device, **filter_params)
+        self._pending: Optional[torch.Tensor] = None
+        self._exhausted = False
+
+    def read(self, num_frames: Optional[int] = None) -> Optional[torch.Tensor]:
+        num_frames = num_frames or self.reader.chunk_frames
+        pending = [] if self._pending is None else [self._pending]
+        have = sum(p.shape[-1] for p in pending)
+        while have < num_frames and not self._exhausted:
+            chunk = self.reader.read(max(1, resampled_length(num_frames - have, self.sample_rate,
+                                                            self.reader.sample_rate)))
+            if chunk is None:
+                self._exhausted = True
+                out = self._resampler.flush()
+            else:
+                out = self._resampler.push(chunk)
+            if out.shape[-1]:
+                pending.append(out)
+                have += out.shape[-1]
+        if not pending:
+            return None
+        stream = torch.cat(pending, dim=-1) if len(pending) > 1 else pending[0]
+        self._pending = stream[..., num_frames:] if stream.shape[-1] > num_frames else None
+        return stream[..., :num_frames]
@@ -0,0 +1,172 @@
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from cpu.audio_io import AudioChunkReader, float_to_pcm16, pcm16_to_float
+from cpu.echo_engine import EchoEngine
+from cpu.instrument import ProgressCallback, atomic_output
+from cpu.resample import ResampledReader
+from cpu.stego_decode import Decode
+from cpu.stego_encode import Encode
+from cpu.stego_file import _fit_secret, decode_file, encode_file
+from cpu.wav_mmap import MappedWav, read_wav_info
+
+DEFAULT_SHARD_FRAMES = 1 << 20
+
+# Per-process state, built once by _init_worker and reused for every shard
+_worker: Dict[str, object] = {}
+
+
+def shard_halo(frame_size: int, delay_samples: int) -> int:
+    """Overlap each shard needs so its interior matches a single pass.
+
+    An output sample depends on the STFT frames centred within frame_size / 2
+    of it, and those frames read frame_size / 2 further out; the echo taps
+    reach back delay_samples. The halo is rounded up to a whole hop so shard
+    frames stay on the global frame grid.
+    """
+    hop = frame_size // 4
+    halo = max(frame_size, delay_samples + 1)
+    return -(-halo // hop) * hop
+
+
+def plan_shards(num_frames: int, workers: int, hop: int,
+                shard_frames: Optional[int] = None) -> List[Tuple[int, int]]:
+    """Split [0, num_frames) into hop-aligned (start, stop) shards"""
+    shard_frames = shard_frames or min(DEFAULT_SHARD_FRAMES, -(-num_frames // workers))
+    shard_frames = max(hop, -(-shard_frames // hop) * hop)
+    return [(start, min(num_frames, start + shard_frames)) for start in range(0, num_frames, shard_frames)]
+
+
+def _init_worker(mode: str, method: str, frame_size: int, sample_rate: int,
+                 input_path: str, secret_path: Optional[str], output_path: str):
+    # One intra-op thread per process; the pool supplies the parallelism
+    torch.set_num_threads(1)
+    _worker.clear()
+    _worker['input'] = MappedWav(input_path)
+    _worker['output'] = MappedWav(output_path, writable=True)
+    _worker['secret'] = None
+    if secret_path is not None:
+        _worker['secret'] = np.load(secret_path, mmap_mode='r') if secret_path.endswith('.npy') \
+            else MappedWav(secret_path).array.T
+    if mode == 'encode':
+        encoder = Encode(device='cpu', frame_size=frame_size)
+        _worker['run'] = {
+            'lsb': encoder.lsb_embed,
+            'fft': encoder.fft_embed,
+            'echo': EchoEngine(sample_rate=sample_rate, device='cpu').hide,
+        }[method]
+    else:
+        decoder = Decode(device='cpu', frame_size=frame_size)
+        _worker['run'] = {
+            'lsb': decoder.decode_lsb,
+            'fft': decoder.decode_fft,
+            'echo': EchoEngine(sample_rate=sample_rate, device='cpu').extract,
+        }[method]
+
+
+def _read_frames(wav: MappedWav, start: int, stop: int) -> torch.Tensor:
+    pcm = wav.frames(start, stop)
+    return pcm16_to_float(pcm) if pcm.dtype == torch.int16 else pcm.clone()
+
+
+def _run_shard(start: int, stop: int, halo: int) -> int:
+    source, output = _worker['input'], _worker['output']
+    lo, hi = max(0, start - halo), min(source.num_frames, stop + halo)
+    audio = _read_frames(source, lo, hi)
+
+    secret = _worker['secret']
+    if secret is None:
+        result = _worker['run'](audio)
+    else:
+        part = torch.from_numpy(np.array(secret[:, lo:min(hi, secret.shape[-1])]))
+        part = pcm16_to_float(part) if part.dtype == torch.int16 else part.float()
+        result = _worker['run'](audio, _fit_secret(part, hi - lo, audio.shape[0]))
+
+    output.frames(start, stop).copy_(float_to_pcm16(result[:, start - lo:stop - lo]))
+    source.release(lo, hi)
+    output.release(start, stop)
+    return stop - start
+
+
+def _run_pool(mode: str, method: str, input_path: str, secret_path: Optional[str], output_path: str,
+              frame_size: int, workers: int, shard_frames: Optional[int],
+              progress: Optional[ProgressCallback]) -> int:
+    info = read_wav_info(input_path)
+    delay_samples = EchoEngine(sample_rate=info.sample_rate, device='cpu').delay_samples
+    halo = shard_halo(frame_size, delay_samples) if method != 'lsb' else 0
+    shards = plan_shards(info.num_frames, workers, frame_size // 4, shard_frames)
+
+    written = 0
+    # Workers fill a partial file that only replaces output_path once every shard is in
+    with atomic_output(output_path) as partial:
+        with MappedWav.create(partial, info.sample_rate, info.num_channels, info.num_frames):
+            pass
+        initargs = (mode, method, frame_size, info.sample_rate, input_path, secret_path, partial)
+        # spawn, not fork: forking a process whose torch thread pools are live can deadlock
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker,
+                                 initargs=initargs) as pool:
+            futures = [pool.submit(_run_shard, start, stop, halo) for start, stop in shards]
+            # Collected in submission order so progress reads like the chunked path
+            for index, future in enumerate(futures, start=1):
+                written += future.result()
+                if progress is not None:
+                    progress(index, len(futures))
+    return written
+
+
+def _prepare_secret(secret_path: str, sample_rate: int, scratch: str) -> str:
+    """Path workers can map the secret from, already at sample_rate"""
+    info = read_wav_info(secret_path) if secret_path.lower().endswith('.wav') else None
+    if info is not None and info.sample_rate == sample_rate:
+        return secret_path
+    path = os.path.join(scratch, 'secret.npy')
+    with AudioChunkReader(secret_path) as reader:
+        # Streamed chunk by chunk into the mapped .npy, so neither copy of the whole secret is ever in memory
+        source = reader if reader.sample_rate == sample_rate else ResampledReader(reader, sample_rate)
+        secret = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32,
+                                           shape=(source.num_channels, source.num_frames))
+        offset = 0
+        for chunk in iter(source.read, None):
+            secret[:, offset:offset + chunk.shape[-1]] = chunk.numpy()
+            offset += chunk.shape[-1]
+        secret.flush()
+        del secret
+    return path
+
+
+def sharded_encode_file(cover_path: str, secret_path: str, output_path: str, method: str = 'fft',
+                        workers: Optional[int] = None, shard_frames: Optional[int] = None,
+                        frame_size: int = 2048, progress: Optional[ProgressCallback] = None) -> int:
+    """encode_file split across a process pool; returns frames written.
+
+    Each worker maps the cover, embeds a shard plus shard_halo() frames of
+    context on each side and writes only the shard interior into the shared
+    output mapping, so the result matches one Encode call over the whole
+    file rather than the chunk-by-chunk approximation. Covers that cannot be
+    memory-mapped fall back to encode_file.
+    """
+    workers = workers or os.cpu_count() or 1
+    if read_wav_info(cover_path) is None:
+        return encode_file(cover_path, secret_path, output_path, method, progress=progress)
+    with tempfile.TemporaryDirectory() as scratch:
+        secret = _prepare_secret(secret_path, read_wav_info(cover_path).sample_rate, scratch)
+        return _run_pool('encode', method, cover_path, secret, output_path,
+                         frame_size, workers, shard_frames, progress)
+
+
+def sharded_decode_file(stego_path: str, output_path: str, method: str = 'fft',
+                        workers: Optional[int] = None, shard_frames: Optional[int] = None,
+                        frame_size: int = 2048, progress: Optional[ProgressCallback] = None) -> int:
+    """decode_file split across a process pool; see sharded_encode_file"""
+    workers = workers or os.cpu_count() or 1
+    if read_wav_info(stego_path) is None:
+        return decode_file(stego_path, output_path, method, progress=progress)
+    return _run_pool('decode', method, stego_path, None, output_path,
+                     frame_size, workers, shard_frames, progress)
@@ -1,42 +1,151 @@
+import math
+from typing import Dict, Optional, Tuple
+
 import torch
-import torchaudio
-import torchaudio.transforms as T
+
+from cpu.audio_io import float_to_pcm16
+from cpu.compiled import kernel_cache
+from cpu.echo_engine import EchoEngine
+from cpu.instrument import Instrument, stage
+from cpu.lsb_engine import LSBEngine
+from cpu.payload import PayloadReader
+from cpu.transform_cache import get_plan
+
+METHODS = ('lsb', 'fft', 'echo')
+# Methods detect_method can positively identify; anything else is UNKNOWN
+DETECTABLE = ('lsb', 'echo')
+UNKNOWN = 'unknown'
+
 
 class Decode:
-    def __init__(self, device='cuda', frame_size=2048):
+    def __init__(self, device='cuda', frame_size=2048, compiled=False, instrument: Optional[Instrument] = None,
+                 sample_rate=16000):
         self.device = device
         self.frame_size = frame_size
+        self.sample_rate = sample_rate
         self.hop_length = frame_size // 4
-        self.spectrogram = T.Spectrogram(n_fft=frame_size, hop_length=self.hop_length, power=None).to(device)
-        self.inverse_spectrogram = T.InverseSpectrogram(n_fft=frame_size, hop_length=self.hop_length).to(device)
+        self.kernels = kernel_cache() if compiled else None
+        self.instrument = instrument
+        plan = get_plan(frame_size, self.hop_length, device=device)
+        self.spectrogram = plan.spectrogram
+        self.inverse_spectrogram = plan.inverse_spectrogram
 
-    def decode_lsb(self, stego_audio: torch.Tensor, num_bits=2):
+    def decode_lsb(self, stego_audio: torch.Tensor, num_bits=2, payload=False):
+        """Low bits as a [0, 1] waveform, or with payload=True the framed bytes lsb_embed wrote"""
+        if payload:
+            return self.decode_lsb_bytes(stego_audio, num_bits)
+        if self.kernels is not None:
+            return self.kernels('decode_lsb', stego_audio, constants=(num_bits,))
         stego_int = (stego_audio * 32767).short()
         mask = (1 << num_bits) - 1
         extracted = (stego_int & mask).float() / mask
         return extracted
 
-    def decode_fft(self, stego_audio: torch.Tensor, strength=0.01):
-        spec = self.spectrogram(stego_audio)
-        phase = torch.angle(spec)
-        secret_phase = phase / strength
-        secret_spec = torch.abs(spec) * torch.exp(1j * secret_phase)
-        extracted = self.inverse_spectrogram(secret_spec, length=stego_audio.shape[-1])
-        return extracted
+    def decode_lsb_bytes(self, stego_audio: torch.Tensor, num_bits=2) -> bytes:
+        # Round, not truncate: k / 32767 * 32767 can land just below k in float32
+        pcm = float_to_pcm16(stego_audio)
+        interleaved = pcm.reshape(-1, pcm.shape[-1]).t()
+        symbols = LSBEngine(num_bits, max_samples=0, device=pcm.device).extract(interleaved)
+        reader = PayloadReader(num_bits)
+        reader.push(symbols.cpu().numpy())
+        return reader.result()
+
+    def decode_fft(self, stego_audio: torch.Tensor, strength=0.01, spec: Optional[torch.Tensor] = None):
+        if spec is None:
+            with stage(self.instrument, 'extract/stft'):
+                spec = self.spectrogram(stego_audio)
+        with stage(self.instrument, 'extract/phase'):
+            if self.kernels is not None:
+                secret_spec = torch.view_as_complex(
+                    self.kernels('scale_phase', torch.view_as_real(spec), constants=(strength,)))
+            else:
+                phase = torch.angle(spec)
+                secret_phase = phase / strength
+                secret_spec = torch.abs(spec) * torch.exp(1j * secret_phase)
+        with stage(self.instrument, 'extract/istft'):
+            return self.inverse_spectrogram(secret_spec, length=stego_audio.shape[-1])
+
+    def decode_echo(self, stego_audio: torch.Tensor, delay=0.1, decay=0.3, sample_rate=None):
+        engine = EchoEngine(delay=delay, decay=decay, sample_rate=sample_rate or self.sample_rate, device=self.device)
+        if self.kernels is not None and engine.delay_samples > 0:
+            return self.kernels('echo_extract', stego_audio, constants=(engine.delay_samples, decay))
+        return engine.extract(stego_audio)
+
+    def warmup(self, shape=(1, 2048), methods=('lsb', 'fft', 'echo')):
+        """Run each method once on a chunk of shape, compiling its kernels when compiled=True"""
+        stego = torch.zeros(shape, device=self.device)
+        extract = {'lsb': self.decode_lsb, 'fft': self.decode_fft, 'echo': self.decode_echo}
+        with torch.no_grad():
+            for method in methods:
+                extract[method](stego)
+
+    def detect_method(self, stego_audio: torch.Tensor, num_bits=2, delay=0.1, sample_rate=None,
+                      max_samples=1 << 16, threshold=0.5, max_segments=16) -> Tuple[str, float, Dict[str, float]]:
+        """Guess the embedding method from cheap statistics, without decoding.
 
-    def decode_echo(self, stego_audio: torch.Tensor, delay=0.1, decay=0.3, sample_rate=16000):
-        delay_samples = int(delay * sample_rate)
-        echo_kernel = torch.zeros(delay_samples + 1, device=self.device)
-        echo_kernel[0] = 1.0
-        echo_kernel[-1] = -decay
-        extracted = torchaudio.functional.fftconvolve(stego_audio, echo_kernel, mode='same')
-        return extracted / (1 + decay)
-
-    def decode_adaptive(self, stego_audio: torch.Tensor):
-        # Try all methods, return the one with highest variance (simple heuristic)
-        lsb = self.decode_lsb(stego_audio)
-        fft = self.decode_fft(stego_audio)
-        echo = self.decode_echo(stego_audio)
-        candidates = [lsb, fft, echo]
-        scores = [c.var().item() for c in candidates]
-        return candidates[scores.index(max(scores))]
+        Scores (each in [0, 1]):
+          lsb  - excess of int16 samples whose bits below the embedded field
+                 look like lsb_embed output over what natural audio gives
+          echo - cepstral peak at the echo delay relative to its neighbourhood,
+                 averaged over at most max_segments half-overlapping windows
+                 a few times the delay long
+        fft embedding rotates STFT phases by at most strength * pi and leaves
+        no signature a blind statistic separates from a clean cover, so it is
+        not scored. When neither score reaches threshold the result is
+        UNKNOWN with confidence 0. Returns (method, confidence, scores);
+        confidence is the winner's score times its share of the total.
+        """
+        x = stego_audio.reshape(-1, stego_audio.shape[-1])[:, :max_samples]
+
+        shift = 8 - num_bits
+        q = torch.round(x * 32767).long()
+        low = q & ((1 << shift) - 1)
+        # lsb_embed leaves (cover.short() & ~mask) below the field: 0 or +/-1
+        residue = ((low == 0) | (low == 1) | (low == (1 << shift) - 1)).float().mean()
+        chance = 3 / (1 << shift)
+        lsb_score = ((residue - chance) / (1 - chance)).clamp(0, 1)
+
+        delay_samples = int(delay * (sample_rate or self.sample_rate))
+        # Half-overlapping windows of twice the length that holds the delay and its neighbourhood
+        window = 1 << math.ceil(math.log2(4 * (delay_samples + 66)))
+        if delay_samples > 1 and window <= x.shape[-1]:
+            segments = x.unfold(-1, window, window // 2)[:, :max_segments].reshape(-1, window)
+            spectrum = torch.log(torch.fft.rfft(segments).abs() + 1e-8)
+            # The echo's cepstral peak has the same sign in every window while noise does not, so average signed
+            cepstrum = torch.fft.irfft(spectrum, n=window).mean(dim=0).abs()
+            lo, hi = max(1, delay_samples - 64), delay_samples + 65
+            neighbourhood = torch.cat((cepstrum[lo:delay_samples - 1], cepstrum[delay_samples + 2:hi]))
+            peak = cepstrum[delay_samples - 1:delay_samples + 2].max()
+            z = (peak - neighbourhood.mean()) / (neighbourhood.std() + 1e-12)
+            echo_score = (1 - torch.exp(-(z - 3).clamp(min=0) / 3))
+        else:
+            echo_score = torch.zeros((), device=x.device)
+
+        values = torch.stack((lsb_score, echo_score)).tolist()
+        scores = dict(zip(DETECTABLE, values))
+        method = max(scores, key=scores.get)
+        if scores[method] < threshold:
+            return UNKNOWN, 0.0, scores
+        confidence = scores[method] * scores[method] / (sum(values) or 1.0)
+        return method, confidence, scores
+
+    def decode_adaptive(self, stego_audio: torch.Tensor, sample_rate=None, return_confidence=False):
+        """Detect the method once, then run only that decoder.
+
+        UNKNOWN falls back to decode_fft, the default method and the one
+        detection cannot see. With return_confidence=True returns
+        (extracted, method, confidence) so a stream can pin the detected
+        method for its remaining chunks; UNKNOWN comes with confidence 0.
+        """
+        method, confidence, _ = self.detect_method(stego_audio, sample_rate=sample_rate)
+
+        if method == 'lsb':
+            extracted = self.decode_lsb(stego_audio)
+        elif method == 'echo':
+            extracted = self.decode_echo(stego_audio, sample_rate=sample_rate)
+        else:
+            extracted = self.decode_fft(stego_audio)
+
+        if return_confidence:
+            return extracted, method, confidence
+        return extracted
@@ -1,30 +1,46 @@
 import torch
-import torchaudio
-import torchaudio.transforms as T
-import sys
-from typing import Optional
+import time
+from typing import Callable, Optional, Union
+
+from cpu.audio_io import PlaybackSink, float_to_pcm16, open_capture_source, pcm16_to_float
+from cpu.compiled import kernel_cache
+from cpu.echo_engine import EchoEngine
+from cpu.frame_sync import FrameSync, SyncedPayload, SyncStats
+from cpu.instrument import Instrument, stage
+from cpu.lsb_engine import LSBEngine
+from cpu.multichannel import fit_channels, spread
+from cpu.payload import HEADER, bytes_to_symbols, frame
+from cpu.pipeline import PipelineStats, RealTimePipeline
+from cpu.stego_stream import SecretPayload, StreamingFFTEmbedder
+from cpu.transform_cache import get_plan
 
 class Encode:
-    def __init__(self, device='cuda', frame_size=2048):
+    def __init__(self, device='cuda', frame_size=2048, compiled=False, instrument: Optional[Instrument] = None,
+                 sample_rate=16000):
         self.device = device
         self.frame_size = frame_size
+        # Rate the echo delay is measured at when a call does not give one
+        self.sample_rate = sample_rate
         self.hop_length = frame_size // 4
+        # Opt-in fused kernels (cpu.compiled); None keeps every method on plain eager ops
+        self.kernels = kernel_cache() if compiled else None
+        # Opt-in stage timings (cpu.instrument) for the transforms inside fft_embed
+        self.instrument = instrument
 
-        self.spectrogram = T.Spectrogram(
-            n_fft=frame_size,
-            hop_length=self.hop_length,
-            power=None
-        ).to(device)
-
-        self.inverse_spectrogram = T.InverseSpectrogram(
-            n_fft=frame_size,
-            hop_length=self.hop_length
-        ).to(device)
+        # Shared with every other Encode/Decode on the same configuration
+        plan = get_plan(frame_size, self.hop_length, device=device)
+        self.spectrogram = plan.spectrogram
+        self.inverse_spectrogram = plan.inverse_spectrogram
 
     def lsb_embed(self,
         cover: torch.Tensor,
-        secret: torch.Tensor,
+        secret: Union[torch.Tensor, bytes],
         num_bits: int = 2) -> torch.Tensor:
+        if isinstance(secret, (bytes, bytearray, memoryview)):
+            return self.lsb_embed_bytes(cover, bytes(secret), num_bits)
+        secret = self._match_channels(cover, secret)
+        if self.kernels is not None:
+            return self.kernels('lsb_embed', cover, secret, constants=(num_bits,))
         scale_factor = 2**(16 - num_bits)
         secret_quantized = torch.round(secret * scale_factor).short()
         mask = (0xFF << (8 - num_bits)) & 0xFF
@@ -33,71 +49,181 @@ class Encode:
         stego_int = (cover_int & ~mask) | (secret_quantized << (8 - num_bits))
         return stego_int.float() / 32767.0
 
-    def fft_embed(self, cover: torch.Tensor, secret: torch.Tensor, strength: float = 0.01) -> torch.Tensor:
-        spec = self.spectrogram(cover)
-        secret_spec = self.spectrogram(secret)
-
-        phase_noise = strength * secret_spec.angle()
-        modified_spec = spec * torch.exp(1j * phase_noise)
-        return self.inverse_spectrogram(modified_spec, cover.shape[-1])
+    def lsb_embed_bytes(self, cover: torch.Tensor, data: bytes, num_bits: int = 2) -> torch.Tensor:
+        """Frame data and write it into the low num_bits of the cover's int16 samples, frame-major"""
+        pcm = float_to_pcm16(cover)
+        interleaved = pcm.reshape(-1, pcm.shape[-1]).t().contiguous()
+        engine = LSBEngine(num_bits, max_samples=0, device=pcm.device)
+        capacity = max(0, engine.capacity_bytes(interleaved.numel()) - HEADER.size)
+        if len(data) > capacity:
+            raise ValueError(f"Payload of {len(data)} bytes exceeds the cover's {capacity}-byte capacity")
+        symbols = torch.from_numpy(bytes_to_symbols(frame(data), num_bits)).to(pcm.device)
+        engine.embed_(interleaved, symbols)
+        return pcm16_to_float(interleaved.t().reshape(pcm.shape))
+
+    @staticmethod
+    def _match_channels(cover: torch.Tensor, secret: torch.Tensor) -> torch.Tensor:
+        # (channels, samples) covers take any secret; other shapes must already broadcast
+        if cover.dim() == 2 and secret.shape[:-1] != cover.shape[:-1]:
+            return fit_channels(secret, cover.shape[0])
+        return secret
+
+    def secret_payload(self, secret: torch.Tensor) -> SecretPayload:
+        return SecretPayload(secret, self.frame_size, self.hop_length, device=self.device)
+
+    def fft_embed(self, cover: torch.Tensor, secret: Union[torch.Tensor, SecretPayload], strength: float = 0.01) -> torch.Tensor:
+        with stage(self.instrument, 'embed/stft'):
+            spec = self.spectrogram(cover)
+            if isinstance(secret, SecretPayload):
+                secret_phase = secret.take_phase(spec.shape[-1]).transpose(-1, -2)
+            else:
+                secret_phase = self.spectrogram(self._match_channels(cover, secret)).angle()
+
+        with stage(self.instrument, 'embed/phase'):
+            if self.kernels is not None:
+                modified_spec = torch.view_as_complex(
+                    self.kernels('rotate_phase', torch.view_as_real(spec), secret_phase, constants=(strength,)))
+            else:
+                phase_noise = strength * secret_phase
+                modified_spec = spec * torch.exp(1j * phase_noise)
+        with stage(self.instrument, 'embed/istft'):
+            return self.inverse_spectrogram(modified_spec, cover.shape[-1])
+
+    def echo_hide(self, cover: torch.Tensor, secret: torch.Tensor, delay: float = 0.1, decay: float = 0.3,
+                  sample_rate: Optional[int] = None) -> torch.Tensor:
+        engine = EchoEngine(delay=delay, decay=decay, sample_rate=sample_rate or self.sample_rate, device=self.device)
+        secret = self._match_channels(cover, secret)
+        if self.kernels is not None and engine.delay_samples > 0:
+            return self.kernels('echo_hide', cover, engine.fit(secret, cover.shape[-1]),
+                                constants=(engine.delay_samples, decay, engine.gain))
+        return engine.hide(cover, secret)
+
+    def warmup(self, shape=(1, 2048), methods=('lsb', 'fft', 'echo')):
+        """Run each method once on a chunk of shape, compiling its kernels when compiled=True"""
+        cover = torch.zeros(shape, device=self.device)
+        embed = {'lsb': self.lsb_embed, 'fft': self.fft_embed, 'echo': self.echo_hide}
+        with torch.no_grad():
+            for method in methods:
+                embed[method](cover, cover)
 
-    def echo_hide(self, cover: torch.Tensor, secret: torch.Tensor, delay: float = 0.1, decay: float = 0.3) -> torch.Tensor:
-        delay_samples = int(delay * 16000)  # 16kHz sample rate
-        echo_filter = torch.zeros(delay_samples + 1, device=self.device)
-        echo_filter[0] = 1
-        echo_filter[-1] = decay
 
-        secret_echo = torchaudio.functional.fftconvolve(secret, echo_filter)
-        padded_secret = torch.nn.functional.pad(secret_echo, (0, cover.shape[-1] - secret_echo.shape[-1]))
-        return cover + padded_secret * 0.1
+class RealTimeProcessor:
+    """Streaming encode/decode over a source and sink.
 
+    Without a source the default capture device is opened, as before. Pass
+    a FileSource (and a NullSink or CaptureSink) to run, test or profile
+    on machines with no sound card.
+    """
 
-class RealTimeProcessor:
-    def __init__(self, method: str = 'fft', device: str = 'cuda'):
+    def __init__(self, method: str = 'fft', device: str = 'cuda', source=None, sink=None):
         self.method = method
         self.device = device
         self.stegano = Encode(device=device)
-        self.stream: Optional[torchaudio.io.StreamReader] = None
-
-        try:
-            self.stream = torchaudio.io.StreamReader(
-                src=":0",
-                format="alsa" if 'linux' in sys.platform else "avfoundation"
-            )
-            self.stream.add_basic_audio_stream(
-                frames_per_chunk=2048,
-                buffer_chunk_size=4,
-                sample_rate=16000
-            )
-        except Exception as e:
-            raise RuntimeError(f"Failed to initialize audio stream: {str(e)}") from e
-
-    def realtime_encode(self, secret_audio: torch.Tensor) -> None:
-        if self.stream is None:
-            raise RuntimeError("Audio stream not initialized")
-
-        for chunk in self.stream.stream():
-            if chunk is None or len(chunk) == 0 or chunk[0] is None:
-                continue
-
+        self.fft_stream = StreamingFFTEmbedder(
+            frame_size=self.stegano.frame_size,
+            hop_length=self.stegano.hop_length,
+            device=device
+        )
+        self.echo_stream = EchoEngine(sample_rate=16000, device=device)
+        self.source = source
+        self.sink = sink
+        self.stream = None
+
+        if source is None:
             try:
-                cover_tensor: torch.Tensor = chunk[0]
-                cover = cover_tensor.to(self.device)
-
-                secret = secret_audio[:cover.shape[-1]]
-                processed: Optional[torch.Tensor] = None
-
-                if self.method == 'lsb':
-                    processed = self.stegano.lsb_embed(cover, secret)
-                elif self.method == 'fft':
-                    processed = self.stegano.fft_embed(cover, secret)
-
-                if processed is not None:
-                    torchaudio.io.play_audio(processed.cpu(), 16000)
-
+                self.source = open_capture_source(sample_rate=16000, chunk_frames=2048)
             except Exception as e:
-                print(f"Error processing audio chunk: {str(e)}")
-                continue
+                raise RuntimeError(f"Failed to initialize audio stream: {str(e)}") from e
+            self.stream = self.source.stream
+
+    def _default_source(self, source):
+        source = source if source is not None else self.source
+        if source is None:
+            raise RuntimeError("Audio stream not initialized")
+        return source
+
+    def realtime_encode(self, secret_audio: Union[torch.Tensor, bytes], source=None, sink=None,
+                        num_bits: int = 2, spread_channels: bool = False) -> PipelineStats:
+        """Capture, embed and play back on separate threads.
+
+        source/sink default to the ones given at construction, else the
+        capture device and play_audio. With the lsb
+        method, bytes are sent as a repeating sync-marked frame that
+        realtime_decode can pick up from any point in the stream.
+        A secret with a different channel count is mixed down and repeated
+        on every channel, or with spread_channels dealt out across them.
+        An error while embedding stops every stage and is raised here.
+        """
+        source = self._default_source(source)
+        sink = sink or self.sink or PlaybackSink(16000)
+
+        channels = getattr(source, 'num_channels', 1)
+        if isinstance(secret_audio, (bytes, bytearray, memoryview)):
+            if self.method != 'lsb':
+                raise ValueError(f"{self.method} cannot carry a byte payload; use the lsb method")
+            payload = SyncedPayload(bytes(secret_audio), num_bits)
+        else:
+            secret_audio = spread(secret_audio, channels) if spread_channels \
+                else fit_channels(secret_audio, channels)
+            # One pass over the secret: phase is precomputed and the cursor advances per chunk
+            payload = self.stegano.secret_payload(secret_audio)
+
+        def process(cover: torch.Tensor) -> torch.Tensor:
+            # No per-chunk recovery: skipping a block would desync the fft overlap-add, so the error ends the run
+            return self.encode_chunk(cover.to(self.device), payload)
+
+        pipeline = RealTimePipeline(
+            source, process, sink,
+            channels=channels,
+            chunk_frames=getattr(source, 'chunk_frames', 2048),
+            sample_rate=getattr(source, 'sample_rate', 16000),
+            finish=self.fft_stream.flush if self.method == 'fft' else None,
+            algorithmic_delay=self.fft_stream.lookahead if self.method == 'fft' else 0,
+        )
+        return pipeline.run()
+
+    def realtime_decode(self, source=None, num_bits: int = 2, reference: Optional[bytes] = None,
+                        on_payload: Optional[Callable[[bytes], None]] = None) -> SyncStats:
+        """Recover the sync-marked lsb payload from a live stream, chunk by chunk.
+
+        The receiver may join mid-stream: the sync search runs until the first
+        preamble is found, after which each chunk costs one low-bit extraction
+        and a bit compare. Every decoded payload is passed to on_payload. Lock
+        time and BER are in the returned stats; the payload BER needs the
+        expected bytes as reference.
+        """
+        if self.method != 'lsb':
+            raise ValueError(f"realtime_decode reads lsb streams, not {self.method}")
+        source = self._default_source(source)
+        channels = getattr(source, 'num_channels', 1)
+        sync = FrameSync(num_bits, channels=channels, reference=reference)
+        engine = LSBEngine(num_bits, max_samples=channels * getattr(source, 'chunk_frames', 2048))
+
+        for chunk in source:
+            start = time.perf_counter()
+            pcm = float_to_pcm16(chunk.cpu()).t().contiguous()
+            for data in sync.push(engine.extract(pcm).numpy()):
+                if on_payload is not None:
+                    on_payload(data)
+            sync.stats.chunk_times.append(time.perf_counter() - start)
+        return sync.stats
+
+    def encode_chunk(self, cover: torch.Tensor, payload: Union[SecretPayload, SyncedPayload]) -> torch.Tensor:
+        if isinstance(payload, SyncedPayload):
+            return self._lsb_embed_synced(cover, payload)
+        if self.method == 'lsb':
+            return self.stegano.lsb_embed(cover, payload.take_samples(cover.shape[-1]))
+        if self.method == 'fft':
+            return self.fft_stream.push(cover, payload)
+        if self.method == 'echo':
+            return self.echo_stream.hide_chunk(cover, payload.take_samples(cover.shape[-1]))
+        raise ValueError(f"Unknown method: {self.method}")
+
+    def _lsb_embed_synced(self, cover: torch.Tensor, payload: SyncedPayload) -> torch.Tensor:
+        pcm = float_to_pcm16(cover).t().contiguous()
+        symbols = torch.from_numpy(payload.take(pcm.numel())).to(pcm.device)
+        LSBEngine(payload.num_bits, max_samples=0, device=pcm.device).embed_(pcm, symbols)
+        return pcm16_to_float(pcm.t())
 
     def _lsb_extract(self, stego: torch.Tensor) -> torch.Tensor:
         return (stego.short() & 0x03).float() / 3.0
@@ -0,0 +1,240 @@
+from typing import Dict, Optional
+
+import torch
+
+from cpu.audio_io import AudioChunkReader, MappedWavWriter
+from cpu.echo_engine import EchoEngine
+from cpu.instrument import (DEFAULT_CHUNK_FRAMES, CancelToken, Instrument, ProgressCallback, atomic_output,
+                            check_cancelled, stage, timed_iter)
+from cpu.lsb_engine import LSBEngine
+from cpu.multichannel import DEFAULT_BLOCK, ChannelGatherer, spread
+from cpu.payload import HEADER, PayloadReader, bytes_to_symbols, frame
+from cpu.resample import ResampledReader
+from cpu.stego_encode import Encode
+from cpu.stego_stream import StreamingFFTEmbedder, StreamingFFTExtractor
+from cpu.stego_decode import Decode
+
+
+def _fit_secret(secret: Optional[torch.Tensor], frames: int, channels: int) -> torch.Tensor:
+    if secret is None:
+        return torch.zeros(channels, frames)
+    if secret.shape[0] != channels:
+        secret = secret.mean(dim=0, keepdim=True).expand(channels, -1)
+    if secret.shape[-1] < frames:
+        secret = torch.nn.functional.pad(secret, (0, frames - secret.shape[-1]))
+    return secret[..., :frames]
+
+
+def _echo_engine(params: Dict[str, float], sample_rate: int, device: str) -> EchoEngine:
+    return EchoEngine(params.get('delay', 0.1), params.get('decay', 0.3), sample_rate, device=device)
+
+
+def encode_file(cover_path: str, secret_path: str, output_path: str, method: str = 'fft',
+                device: str = 'cpu', chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+                encoder: Optional[Encode] = None,
+                progress: Optional[ProgressCallback] = None, spread_channels: bool = False,
+                instrument: Optional[Instrument] = None, cancel: Optional[CancelToken] = None,
+                params: Optional[Dict[str, float]] = None) -> int:
+    """Embed secret_path into cover_path chunk by chunk, returning frames written.
+
+    Every method matches one whole-signal Encode call: fft runs through
+    StreamingFFTEmbedder, which carries the STFT state across chunks (so
+    there is no seam at chunk edges and a short final chunk is fine), and
+    echo through the EchoEngine delay line. A secret whose channel count differs from the cover's is mixed down and
+    repeated on every channel. With spread_channels it is instead dealt out
+    across the cover's channels (see cpu.multichannel), so a C-channel
+    cover carries C times as much of it; decode_file must then be given
+    spread_channels too.
+
+    instrument records the load/resample/transfer/embed/save stages of
+    every chunk (see cpu.instrument). cancel is checked before each chunk;
+    once cancelled Cancelled is raised. output_path only appears once the
+    whole file is written: a cancelled or failed call leaves it untouched.
+    params overrides the method's GPUConfig.ALGORITHM_PARAMS (num_bits,
+    strength, delay and decay).
+    """
+    encoder = encoder or Encode(device=device, instrument=instrument)
+    params = params or {}
+    if spread_channels:
+        # Chunks must start on block boundaries for chunk-wise spreading to match the whole-file layout
+        chunk_frames = -(-chunk_frames // DEFAULT_BLOCK) * DEFAULT_BLOCK
+
+    with atomic_output(output_path) as partial, \
+            AudioChunkReader(cover_path, chunk_frames) as cover_reader, \
+            AudioChunkReader(secret_path, chunk_frames) as secret_reader, \
+            MappedWavWriter(partial, cover_reader.sample_rate, cover_reader.num_channels,
+                            cover_reader.num_frames) as writer:
+        sr = cover_reader.sample_rate
+        # A secret at another rate streams through one cached sinc kernel, history carried across chunks
+        resampling = secret_reader.sample_rate != sr
+        if resampling:
+            secret_reader = ResampledReader(secret_reader, sr)
+        fft = StreamingFFTEmbedder(encoder.frame_size, encoder.hop_length, params.get('strength', 0.01), device)
+        embed = {
+            'lsb': lambda cover, secret: encoder.lsb_embed(cover, secret, params.get('num_bits', 2)),
+            'fft': fft.push,
+            # The delay line carries the echo tail across chunk boundaries
+            'echo': _echo_engine(params, sr, device).hide_chunk,
+        }[method]
+        lanes = cover_reader.num_channels if spread_channels else 1
+        secret_chunk_frames = chunk_frames * lanes
+        total = cover_reader.num_chunks
+        written = 0
+        if instrument is not None:
+            instrument.sample_rate = sr
+
+        for index, cover in enumerate(timed_iter(cover_reader, instrument, 'load'), start=1):
+            check_cancelled(cancel)
+            with stage(instrument, 'resample' if resampling else 'load'):
+                secret = secret_reader.read(secret_chunk_frames)
+            if spread_channels:
+                stream = _fit_secret(secret, cover.shape[-1] * lanes, 1)
+                secret = spread(stream, lanes, frames=cover.shape[-1])
+            else:
+                secret = _fit_secret(secret, cover.shape[-1], cover.shape[0])
+
+            with stage(instrument, 'transfer'):
+                cover, secret = cover.to(device), secret.to(device)
+            with stage(instrument, 'embed'):
+                stego = embed(cover, secret)
+            with stage(instrument, 'save'):
+                writer.write(stego)
+            written += stego.shape[-1]
+            if instrument is not None:
+                instrument.chunk_done(cover.shape[-1])
+            if progress is not None:
+                progress(index, total)
+
+        if method == 'fft':
+            # The last lookahead samples wait on frames the stream no longer has input for
+            tail = fft.flush()
+            writer.write(tail)
+            written += tail.shape[-1]
+
+    return written
+
+
+def decode_file(stego_path: str, output_path: str, method: str = 'fft',
+                device: str = 'cpu', chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+                decoder: Optional[Decode] = None,
+                progress: Optional[ProgressCallback] = None, spread_channels: bool = False,
+                instrument: Optional[Instrument] = None, cancel: Optional[CancelToken] = None,
+                params: Optional[Dict[str, float]] = None) -> int:
+    """Extract the secret from stego_path chunk by chunk, returning frames written.
+
+    fft runs through StreamingFFTExtractor, like encode_file's embedder.
+    With spread_channels the channels are reassembled into one mono secret,
+    as encode_file(spread_channels=True) laid it out. instrument, cancel
+    and params work as in encode_file.
+    """
+    decoder = decoder or Decode(device=device, instrument=instrument)
+    params = params or {}
+
+    with atomic_output(output_path) as partial, AudioChunkReader(stego_path, chunk_frames) as reader:
+        channels, frames = reader.num_channels, reader.num_frames
+        gatherer = None
+        if spread_channels:
+            gatherer = ChannelGatherer()
+            channels, frames = 1, -(-frames // DEFAULT_BLOCK) * DEFAULT_BLOCK * reader.num_channels
+        if instrument is not None:
+            instrument.sample_rate = reader.sample_rate
+
+        with MappedWavWriter(partial, reader.sample_rate, channels, frames) as writer:
+            echo = _echo_engine(params, reader.sample_rate, device)
+            fft = StreamingFFTExtractor(decoder.frame_size, decoder.hop_length, params.get('strength', 0.01), device)
+            extract = {
+                'lsb': lambda stego: decoder.decode_lsb(stego, params.get('num_bits', 2)),
+                'fft': fft.push,
+                'echo': echo.extract_chunk,
+            }[method]
+            total = reader.num_chunks
+            written = 0
+
+            def emit(extracted: torch.Tensor) -> int:
+                with stage(instrument, 'save'):
+                    if gatherer is not None:
+                        extracted = gatherer.push(extracted.cpu())
+                    writer.write(extracted)
+                return extracted.shape[-1]
+
+            for index, stego in enumerate(timed_iter(reader, instrument, 'load'), start=1):
+                check_cancelled(cancel)
+                with stage(instrument, 'transfer'):
+                    stego = stego.to(device)
+                with stage(instrument, 'extract'):
+                    extracted = extract(stego)
+                written += emit(extracted)
+                if instrument is not None:
+                    instrument.chunk_done(stego.shape[-1])
+                if progress is not None:
+                    progress(index, total)
+
+            if method == 'echo':
+                written += emit(echo.flush_extract())
+            elif method == 'fft':
+                written += emit(fft.flush())
+            if gatherer is not None:
+                tail = gatherer.flush()
+                writer.write(tail)
+                written += tail.shape[-1]
+
+    return written
+
+
+def embed_payload_file(cover_path: str, payload_path: str, output_path: str, num_bits: int = 2,
+                       chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+                       progress: Optional[ProgressCallback] = None) -> int:
+    """Write the bytes of payload_path, framed, into the low bits of cover_path; returns payload bytes.
+
+    Runs entirely on int16: each cover chunk is quantized once and the next
+    run of payload symbols is OR-ed into it in place, frame-major, so the
+    stream is independent of chunk size. Samples after the payload keep the
+    cover's own low bits.
+    """
+    with open(payload_path, 'rb') as f:
+        data = f.read()
+    engine = LSBEngine(num_bits, max_samples=chunk_frames)
+
+    with AudioChunkReader(cover_path, chunk_frames) as reader:
+        capacity = max(0, engine.capacity_bytes(reader.num_frames * reader.num_channels) - HEADER.size)
+        if len(data) > capacity:
+            raise ValueError(f"{payload_path} is {len(data)} bytes; {cover_path} carries at most {capacity} "
+                             f"with {num_bits} bits per sample")
+        symbols = torch.from_numpy(bytes_to_symbols(frame(data), num_bits))
+        total = reader.num_chunks
+        cursor = 0
+        with atomic_output(output_path) as partial, \
+                MappedWavWriter(partial, reader.sample_rate, reader.num_channels, reader.num_frames) as writer:
+            for index, pcm in enumerate(iter(reader.read_pcm, None), start=1):
+                if cursor < symbols.numel():
+                    run = symbols[cursor:cursor + pcm.numel()]
+                    engine.embed_(pcm, run)
+                    cursor += run.numel()
+                writer.write_pcm(pcm.t())
+                if progress is not None:
+                    progress(index, total)
+    return len(data)
+
+
+def extract_payload_file(stego_path: str, output_path: str, num_bits: int = 2,
+                         chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+                         progress: Optional[ProgressCallback] = None) -> int:
+    """Recover a payload written by embed_payload_file; returns payload bytes.
+
+    Stops reading as soon as the frame is complete, so a short message in a
+    long file only touches the start of it.
+    """
+    engine = LSBEngine(num_bits, max_samples=chunk_frames)
+    payload = PayloadReader(num_bits)
+    with AudioChunkReader(stego_path, chunk_frames) as reader:
+        total = reader.num_chunks
+        for index, pcm in enumerate(iter(reader.read_pcm, None), start=1):
+            done = payload.push(engine.extract(pcm).numpy())
+            if progress is not None:
+                progress(index, total)
+            if done:
+                break
+    data = payload.result()
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    return len(data)
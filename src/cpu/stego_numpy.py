@@ -0,0 +1,284 @@
+"""NumPy implementations of Encode/Decode for fast-starting, torch-free jobs.
+
+Nothing here imports torch or torchaudio. The STFT is done directly with
+NumPy on the torch grid (periodic Hann, centre reflect padding, hop of
+frame_size // 4, window-envelope normalised overlap-add), so results
+match the torch backend to float32 tolerance. scipy.signal.stft pads and
+scales differently, so it would not match.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+from cpu.instrument import (DEFAULT_CHUNK_FRAMES, CancelToken, Instrument, ProgressCallback, atomic_output,
+                            check_cancelled, stage)
+from cpu.wav_mmap import PCM16_SCALE, MappedWav
+
+# GPUConfig.ALGORITHM_PARAMS['echo'] and the EchoEngine gain, restated since gpu.config imports torch
+ECHO_DELAY = 0.1
+ECHO_DECAY = 0.3
+ECHO_GAIN = 0.1
+
+
+def pcm16_to_float(pcm: np.ndarray) -> np.ndarray:
+    return pcm.astype(np.float32) / np.float32(PCM16_SCALE)
+
+
+def float_to_pcm16(audio: np.ndarray) -> np.ndarray:
+    return np.clip(np.round(audio * PCM16_SCALE), -32768, 32767).astype(np.int16)
+
+
+def hann_window(frame_size: int) -> np.ndarray:
+    # Periodic, as torch.hann_window
+    return (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame_size) / frame_size)).astype(np.float32)
+
+
+def stft(x: np.ndarray, window: np.ndarray, hop_length: int) -> np.ndarray:
+    """(..., samples) -> (..., bins, frames) complex, like T.Spectrogram(power=None)"""
+    frame_size = window.shape[0]
+    pad = frame_size // 2
+    padded = np.pad(x, [(0, 0)] * (x.ndim - 1) + [(pad, pad)], mode='reflect')
+    frames = np.lib.stride_tricks.sliding_window_view(padded, frame_size, axis=-1)[..., ::hop_length, :]
+    return np.fft.rfft(frames * window, axis=-1).swapaxes(-1, -2)
+
+
+def istft(spec: np.ndarray, window: np.ndarray, hop_length: int, length: int) -> np.ndarray:
+    """Inverse of stft, like T.InverseSpectrogram(spec, length)"""
+    frame_size = window.shape[0]
+    frames = np.fft.irfft(spec.swapaxes(-1, -2), n=frame_size, axis=-1).astype(np.float32) * window
+    num_frames = frames.shape[-2]
+
+    # Overlap-add as a few shifted block sums: frame i, block k lands on output block i + k
+    blocks = -(-frame_size // hop_length)
+    frames = np.pad(frames, [(0, 0)] * (frames.ndim - 1) + [(0, blocks * hop_length - frame_size)])
+    frames = frames.reshape(*frames.shape[:-1], blocks, hop_length)
+    out = np.zeros((*frames.shape[:-3], num_frames + blocks - 1, hop_length), dtype=np.float32)
+    squared = np.pad(window ** 2, (0, blocks * hop_length - frame_size)).reshape(blocks, hop_length)
+    envelope = np.zeros((num_frames + blocks - 1, hop_length), dtype=np.float32)
+    for k in range(blocks):
+        out[..., k:k + num_frames, :] += frames[..., k, :]
+        envelope[k:k + num_frames] += squared[k]
+
+    start = frame_size // 2
+    out = out.reshape(*out.shape[:-2], -1)[..., start:start + length]
+    envelope = envelope.reshape(-1)[start:start + length]
+    return out / np.where(envelope > 1e-11, envelope, 1.0)
+
+
+def echo_taps(extended: np.ndarray, delay_samples: int, last: float) -> np.ndarray:
+    """y[t] = x[t] + last * x[t - D], where extended carries the D samples before x"""
+    if delay_samples == 0:
+        # Both taps land on index 0 and the second overwrites the first
+        return last * extended
+    return extended[..., delay_samples:] + last * extended[..., :-delay_samples]
+
+
+def _fit(x: np.ndarray, length: int) -> np.ndarray:
+    if x.shape[-1] < length:
+        return np.pad(x, [(0, 0)] * (x.ndim - 1) + [(0, length - x.shape[-1])])
+    return x[..., :length]
+
+
+class NumpyEncode:
+    """Encode with the torch device replaced by NumPy; same methods and defaults"""
+
+    def __init__(self, device: str = 'cpu', frame_size: int = 2048):
+        self.device = 'cpu'
+        self.frame_size = frame_size
+        self.hop_length = frame_size // 4
+        self.window = hann_window(frame_size)
+
+    def lsb_embed(self, cover: np.ndarray, secret: np.ndarray, num_bits: int = 2) -> np.ndarray:
+        scale_factor = 2 ** (16 - num_bits)
+        secret_quantized = np.round(secret * scale_factor).astype(np.int16)
+        mask = (0xFF << (8 - num_bits)) & 0xFF
+
+        cover_int = cover.astype(np.int16)
+        stego_int = (cover_int & ~mask) | (secret_quantized << (8 - num_bits))
+        return stego_int.astype(np.float32) / np.float32(PCM16_SCALE)
+
+    def fft_embed(self, cover: np.ndarray, secret: np.ndarray, strength: float = 0.01) -> np.ndarray:
+        spec = stft(cover, self.window, self.hop_length)
+        phase_noise = strength * np.angle(stft(secret, self.window, self.hop_length))
+        return istft(spec * np.exp(1j * phase_noise), self.window, self.hop_length, cover.shape[-1])
+
+    def echo_hide(self, cover: np.ndarray, secret: np.ndarray, delay: float = ECHO_DELAY, decay: float = ECHO_DECAY,
+                  sample_rate: int = 16000, gain: float = ECHO_GAIN,
+                  history: Optional[np.ndarray] = None) -> np.ndarray:
+        """history is the delay samples of secret before cover's first sample, zeros when None"""
+        delay_samples = int(delay * sample_rate)
+        secret = _fit(secret, cover.shape[-1])
+        if history is None:
+            history = np.zeros((*secret.shape[:-1], delay_samples), dtype=secret.dtype)
+        extended = np.concatenate((history, secret), axis=-1)
+        return cover + gain * echo_taps(extended, delay_samples, decay)
+
+
+class NumpyDecode:
+    """Decode with the torch device replaced by NumPy; same methods and defaults"""
+
+    def __init__(self, device: str = 'cpu', frame_size: int = 2048):
+        self.device = 'cpu'
+        self.frame_size = frame_size
+        self.hop_length = frame_size // 4
+        self.window = hann_window(frame_size)
+
+    def decode_lsb(self, stego_audio: np.ndarray, num_bits: int = 2) -> np.ndarray:
+        stego_int = (stego_audio * PCM16_SCALE).astype(np.int16)
+        mask = (1 << num_bits) - 1
+        return (stego_int & mask).astype(np.float32) / mask
+
+    def decode_fft(self, stego_audio: np.ndarray, strength: float = 0.01) -> np.ndarray:
+        spec = stft(stego_audio, self.window, self.hop_length)
+        secret_spec = np.abs(spec) * np.exp(1j * (np.angle(spec) / strength))
+        return istft(secret_spec, self.window, self.hop_length, stego_audio.shape[-1])
+
+    def decode_echo(self, stego_audio: np.ndarray, delay: float = ECHO_DELAY, decay: float = ECHO_DECAY,
+                    sample_rate: int = 16000, history: Optional[np.ndarray] = None,
+                    lookahead: Optional[np.ndarray] = None) -> np.ndarray:
+        """The extraction is aligned to look delay // 2 samples ahead and the rest of the delay behind:
+        history and lookahead are those stego samples around stego_audio, zeros when None"""
+        delay_samples = int(delay * sample_rate)
+        shift = delay_samples // 2
+        lead = stego_audio.shape[:-1]
+        if history is None:
+            history = np.zeros((*lead, delay_samples - shift), dtype=stego_audio.dtype)
+        if lookahead is None:
+            lookahead = np.zeros((*lead, shift), dtype=stego_audio.dtype)
+        extended = np.concatenate((history, stego_audio, lookahead), axis=-1)
+        return echo_taps(extended, delay_samples, -decay) / (1 + decay)
+
+
+def _read(wav: MappedWav, start: int, stop: int, channels: int) -> np.ndarray:
+    """(channels, stop - start) float32 frames, zero outside the file, mixed down like _fit_secret"""
+    lo, hi = max(0, start), min(wav.num_frames, stop)
+    out = np.zeros((wav.num_channels, stop - start), dtype=np.float32)
+    if hi > lo:
+        data = wav.array[lo:hi].T
+        out[:, lo - start:hi - start] = pcm16_to_float(data) if data.dtype == np.int16 else data
+        wav.release(lo, hi)
+    if wav.num_channels != channels:
+        out = np.broadcast_to(out.mean(axis=0, keepdims=True), (channels, out.shape[-1]))
+    return out
+
+
+def _context(start: int, stop: int, num_frames: int, frame_size: int, hop_length: int):
+    """Span around [start, stop) whose STFT matches the whole signal's on [start, stop).
+
+    Every output sample depends on input within frame_size of it, and the
+    span starts on the whole-signal frame grid, so its frames are the same
+    frames and chunk edges leave no seam.
+    """
+    lo = max(0, (start - frame_size) // hop_length * hop_length)
+    return lo, min(num_frames, stop + frame_size)
+
+
+def _open(path: str) -> MappedWav:
+    try:
+        return MappedWav(path)
+    except ValueError as e:
+        raise ValueError(f"{e}; the numpy backend only reads uncompressed WAVs, use the torch backend") from e
+
+
+def encode_file(cover_path: str, secret_path: str, output_path: str, method: str = 'fft',
+                device: str = 'cpu', chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+                encoder: Optional[NumpyEncode] = None,
+                progress: Optional[ProgressCallback] = None,
+                instrument: Optional[Instrument] = None, cancel: Optional[CancelToken] = None,
+                params: Optional[Dict[str, float]] = None) -> int:
+    """cpu.stego_file.encode_file on NumPy and memory-mapped WAVs; returns frames written.
+
+    Chunks need no carried state: echo reads its delay-line history and fft
+    its STFT context (see _context) straight from the mapped files. The
+    secret must already be at the cover's sample rate, since resampling is
+    left to the torch backend. params overrides the method's defaults as in
+    the torch backend.
+    """
+    encoder = encoder or NumpyEncode(frame_size=2048)
+    params = params or {}
+    with atomic_output(output_path) as partial, _open(cover_path) as cover_wav, _open(secret_path) as secret_wav, \
+            MappedWav.create(partial, cover_wav.sample_rate, cover_wav.num_channels,
+                             cover_wav.num_frames) as out:
+        if secret_wav.sample_rate != cover_wav.sample_rate:
+            raise ValueError(f"Secret is {secret_wav.sample_rate} Hz and cover {cover_wav.sample_rate} Hz; "
+                             f"the numpy backend does not resample, use the torch backend")
+        sample_rate, channels, num_frames = cover_wav.sample_rate, cover_wav.num_channels, cover_wav.num_frames
+        delay_samples = int(params.get('delay', ECHO_DELAY) * sample_rate)
+        total = -(-num_frames // chunk_frames)
+        if instrument is not None:
+            instrument.sample_rate = sample_rate
+
+        for index, start in enumerate(range(0, num_frames, chunk_frames), start=1):
+            check_cancelled(cancel)
+            stop = min(num_frames, start + chunk_frames)
+            lo, hi = start, stop
+            if method == 'fft':
+                lo, hi = _context(start, stop, num_frames, encoder.frame_size, encoder.hop_length)
+            with stage(instrument, 'load'):
+                cover = _read(cover_wav, lo, hi, channels)
+                secret = _read(secret_wav, lo, hi, channels)
+                if method == 'echo':
+                    history = _read(secret_wav, start - delay_samples, start, channels)
+            with stage(instrument, 'embed'):
+                if method == 'echo':
+                    stego = encoder.echo_hide(cover, secret, sample_rate=sample_rate, history=history, **params)
+                elif method == 'fft':
+                    stego = encoder.fft_embed(cover, secret, **params)[..., start - lo:stop - lo]
+                else:
+                    stego = encoder.lsb_embed(cover, secret, **params)
+            with stage(instrument, 'save'):
+                out.array[start:stop] = float_to_pcm16(stego).T
+                out.release(start, stop)
+            if instrument is not None:
+                instrument.chunk_done(stop - start)
+            if progress is not None:
+                progress(index, total)
+        return num_frames
+
+
+def decode_file(stego_path: str, output_path: str, method: str = 'fft',
+                device: str = 'cpu', chunk_frames: int = DEFAULT_CHUNK_FRAMES,
+                decoder: Optional[NumpyDecode] = None,
+                progress: Optional[ProgressCallback] = None,
+                instrument: Optional[Instrument] = None, cancel: Optional[CancelToken] = None,
+                params: Optional[Dict[str, float]] = None) -> int:
+    """cpu.stego_file.decode_file on NumPy and memory-mapped WAVs; returns frames written"""
+    decoder = decoder or NumpyDecode(frame_size=2048)
+    params = params or {}
+    with atomic_output(output_path) as partial, _open(stego_path) as stego_wav, \
+            MappedWav.create(partial, stego_wav.sample_rate, stego_wav.num_channels,
+                             stego_wav.num_frames) as out:
+        sample_rate, channels, num_frames = stego_wav.sample_rate, stego_wav.num_channels, stego_wav.num_frames
+        delay_samples = int(params.get('delay', ECHO_DELAY) * sample_rate)
+        shift = delay_samples // 2
+        total = -(-num_frames // chunk_frames)
+        if instrument is not None:
+            instrument.sample_rate = sample_rate
+
+        for index, start in enumerate(range(0, num_frames, chunk_frames), start=1):
+            check_cancelled(cancel)
+            stop = min(num_frames, start + chunk_frames)
+            lo, hi = start, stop
+            if method == 'fft':
+                lo, hi = _context(start, stop, num_frames, decoder.frame_size, decoder.hop_length)
+            with stage(instrument, 'load'):
+                stego = _read(stego_wav, lo, hi, channels)
+                if method == 'echo':
+                    history = _read(stego_wav, start + shift - delay_samples, start, channels)
+                    lookahead = _read(stego_wav, stop, stop + shift, channels)
+            with stage(instrument, 'extract'):
+                if method == 'echo':
+                    extracted = decoder.decode_echo(stego, sample_rate=sample_rate, history=history,
+                                                    lookahead=lookahead, **params)
+                elif method == 'fft':
+                    extracted = decoder.decode_fft(stego, **params)[..., start - lo:stop - lo]
+                else:
+                    extracted = decoder.decode_lsb(stego, **params)
+            with stage(instrument, 'save'):
+                out.array[start:stop] = float_to_pcm16(extracted).T
+                out.release(start, stop)
+            if instrument is not None:
+                instrument.chunk_done(stop - start)
+            if progress is not None:
+                progress(index, total)
+        return num_frames
@@ -0,0 +1,316 @@
+from typing import Hashable, List, Optional, Union
+
+import torch
+
+from cpu.transform_cache import get_plan
+
+
+class SecretPayload:
+    """A secret signal with a read cursor, consumed chunk by chunk.
+
+    The secret's STFT phase is computed lazily in blocks of block_frames
+    frames (on the same frame grid as Encode.spectrogram), so each embed
+    takes the next precomputed frames instead of re-transforming a slice
+    of the secret. Reads past the end return zeros, i.e. no modification.
+    take_phase() and take_samples() keep independent cursors; a payload is
+    normally consumed through only one of them.
+    """
+
+    def __init__(self, secret: torch.Tensor, frame_size: int = 2048, hop_length: Optional[int] = None,
+                 block_frames: int = 256, device: str = 'cuda'):
+        self.secret = secret.to(device)
+        self.frame_size = frame_size
+        self.hop_length = hop_length or frame_size // 4
+        self.block_frames = block_frames
+        self.device = device
+        self.window = get_plan(frame_size, self.hop_length, device=device).window
+
+        self.num_samples = self.secret.shape[-1]
+        self.num_frames = 1 + self.num_samples // self.hop_length
+        self.frame_cursor = 0
+        self.sample_cursor = 0
+        self._padded: Optional[torch.Tensor] = None
+        self._block_index = -1
+        self._block: Optional[torch.Tensor] = None
+
+    def rewind(self):
+        self.frame_cursor = 0
+        self.sample_cursor = 0
+
+    def take_samples(self, num: int) -> torch.Tensor:
+        start = min(self.sample_cursor, self.num_samples)
+        chunk = self.secret[..., start:start + num]
+        self.sample_cursor += num
+        if chunk.shape[-1] < num:
+            chunk = torch.nn.functional.pad(chunk, (0, num - chunk.shape[-1]))
+        return chunk
+
+    def take_phase(self, num: int) -> torch.Tensor:
+        """Next num frames of secret phase, shaped (..., num, n_fft // 2 + 1)"""
+        parts = []
+        while num > 0:
+            index, offset = divmod(self.frame_cursor, self.block_frames)
+            block = self._phase_block(index)
+            part = block[..., offset:offset + num, :]
+            parts.append(part)
+            self.frame_cursor += part.shape[-2]
+            num -= part.shape[-2]
+        return parts[0] if len(parts) == 1 else torch.cat(parts, dim=-2)
+
+    def _phase_block(self, index: int) -> torch.Tensor:
+        if index == self._block_index:
+            return self._block
+
+        bins = self.frame_size // 2 + 1
+        start = index * self.block_frames
+        count = min(self.block_frames, self.num_frames - start)
+        if count <= 0:
+            block = torch.zeros(*self.secret.shape[:-1], self.block_frames, bins, device=self.device)
+        else:
+            if self._padded is None:
+                pad = self.frame_size // 2
+                self._padded = torch.nn.functional.pad(
+                    self.secret.reshape(-1, self.num_samples), (pad, pad), mode='reflect'
+                ).reshape(*self.secret.shape[:-1], -1)
+            frames = self._padded.unfold(-1, self.frame_size, self.hop_length)[..., start:start + count, :]
+            block = torch.fft.rfft(frames * self.window, dim=-1).angle()
+            if count < self.block_frames:
+                block = torch.nn.functional.pad(block, (0, 0, 0, self.block_frames - count))
+
+        self._block_index, self._block = index, block
+        return block
+
+
+class StreamingFFTEmbedder:
+    """Chunk-by-chunk equivalent of Encode.fft_embed.
+
+    Keeps the STFT analysis tail and the ISTFT overlap-add buffer between
+    calls, so each push only transforms the frames completed by the new
+    samples. Concatenating every push() result with flush() reproduces a
+    whole-signal fft_embed run (centre padding included). An output sample
+    is final once every frame overlapping it has been transformed, so
+    output trails input by lookahead (frame_size - hop_length) samples,
+    plus up to hop_length - 1 more until the next hop completes. strength
+    may also be a (rows, 1, 1) tensor, one per row of the flattened input,
+    to run several strengths over a stacked input at once (see cpu.sweep).
+    """
+
+    def __init__(self, frame_size: int = 2048, hop_length: Optional[int] = None,
+                 strength: Union[float, torch.Tensor] = 0.01, device: str = 'cuda'):
+        self.frame_size = frame_size
+        self.hop_length = hop_length or frame_size // 4
+        self.strength = strength
+        self.device = device
+        self.window = get_plan(frame_size, self.hop_length, device=device).window
+        self._env_cache = {}
+        self.reset()
+
+    def reset(self):
+        self._head: Optional[torch.Tensor] = None
+        self._bufs: Optional[torch.Tensor] = None
+        self._tails: Optional[torch.Tensor] = None
+        self._payload: Optional[SecretPayload] = None
+        self._ola: Optional[torch.Tensor] = None
+        self._env: Optional[torch.Tensor] = None
+        self._skip = self.frame_size // 2
+        self._shape = None
+        self.samples_in = 0
+        self.samples_out = 0
+
+    @property
+    def lookahead(self) -> int:
+        """Minimum samples by which push() output trails its input"""
+        return self.frame_size - self.hop_length
+
+    @property
+    def started(self) -> bool:
+        return self._bufs is not None
+
+    def push(self, cover: torch.Tensor, secret) -> torch.Tensor:
+        """Feed one chunk; returns the stego samples finalized so far.
+
+        secret is either the matching secret chunk or a SecretPayload whose
+        precomputed phase frames are consumed as cover frames complete.
+        """
+        if isinstance(secret, SecretPayload):
+            self._payload = secret
+            secret = None
+        cover, secret = self._flatten(cover, secret)
+        self.samples_in += cover.shape[-1]
+        pad = self.frame_size // 2
+
+        if not self.started:
+            pair = cover[None] if secret is None else torch.stack((cover, secret))
+            self._head = pair if self._head is None else torch.cat((self._head, pair), dim=-1)
+            if self._head.shape[-1] <= pad:
+                return self._empty()
+            head, self._head = self._head, None
+            # Reflect padding, as torch.stft(center=True) does at the start
+            self._bufs = torch.cat((head[..., 1:pad + 1].flip(-1), head), dim=-1)
+            self._tails = head[..., -(pad + 1):]
+        else:
+            self._append(cover, secret)
+
+        return self._unflatten(self._run_frames())
+
+    def flush(self) -> torch.Tensor:
+        """Emit the remaining samples and reset for the next stream"""
+        if self._shape is None:
+            return self._empty()
+        pad = self.frame_size // 2
+        total = self.samples_in
+
+        if not self.started:
+            if self._head.shape[-1] <= pad:
+                self.reset()
+                raise ValueError(f"{total} samples is too short for a {self.frame_size}-point STFT; "
+                                 f"need more than {pad}")
+            # Too short to reflect-pad incrementally; do it in one shot
+            self._bufs = torch.nn.functional.pad(self._head, (pad, pad), mode='reflect')
+        else:
+            # Reflect padding at the end, mirroring around the last sample
+            self._bufs = torch.cat((self._bufs, self._tails[..., :-1].flip(-1)), dim=-1)
+
+        out = [self._run_frames()]
+        if self._ola is not None:
+            remaining = total - self.samples_out
+            tail = self._ola[:, self._skip:self._skip + remaining] / self._env[:, self._skip:self._skip + remaining]
+            self.samples_out += tail.shape[-1]
+            out.append(tail)
+
+        result = self._unflatten(torch.cat(out, dim=-1))
+        self.reset()
+        return result
+
+    def state_key(self) -> Hashable:
+        """Embedders with equal keys hold state of the same shapes, so stack() can merge them"""
+        state = (self._head, self._bufs, self._tails, self._ola)
+        return self._shape, self._skip, tuple(None if t is None else (t.shape[0], t.shape[-1]) for t in state)
+
+    @classmethod
+    def stack(cls, embedders: List['StreamingFFTEmbedder']) -> 'StreamingFFTEmbedder':
+        """One embedder over the rows of all of embedders (equal state_key()s, secret chunks, not payloads).
+
+        push() it the covers stacked on a new leading axis, then unstack()
+        to hand each stream its advanced state back.
+        """
+        first = embedders[0]
+        merged = cls(first.frame_size, first.hop_length, first.strength, first.device)
+        merged._env_cache = first._env_cache
+        merged._skip = first._skip
+        if first._shape is not None:
+            merged._shape = (len(embedders), *first._shape)
+        for name, dim in cls._STACKED:
+            parts = [getattr(e, name) for e in embedders]
+            setattr(merged, name, None if parts[0] is None else torch.cat(parts, dim=dim))
+        return merged
+
+    def unstack(self, embedders: List['StreamingFFTEmbedder']):
+        """Split the state of a stack()ed embedder back into the embedders it was built from"""
+        for name, dim in self._STACKED:
+            value = getattr(self, name)
+            parts = [None] * len(embedders) if value is None else value.chunk(len(embedders), dim=dim)
+            for embedder, part in zip(embedders, parts):
+                setattr(embedder, name, part)
+        for embedder in embedders:
+            embedder._shape = self._shape[1:]
+            embedder._skip = self._skip
+            embedder.samples_in += self.samples_in
+            embedder.samples_out += self.samples_out
+
+    # Per-row state and the axis its rows are on
+    _STACKED = (('_head', 1), ('_bufs', 1), ('_tails', 1), ('_ola', 0), ('_env', 0))
+
+    def _append(self, cover: torch.Tensor, secret: Optional[torch.Tensor]):
+        pair = cover[None] if secret is None else torch.stack((cover, secret))
+        self._bufs = torch.cat((self._bufs, pair), dim=-1)
+        self._tails = torch.cat((self._tails, pair), dim=-1)[..., -(self.frame_size // 2 + 1):]
+
+    def _run_frames(self) -> torch.Tensor:
+        n, hop = self.frame_size, self.hop_length
+        length = self._bufs.shape[-1]
+        if length < n:
+            return self._empty_flat()
+        num = (length - n) // hop + 1
+
+        # bufs is (1 or 2, rows, samples): cover, plus the secret chunk stream if any
+        frames = self._bufs.unfold(-1, n, hop)[..., :num, :]
+        self._bufs = self._bufs[..., num * hop:]
+        spec = torch.fft.rfft(frames * self.window, dim=-1)
+        frames = torch.fft.irfft(self._modify(spec, num), n=n, dim=-1) * self.window
+
+        span = (num - 1) * hop + n
+        ola = self._overlap_add(frames, span)
+        # Per row, so embedders of different streams can be stacked (see stack())
+        env = self._envelope(num).expand_as(ola).clone()
+        if self._ola is not None:
+            ola[:, :n - hop] += self._ola
+            env[:, :n - hop] += self._env
+
+        done = num * hop
+        self._ola, self._env = ola[:, done:], env[:, done:]
+        out = ola[:, :done] / env[:, :done]
+
+        skip = min(self._skip, out.shape[-1])
+        self._skip -= skip
+        out = out[:, skip:]
+        self.samples_out += out.shape[-1]
+        return out
+
+    def _modify(self, spec: torch.Tensor, num: int) -> torch.Tensor:
+        """The cover spectrum (spec[0]) rotated by the secret phase of the same frames"""
+        if self._payload is not None:
+            secret_phase = self._payload.take_phase(num)
+            secret_phase = secret_phase.reshape(-1, *secret_phase.shape[-2:])
+        else:
+            secret_phase = spec[1].angle()
+        return spec[0] * torch.polar(torch.ones_like(secret_phase), self.strength * secret_phase)
+
+    def _envelope(self, num: int) -> torch.Tensor:
+        if num not in self._env_cache:
+            span = (num - 1) * self.hop_length + self.frame_size
+            frames = self.window.square().expand(1, num, self.frame_size)
+            self._env_cache[num] = self._overlap_add(frames, span)[0]
+        return self._env_cache[num]
+
+    def _overlap_add(self, frames: torch.Tensor, span: int) -> torch.Tensor:
+        n, hop = self.frame_size, self.hop_length
+        folded = torch.nn.functional.fold(
+            frames.transpose(1, 2), output_size=(1, span), kernel_size=(1, n), stride=(1, hop)
+        )
+        return folded.reshape(frames.shape[0], span)
+
+    def _flatten(self, cover: torch.Tensor, secret: Optional[torch.Tensor]):
+        if self._shape is None:
+            self._shape = cover.shape[:-1]
+        flat = cover.reshape(-1, cover.shape[-1])
+        if secret is None:
+            return flat, None
+        return flat, secret.to(cover.dtype).expand_as(cover).reshape(flat.shape)
+
+    def _unflatten(self, flat: torch.Tensor) -> torch.Tensor:
+        return flat.reshape(*self._shape, flat.shape[-1])
+
+    def _empty_flat(self) -> torch.Tensor:
+        rows = 1
+        for size in self._shape:
+            rows *= size
+        return torch.zeros(rows, 0, device=self.device)
+
+    def _empty(self) -> torch.Tensor:
+        return self._unflatten(self._empty_flat())
+
+
+class StreamingFFTExtractor(StreamingFFTEmbedder):
+    """Chunk-by-chunk equivalent of Decode.decode_fft.
+
+    Shares the analysis/overlap-add machinery of StreamingFFTEmbedder, so
+    it has the same lookahead and the same
+    flush() contract; only the per-frame spectral step differs.
+    """
+
+    def push(self, stego: torch.Tensor, secret=None) -> torch.Tensor:
+        return super().push(stego, None)
+
+    def _modify(self, spec: torch.Tensor, num: int) -> torch.Tensor:
+        return torch.polar(spec[0].abs(), spec[0].angle() / self.strength)
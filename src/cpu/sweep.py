@@ -0,0 +1,306 @@
+"""Parameter sweeps over a corpus: embed, decode and score every grid point.
+
+Every point runs through the shipped streaming code, so scores are those
+of encode_file/decode_file: lsb through LSBEngine, fft through
+StreamingFFTEmbedder/StreamingFFTExtractor and echo through EchoEngine.
+lsb (num_bits) and fft (strength) grid points run as one batch per chunk:
+lsb points share the int16 cover, and fft points are stacked along a
+leading dimension through one embedder and extractor whose strength has a
+row per point. Echo points change the delay line length, so each one is
+its own task. Every (file, method) batch and every echo point is a unit
+of work for a process pool. Metrics are streaming accumulators that are
+merged across files, so corpus-level SNR is total signal over total
+noise rather than a mean of per-file dBs.
+"""
+import itertools
+import json
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import torch
+
+from cpu.audio_io import AudioChunkReader, float_to_pcm16, pcm16_to_float
+from cpu.echo_engine import EchoEngine
+from cpu.instrument import ProgressCallback
+from cpu.lsb_engine import LSBEngine
+from cpu.metrics import StreamingCorrelation, StreamingSNR
+from cpu.stego_stream import StreamingFFTEmbedder, StreamingFFTExtractor
+
+DEFAULT_GRID = {
+    'lsb': {'num_bits': [1, 2, 4, 8]},
+    'fft': {'strength': [0.001, 0.003, 0.01, 0.03, 0.1, 0.3]},
+    'echo': {'delay': [0.05, 0.1, 0.2], 'decay': [0.1, 0.3, 0.5, 0.7]},
+}
+STACKED = ('lsb', 'fft')
+DEFAULT_CHUNK_FRAMES = 1 << 16
+
+
+@dataclass
+class SweepPoint:
+    """Corpus-level scores for one method at one set of parameters.
+
+    accuracy is the fraction of payload bits recovered for lsb and the
+    payload_accuracy correlation for waveform methods. capacity_bps is the
+    information rate that accuracy supports: lsb's raw rate times one minus
+    the binary entropy of its bit error rate, or for waveform secrets the
+    Gaussian-channel rate 0.5 * log2(1 / (1 - r^2)) per secret sample.
+    """
+    method: str
+    params: Dict[str, float]
+    snr_db: float
+    seg_snr_db: float
+    accuracy: float
+    capacity_bps: float
+    seconds: float
+    pareto: bool = False
+
+    def summary(self) -> str:
+        params = ', '.join(f"{k}={v:g}" for k, v in self.params.items())
+        mark = ' *' if self.pareto else ''
+        return (f"{self.method:>4} {params:<24} SNR {self.snr_db:6.1f} dB  segSNR {self.seg_snr_db:6.1f} dB  "
+                f"accuracy {self.accuracy:.4f}  {self.capacity_bps / 1000:8.2f} kbps{mark}")
+
+
+@dataclass
+class _Totals:
+    """Mergeable accumulators for the grid points of one unit"""
+    method: str
+    points: List[Dict[str, float]]
+    quality: StreamingSNR
+    correlation: StreamingCorrelation
+    bits: torch.Tensor
+    bit_errors: torch.Tensor
+    samples: int = 0
+    seconds: float = 0.0
+    files: List[str] = field(default_factory=list)
+
+    def merge(self, other: '_Totals'):
+        self.quality.merge(other.quality)
+        self.correlation.merge(other.correlation)
+        self.bits += other.bits
+        self.bit_errors += other.bit_errors
+        self.samples += other.samples
+        self.seconds += other.seconds
+        self.files += other.files
+
+
+def grid_points(grid: Dict[str, Sequence[float]]) -> List[Dict[str, float]]:
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def _secret_chunk(generator: torch.Generator, shape: Tuple[int, int]) -> torch.Tensor:
+    # Same stand-in secret as the benchmark suite: deterministic per file and seed
+    return 0.3 * torch.randn(*shape, generator=generator)
+
+
+def _binary_entropy(p: torch.Tensor) -> torch.Tensor:
+    p = p.clamp(1e-12, 1 - 1e-12)
+    return -(p * torch.log2(p) + (1 - p) * torch.log2(1 - p))
+
+
+def _lsb_chunk(totals: _Totals, engines: List[LSBEngine], cover: torch.Tensor, generator: torch.Generator):
+    pcm = float_to_pcm16(cover).contiguous()
+    stegos = []
+    for index, engine in enumerate(engines):
+        symbols = torch.randint(0, engine.mask + 1, (pcm.numel(),), generator=generator, dtype=torch.uint8)
+        stego = pcm.clone()
+        engine.embed_(stego, symbols)
+        stegos.append(pcm16_to_float(stego))
+        # Decode as a reader of the written file would: back to int16, then the low bits
+        wrong = engine.extract(float_to_pcm16(stegos[-1])) ^ symbols
+        totals.bit_errors[index] += sum(((wrong >> bit) & 1).sum().item() for bit in range(engine.num_bits))
+        totals.bits[index] += pcm.numel() * engine.num_bits
+    totals.quality.update(cover, torch.stack(stegos))
+
+
+class _FFTStreams:
+    """Every strength of a unit through one stacked embedder and extractor, scored as output is finalized.
+
+    Output trails input by the streams' lookahead, so the cover and secret
+    samples not yet matched by stego or recovered output wait here.
+    """
+
+    def __init__(self, totals: _Totals, channels: int, frame_size: int):
+        strengths = torch.tensor([float(p['strength']) for p in totals.points])
+        # One row per (point, channel) of the flattened stack
+        strength = strengths.repeat_interleave(channels).view(-1, 1, 1)
+        self.totals = totals
+        self.embedder = StreamingFFTEmbedder(frame_size, strength=strength, device='cpu')
+        self.extractor = StreamingFFTExtractor(frame_size, strength=strength, device='cpu')
+        self.covers = torch.zeros(channels, 0)
+        self.secrets = torch.zeros(channels, 0)
+
+    def push(self, cover: torch.Tensor, secret: torch.Tensor):
+        self.covers = torch.cat((self.covers, cover), dim=-1)
+        self.secrets = torch.cat((self.secrets, secret), dim=-1)
+        points = len(self.totals.points)
+        self._score(self.embedder.push(cover.expand(points, *cover.shape), secret), final=False)
+
+    def flush(self):
+        self._score(self.embedder.flush(), final=True)
+
+    def _score(self, stego: torch.Tensor, final: bool):
+        stego = pcm16_to_float(float_to_pcm16(stego))
+        n = stego.shape[-1]
+        self.totals.quality.update(self.covers[:, :n], stego)
+        self.covers = self.covers[:, n:]
+        recovered = self.extractor.push(stego)
+        if final:
+            recovered = torch.cat((recovered, self.extractor.flush()), dim=-1)
+        n = recovered.shape[-1]
+        self.totals.correlation.update(self.secrets[:, :n], recovered)
+        self.secrets = self.secrets[:, n:]
+
+
+def _init_worker():
+    # One intra-op thread per process; the pool supplies the parallelism
+    torch.set_num_threads(1)
+
+
+def _run_unit(path: str, method: str, points: List[Dict[str, float]], chunk_frames: int,
+              frame_size: int, seed: int) -> _Totals:
+    with AudioChunkReader(path, chunk_frames) as reader:
+        sample_rate, channels = reader.sample_rate, reader.num_channels
+        totals = _Totals(method, points, StreamingSNR(len(points), segment=sample_rate // 50),
+                         StreamingCorrelation(len(points)),
+                         torch.zeros(len(points), dtype=torch.float64),
+                         torch.zeros(len(points), dtype=torch.float64), files=[path])
+        generator = torch.Generator().manual_seed(seed)
+        echo = fft = None
+        if method == 'lsb':
+            engines = [LSBEngine(int(p['num_bits']), max_samples=chunk_frames * channels) for p in points]
+        elif method == 'fft':
+            fft = _FFTStreams(totals, channels, frame_size)
+        else:
+            echo = EchoEngine(delay=points[0]['delay'], decay=points[0]['decay'],
+                              sample_rate=sample_rate, device='cpu')
+            # extract_chunk lags by delay // 2; hold the secret back to match
+            pending = torch.zeros(channels, 0)
+
+        with torch.no_grad():
+            for cover in reader:
+                secret = _secret_chunk(generator, tuple(cover.shape))
+                if method == 'lsb':
+                    _lsb_chunk(totals, engines, cover, generator)
+                elif method == 'fft':
+                    fft.push(cover, secret)
+                else:
+                    stego = pcm16_to_float(float_to_pcm16(echo.hide_chunk(cover, secret)))
+                    totals.quality.update(cover, stego.unsqueeze(0))
+                    pending = torch.cat((pending, secret), dim=-1)
+                    recovered = echo.extract_chunk(stego)
+                    totals.correlation.update(pending[:, :recovered.shape[-1]], recovered.unsqueeze(0))
+                    pending = pending[:, recovered.shape[-1]:]
+                totals.samples += cover.numel()
+            if fft is not None:
+                fft.flush()
+            if echo is not None:
+                recovered = echo.flush_extract()
+                totals.correlation.update(pending[:, :recovered.shape[-1]], recovered.unsqueeze(0))
+        totals.seconds = totals.samples / channels / sample_rate
+    return totals
+
+
+def _finish(totals: _Totals) -> List[SweepPoint]:
+    snr, seg_snr = totals.quality.snr_db(), totals.quality.seg_snr_db()
+    seconds = max(totals.seconds, 1e-9)
+    if totals.method == 'lsb':
+        ber = totals.bit_errors / totals.bits.clamp(min=1)
+        accuracy = 1 - ber
+        capacity = totals.bits / seconds * (1 - _binary_entropy(ber))
+    else:
+        # One secret sample rides on each cover sample
+        rate = totals.samples / seconds
+        accuracy = totals.correlation.value()
+        r2 = accuracy.pow(2).clamp(max=1 - 1e-9)
+        capacity = rate * 0.5 * torch.log2(1 / (1 - r2))
+    return [
+        SweepPoint(totals.method, dict(params), snr[i].item(), seg_snr[i].item(), accuracy[i].item(),
+                   capacity[i].item(), totals.seconds)
+        for i, params in enumerate(totals.points)
+    ]
+
+
+def pareto_frontier(points: List[SweepPoint], quality: str = 'seg_snr_db') -> Dict[str, List[SweepPoint]]:
+    """Per method, the points no other point beats on both capacity and quality, by capacity.
+
+    Segmental SNR saturates at its ceiling, so ties on quality are broken
+    by plain SNR. Also sets SweepPoint.pareto on the points it returns.
+    """
+    def score(point: SweepPoint) -> Tuple[float, float]:
+        return getattr(point, quality), point.snr_db
+
+    frontier: Dict[str, List[SweepPoint]] = {}
+    for method in dict.fromkeys(point.method for point in points):
+        candidates = sorted((p for p in points if p.method == method),
+                            key=lambda p: (-p.capacity_bps, tuple(-v for v in score(p))))
+        best = (-math.inf, -math.inf)
+        kept = []
+        # Walking down in capacity, a point survives only by beating every higher-capacity quality
+        for point in candidates:
+            point.pareto = score(point) > best
+            if point.pareto:
+                kept.append(point)
+                best = score(point)
+        frontier[method] = kept[::-1]
+    return frontier
+
+
+def sweep(corpus: Sequence[str], grid: Optional[Dict[str, Dict[str, Sequence[float]]]] = None,
+          workers: int = 1, chunk_frames: int = DEFAULT_CHUNK_FRAMES, frame_size: int = 2048,
+          seed: int = 0, quality: str = 'seg_snr_db',
+          progress: Optional[ProgressCallback] = None) -> List[SweepPoint]:
+    """Score every grid point of every method in grid over corpus.
+
+    grid maps method -> {param: values}, defaulting to DEFAULT_GRID; the
+    parameter names are those of GPUConfig.ALGORITHM_PARAMS. The payload is
+    random bits for lsb and seeded Gaussian noise, like the benchmark
+    suite's secret, for fft and echo.
+    """
+    grid = grid or DEFAULT_GRID
+    units = []
+    for method, params in grid.items():
+        if method not in DEFAULT_GRID:
+            raise ValueError(f"Unknown method: {method}")
+        points = grid_points(params)
+        batches = [points] if method in STACKED else [[point] for point in points]
+        for index, path in enumerate(corpus):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+            units += [(path, method, batch, chunk_frames, frame_size, seed + index) for batch in batches]
+
+    merged: Dict[Tuple[str, str], _Totals] = {}
+
+    def collect(totals: _Totals, done: int):
+        key = (totals.method, repr(totals.points))
+        if key in merged:
+            merged[key].merge(totals)
+        else:
+            merged[key] = totals
+        if progress is not None:
+            progress(done, len(units))
+
+    if workers <= 1:
+        for done, unit in enumerate(units, start=1):
+            collect(_run_unit(*unit), done)
+    else:
+        # spawn, not fork: forking a process whose torch thread pools are live can deadlock
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker) as pool:
+            futures = [pool.submit(_run_unit, *unit) for unit in units]
+            for done, future in enumerate(futures, start=1):
+                collect(future.result(), done)
+
+    results = [point for totals in merged.values() for point in _finish(totals)]
+    pareto_frontier(results, quality)
+    return results
+
+
+def save_results(points: List[SweepPoint], path: str):
+    with open(path, 'w') as f:
+        json.dump([asdict(point) for point in points], f, indent=2)
@@ -0,0 +1,105 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+import torch
+import torchaudio.transforms as T
+
+WINDOWS = {
+    'hann': torch.hann_window,
+    'hamming': torch.hamming_window,
+    'blackman': torch.blackman_window,
+}
+
+# (frame_size, hop_length, window, device, dtype)
+PlanKey = Tuple[int, int, str, str, torch.dtype]
+
+
+@dataclass
+class TransformPlan:
+    """Spectrogram/InverseSpectrogram pair and their shared window for one STFT configuration.
+
+    The modules hold no per-call state, so one plan is safe to share
+    between any number of Encode/Decode instances and threads.
+    """
+    key: PlanKey
+    spectrogram: T.Spectrogram
+    inverse_spectrogram: T.InverseSpectrogram
+    window: torch.Tensor
+    warm: bool = False
+
+
+class PlanCache:
+    """Process-wide LRU of TransformPlans; least recently used plans go first past max_plans"""
+
+    def __init__(self, max_plans: int = 16):
+        self.max_plans = max_plans
+        self.hits = 0
+        self.misses = 0
+        self._plans: 'OrderedDict[PlanKey, TransformPlan]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, frame_size: int, hop_length: Optional[int] = None, window: str = 'hann',
+            device: str = 'cpu', dtype: torch.dtype = torch.float32) -> TransformPlan:
+        key = (frame_size, hop_length or frame_size // 4, window, str(torch.device(device)), dtype)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self.hits += 1
+                self._plans.move_to_end(key)
+                return plan
+            self.misses += 1
+            plan = self._build(key)
+            self._plans[key] = plan
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+            return plan
+
+    @staticmethod
+    def _build(key: PlanKey) -> TransformPlan:
+        frame_size, hop_length, window, device, dtype = key
+        if window not in WINDOWS:
+            raise ValueError(f"Unknown window: {window}; expected one of {sorted(WINDOWS)}")
+        window_fn = WINDOWS[window]
+        spectrogram = T.Spectrogram(n_fft=frame_size, hop_length=hop_length, window_fn=window_fn,
+                                    power=None).to(device=device, dtype=dtype)
+        inverse = T.InverseSpectrogram(n_fft=frame_size, hop_length=hop_length,
+                                       window_fn=window_fn).to(device=device, dtype=dtype)
+        return TransformPlan(key, spectrogram, inverse, spectrogram.window)
+
+    def prewarm(self, frame_sizes: Iterable[int] = (2048,), device: str = 'cpu',
+                dtype: torch.dtype = torch.float32, window: str = 'hann'):
+        """Build plans and run each once, so the first real job skips FFT plan setup too"""
+        for frame_size in frame_sizes:
+            plan = self.get(frame_size, window=window, device=device, dtype=dtype)
+            if plan.warm:
+                continue
+            with torch.no_grad():
+                signal = torch.zeros(1, 4 * frame_size, device=device, dtype=dtype)
+                plan.inverse_spectrogram(plan.spectrogram(signal), length=signal.shape[-1])
+            plan.warm = True
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+
+_cache = PlanCache()
+
+
+def get_plan(frame_size: int, hop_length: Optional[int] = None, window: str = 'hann',
+             device: str = 'cpu', dtype: torch.dtype = torch.float32) -> TransformPlan:
+    return _cache.get(frame_size, hop_length, window, device, dtype)
+
+
+def prewarm(frame_sizes: Iterable[int] = (2048,), device: str = 'cpu', dtype: torch.dtype = torch.float32):
+    _cache.prewarm(frame_sizes, device, dtype)
+
+
+def plan_cache() -> PlanCache:
+    return _cache
@@ -0,0 +1,181 @@
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+# int16 <-> float scale shared by both backends, so int16 round trips are lossless
+PCM16_SCALE = 32767.0
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format tag, bits per sample) -> on-disk sample dtype
+MAPPABLE_FORMATS = {
+    (WAVE_FORMAT_PCM, 16): np.dtype('<i2'),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype('<f4'),
+}
+
+
+@dataclass
+class WavInfo:
+    sample_rate: int
+    num_channels: int
+    num_frames: int
+    dtype: np.dtype
+    data_offset: int
+
+
+def read_wav_info(path: str) -> Optional[WavInfo]:
+    """Locate the sample data of an uncompressed WAV; None if it cannot be mapped"""
+    fmt = None
+    with open(path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:] != b'WAVE':
+            return None
+        file_size = os.fstat(f.fileno()).st_size
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            chunk_id, size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                body = f.read(size)
+                tag, channels, rate, _, block_align, bits = struct.unpack('<HHIIHH', body[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    # The sub-format GUID starts with the real format tag
+                    tag = struct.unpack('<H', body[24:26])[0]
+                fmt = (tag, channels, rate, block_align, bits)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    return None
+                tag, channels, rate, block_align, bits = fmt
+                dtype = MAPPABLE_FORMATS.get((tag, bits))
+                if dtype is None or block_align != channels * dtype.itemsize:
+                    return None
+                # Streamed writers leave the size at 0 or 0xFFFFFFFF
+                offset = f.tell()
+                available = file_size - offset
+                if size == 0 or size > available:
+                    size = available
+                return WavInfo(rate, channels, size // block_align, dtype, offset)
+            else:
+                f.seek(size, os.SEEK_CUR)
+            if size % 2:
+                f.seek(1, os.SEEK_CUR)
+
+
+def _wav_header(sample_rate: int, num_channels: int, num_frames: int) -> bytes:
+    block_align = num_channels * 2
+    data_bytes = num_frames * block_align
+    if data_bytes + 36 > 0xFFFFFFFF:
+        raise ValueError(f"{num_frames} frames of {num_channels} channels exceed the 4 GB WAV limit")
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_bytes, b'WAVE',
+        b'fmt ', 16, WAVE_FORMAT_PCM, num_channels, sample_rate, sample_rate * block_align, block_align, 16,
+        b'data', data_bytes,
+    )
+
+
+class MappedWav:
+    """Memory-mapped sample data of an uncompressed WAV file.
+
+    .array is a (frames, channels) NumPy view straight onto the file and
+    frames() returns (channels, frames) tensor views of it, so nothing is
+    copied until a caller converts. Readers get a private copy-on-write
+    mapping; MappedWav.create() opens a shared, writable one. release()
+    drops pages the caller is done with so resident memory stays bounded
+    while walking a file far larger than RAM.
+    """
+
+    def __init__(self, path: str, writable: bool = False):
+        info = read_wav_info(path)
+        if info is None:
+            raise ValueError(f"{path} is not an uncompressed 16-bit PCM or 32-bit float WAV")
+        self.path = path
+        self.sample_rate = info.sample_rate
+        self.num_channels = info.num_channels
+        self.num_frames = info.num_frames
+        self.data_offset = info.data_offset
+        self.frame_bytes = info.num_channels * info.dtype.itemsize
+
+        self._file = open(path, 'r+b' if writable else 'rb')
+        self._mmap: Optional[mmap.mmap] = None
+        if info.num_frames > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_COPY)
+            self.array = np.frombuffer(self._mmap, dtype=info.dtype, count=info.num_frames * info.num_channels,
+                                       offset=info.data_offset).reshape(info.num_frames, info.num_channels)
+        else:
+            self.array = np.empty((0, info.num_channels), dtype=info.dtype)
+        self._tensor = None
+
+    @classmethod
+    def create(cls, path: str, sample_rate: int, num_channels: int, num_frames: int) -> 'MappedWav':
+        """Preallocate a 16-bit PCM WAV of num_frames and map it for writing"""
+        with open(path, 'wb') as f:
+            f.write(_wav_header(sample_rate, num_channels, num_frames))
+            f.truncate(f.tell() + num_frames * num_channels * 2)
+        return cls(path, writable=True)
+
+    @property
+    def tensor(self) -> 'torch.Tensor':
+        """(channels, frames) tensor view of array; torch is only imported on first use"""
+        if self._tensor is None:
+            import torch
+            self._tensor = torch.from_numpy(self.array).t()
+        return self._tensor
+
+    def frames(self, start: int, stop: int) -> 'torch.Tensor':
+        return self.tensor[:, start:stop]
+
+    def _page_range(self, start: int, stop: int):
+        first = self.data_offset + start * self.frame_bytes
+        last = self.data_offset + stop * self.frame_bytes
+        first -= first % mmap.PAGESIZE
+        return first, last - first
+
+    def flush(self, start: int = 0, stop: Optional[int] = None):
+        if self._mmap is not None and not self._mmap.closed:
+            offset, size = self._page_range(start, self.num_frames if stop is None else stop)
+            self._mmap.flush(offset, size)
+
+    def release(self, start: int, stop: int):
+        """Advise the kernel that frames [start, stop) will not be touched again"""
+        if self._mmap is None or not hasattr(mmap, 'MADV_DONTNEED') or stop <= start:
+            return
+        offset, size = self._page_range(start, stop)
+        # Only whole pages below stop; the partial last page may still be in use
+        size -= (offset + size) % mmap.PAGESIZE
+        if size > 0:
+            self._mmap.madvise(mmap.MADV_DONTNEED, offset, size)
+
+    def resize(self, num_frames: int):
+        """Truncate a file made by create() to its first num_frames frames"""
+        self.close()
+        with open(self.path, 'r+b') as f:
+            f.write(_wav_header(self.sample_rate, self.num_channels, num_frames))
+            f.truncate(self.data_offset + num_frames * self.frame_bytes)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.array = self._tensor = None
+        if self._mmap is not None:
+            self._mmap.flush()
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A caller still holds a view; the mapping goes when it does
+                pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,215 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Hashable, List, Optional
+
+import torch
+
+from cpu.echo_engine import EchoEngine
+from cpu.stego_encode import Encode
+from cpu.stego_stream import StreamingFFTEmbedder
+from gpu.config import GPUConfig
+
+
+@dataclass
+class BatchStats:
+    batches: int = 0
+    chunks: int = 0
+    fill: List[float] = field(default_factory=list)
+    queue_delay: List[float] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, float]:
+        delays = sorted(self.queue_delay)
+
+        def percentile_ms(q):
+            return delays[min(len(delays) - 1, int(q * len(delays)))] * 1e3 if delays else 0.0
+
+        return {
+            'batches': self.batches,
+            'chunks': self.chunks,
+            'mean_fill': sum(self.fill) / len(self.fill) if self.fill else 0.0,
+            'queue_delay_p50_ms': percentile_ms(0.50),
+            'queue_delay_p99_ms': percentile_ms(0.99),
+        }
+
+
+@dataclass
+class _Pending:
+    stream_id: Hashable
+    # None for the end-of-stream marker finish() queues
+    cover: Optional[torch.Tensor]
+    secret: Optional[torch.Tensor]
+    future: Future
+    enqueued: float
+
+
+class MicroBatcher:
+    """Batches chunks from many concurrent streams into one embed call.
+
+    Chunks are queued with submit() and a worker thread stacks up to
+    GPUConfig.BATCH_SIZES[method] chunks of the same shape, or whatever has
+    arrived when the oldest one has waited max_latency seconds, runs a single
+    batched embed and resolves each chunk's future with its slice of the
+    result.
+
+    Each stream_id keeps its own streaming state: a StreamingFFTEmbedder
+    for fft, an EchoEngine delay line for echo (lsb needs none). A batch
+    stacks the states of its streams, advances them in one call and splits
+    them back, and holds at most one chunk per stream, so a stream's
+    results concatenated with finish() equal one whole-signal
+    fft_embed/echo_hide of that stream, with no seam at chunk edges. fft
+    results lag by the embedder's lookahead (see StreamingFFTEmbedder).
+    """
+
+    def __init__(self, method: str = 'fft', device: Optional[str] = None, batch_size: Optional[int] = None,
+                 max_latency: float = 0.005, encoder: Optional[Encode] = None):
+        self.method = method
+        self.device = device or GPUConfig.auto_select_device()
+        self.batch_size = batch_size or GPUConfig.BATCH_SIZES[method]
+        self.max_latency = max_latency
+        self.params = dict(GPUConfig.ALGORITHM_PARAMS[method])
+        self.encoder = encoder or Encode(device=self.device)
+        self.stats = BatchStats()
+
+        self._cuda = self.device.startswith('cuda')
+        if self._cuda:
+            torch.backends.cudnn.benchmark = GPUConfig.OPTIMIZATION['cudnn_benchmark']
+            torch.backends.cuda.matmul.allow_tf32 = GPUConfig.OPTIMIZATION['tensor_cores']
+
+        self._streams: Dict[Hashable, object] = {}
+        self._queue: Deque[_Pending] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, stream_id: Hashable, cover: torch.Tensor, secret: torch.Tensor) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.append(_Pending(stream_id, cover, secret, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def finish(self, stream_id: Hashable) -> Future:
+        """End stream_id after its submitted chunks; resolves to its remaining output and drops its state"""
+        return self.submit(stream_id, None, None)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _next_batch(self) -> List[_Pending]:
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return []
+
+            deadline = self._queue[0].enqueued + self.max_latency
+            while len(self._queue) < self.batch_size and not self._closed:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Only chunks shaped like the oldest one, with stackable state, can share a batch; a stream
+            # with an item already taken or left behind waits for the next batch to keep its order
+            key = self._key(self._queue[0])
+            batch, rest, seen = [], deque(), set()
+            while self._queue and len(batch) < self.batch_size:
+                item = self._queue.popleft()
+                if item.stream_id in seen or (item.cover is not None and self._key(item) != key):
+                    rest.append(item)
+                else:
+                    batch.append(item)
+                seen.add(item.stream_id)
+            rest.extend(self._queue)
+            self._queue = rest
+            return batch
+
+    def _key(self, item: _Pending) -> Hashable:
+        if item.cover is None:
+            return None
+        state = self._streams.get(item.stream_id)
+        return item.cover.shape, state.state_key() if isinstance(state, StreamingFFTEmbedder) else None
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            dispatched = time.perf_counter()
+            self.stats.batches += 1
+            self.stats.chunks += len(batch)
+            self.stats.fill.append(len(batch) / self.batch_size)
+            self.stats.queue_delay.extend(dispatched - item.enqueued for item in batch)
+
+            try:
+                results = self._process(batch)
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+            for item, result in zip(batch, results):
+                item.future.set_result(result)
+
+    def _process(self, batch: List[_Pending]) -> List[torch.Tensor]:
+        chunks = [item for item in batch if item.cover is not None]
+        stego = iter(self._embed(chunks) if chunks else ())
+        return [next(stego) if item.cover is not None else self._finish(item.stream_id) for item in batch]
+
+    def _embed(self, chunks: List[_Pending]) -> List[torch.Tensor]:
+        length = chunks[0].cover.shape[-1]
+        covers = torch.stack([item.cover for item in chunks])
+        secrets = torch.stack([self._fit(item.secret, item.cover, length) for item in chunks])
+        if self._cuda and GPUConfig.OPTIMIZATION['memory_pinning'] and covers.device.type == 'cpu':
+            covers, secrets = covers.pin_memory(), secrets.pin_memory()
+        covers = covers.to(self.device, non_blocking=True)
+        secrets = secrets.to(self.device, non_blocking=True)
+
+        with torch.autocast(device_type='cuda', enabled=self._cuda and GPUConfig.AMP_ENABLED):
+            if self.method == 'lsb':
+                return list(self.encoder.lsb_embed(covers, secrets, **self.params).unbind(0))
+            states = [self._state(item.stream_id) for item in chunks]
+            merged = type(states[0]).stack(states)
+            stego = merged.push(covers, secrets) if self.method == 'fft' else merged.hide_chunk(covers, secrets)
+            merged.unstack(states)
+        return list(stego.unbind(0))
+
+    def _state(self, stream_id: Hashable):
+        state = self._streams.get(stream_id)
+        if state is None:
+            if self.method == 'fft':
+                state = StreamingFFTEmbedder(self.encoder.frame_size, self.encoder.hop_length,
+                                             strength=self.params['strength'], device=self.device)
+            else:
+                state = EchoEngine(self.params['delay'], self.params['decay'], self.encoder.sample_rate,
+                                   device=self.device)
+            self._streams[stream_id] = state
+        return state
+
+    def _finish(self, stream_id: Hashable) -> torch.Tensor:
+        state = self._streams.pop(stream_id, None)
+        if isinstance(state, StreamingFFTEmbedder):
+            return state.flush()
+        return torch.zeros(0, device=self.device)
+
+    @staticmethod
+    def _fit(secret: torch.Tensor, cover: torch.Tensor, length: int) -> torch.Tensor:
+        secret = secret.to(cover.dtype)
+        if secret.shape[-1] < length:
+            secret = torch.nn.functional.pad(secret, (0, length - secret.shape[-1]))
+        return secret[..., :length].expand_as(cover)
@@ -5,110 +5,102 @@ import time
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                             QHBoxLayout, QLabel, QPushButton, QComboBox,
                             QProgressBar, QTextEdit, QFileDialog, QMessageBox,
-                            QGroupBox, QSlider, QSpinBox)
+                            QGroupBox, QSlider, QSpinBox, QCheckBox)
 from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QFont, QIcon
-import torch
-import torchaudio
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-from cpu.stego_encode import Encode
-from cpu.stego_decode import Decode
+# torch loads on a background thread after the window is up (see warm_up)
+from cpu.backends import default_device, load_backend
+from cpu.instrument import CancelToken, Cancelled, Instrument
+
+# Cancellation is checked between chunks; 2^16 frames is a few seconds of audio,
+# well under a second of work, so Stop responds quickly at little throughput cost
+CHUNK_FRAMES = 1 << 16
 
 class AudioProcessor(QThread):
     """Background thread for audio processing to keep GUI responsive"""
     progress_updated = pyqtSignal(int)
     status_updated = pyqtSignal(str)
+    metrics_updated = pyqtSignal(dict)
     finished = pyqtSignal(str)
+    cancelled = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, mode, method, input_file, secret_file=None, output_file=None):
+    def __init__(self, mode, method, input_file, secret_file=None, output_file=None, trace_file=None):
         super().__init__()
         self.mode = mode
         self.method = method
         self.input_file = input_file
         self.secret_file = secret_file
         self.output_file = output_file
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.trace_file = trace_file
+        self.device = None
+        self.backend = None
+        self.instrument = None
+        self.cancel = CancelToken()
+
+    def stop(self):
+        """Ask the worker to stop at the next chunk boundary; the partial output is removed"""
+        self.cancel.cancel()
 
     def run(self):
         try:
+            self.device = default_device()
+            self.backend = load_backend('torch')
+            self.instrument = Instrument(self.device, trace=self.trace_file is not None)
             if self.mode == 'encode':
                 self.encode_audio()
             else:
                 self.decode_audio()
+        except Cancelled:
+            self.cancelled.emit(f"Processing stopped; removed the partial {self.output_file}")
         except Exception as e:
             self.error_occurred.emit(str(e))
 
     def encode_audio(self):
-        self.status_updated.emit("Loading cover audio...")
-        self.progress_updated.emit(10)
-
-        cover, sr = torchaudio.load(self.input_file)
-
-        self.status_updated.emit("Loading secret audio...")
-        self.progress_updated.emit(20)
-
-        secret, sr2 = torchaudio.load(self.secret_file)
-
-        if sr2 != sr:
-            self.status_updated.emit("Resampling secret audio...")
-            self.progress_updated.emit(30)
-            secret = torchaudio.functional.resample(secret, sr2, sr)
-
-        self.status_updated.emit("Moving to GPU...")
-        self.progress_updated.emit(40)
+        self.status_updated.emit(f"Encoding using {self.method.upper()} method on {self.device.upper()}...")
+        self.progress_updated.emit(0)
 
-        cover, secret = cover.to(self.device), secret.to(self.device)
-
-        self.status_updated.emit(f"Encoding using {self.method.upper()} method...")
-        self.progress_updated.emit(60)
-
-        steg = Encode(device=self.device)
-
-        if self.method == 'lsb':
-            stego = steg.lsb_embed(cover, secret)
-        elif self.method == 'fft':
-            stego = steg.fft_embed(cover, secret)
-        else:
-            stego = steg.echo_hide(cover, secret)
-
-        self.status_updated.emit("Saving stego audio...")
-        self.progress_updated.emit(80)
-
-        torchaudio.save(self.output_file, stego.cpu(), sr)
+        self.backend.encode_file(
+            self.input_file, self.secret_file, self.output_file,
+            method=self.method, device=self.device, chunk_frames=CHUNK_FRAMES, progress=self.report_chunk,
+            instrument=self.instrument, cancel=self.cancel
+        )
 
         self.progress_updated.emit(100)
+        self.report_timings()
         self.finished.emit(f"Encoding complete! Saved to {self.output_file}")
 
     def decode_audio(self):
-        self.status_updated.emit("Loading stego audio...")
-        self.progress_updated.emit(20)
+        self.status_updated.emit(f"Decoding using {self.method.upper()} method on {self.device.upper()}...")
+        self.progress_updated.emit(0)
 
-        stego, sr = torchaudio.load(self.input_file)
-        stego = stego.to(self.device)
-
-        self.status_updated.emit(f"Decoding using {self.method.upper()} method...")
-        self.progress_updated.emit(60)
-
-        decoder = Decode(device=self.device)
-
-        if self.method == 'lsb':
-            extracted = decoder.decode_lsb(stego)
-        elif self.method == 'fft':
-            extracted = decoder.decode_fft(stego)
-        else:
-            extracted = decoder.decode_echo(stego)
-
-        self.status_updated.emit("Saving extracted audio...")
-        self.progress_updated.emit(80)
-
-        torchaudio.save(self.output_file, extracted.cpu(), sr)
+        self.backend.decode_file(
+            self.input_file, self.output_file,
+            method=self.method, device=self.device, chunk_frames=CHUNK_FRAMES, progress=self.report_chunk,
+            instrument=self.instrument, cancel=self.cancel
+        )
 
         self.progress_updated.emit(100)
+        self.report_timings()
         self.finished.emit(f"Decoding complete! Saved to {self.output_file}")
 
+    def report_chunk(self, done, total):
+        self.progress_updated.emit(int(100 * done / max(total, 1)))
+        self.status_updated.emit(f"Processed chunk {done}/{total}")
+        self.metrics_updated.emit(self.instrument.snapshot())
+
+    def report_timings(self):
+        for line in self.instrument.summary().splitlines():
+            self.status_updated.emit(line.strip())
+        if self.trace_file:
+            self.instrument.save_trace(self.trace_file)
+            self.status_updated.emit(f"Timing trace written to {self.trace_file}")
+
 class MainWindow(QMainWindow):
+    device_ready = pyqtSignal(str)
+
     def __init__(self):
         super().__init__()
         self.init_ui()
@@ -242,12 +234,16 @@ class MainWindow(QMainWindow):
 
         self.progress_bar = QProgressBar()
         self.status_label = QLabel("Ready")
+        self.metrics_label = QLabel("")
+        self.trace_check = QCheckBox("Write a timing trace next to the output (.trace.json)")
         self.log_text = QTextEdit()
         self.log_text.setMaximumHeight(100)
         self.log_text.setReadOnly(True)
 
         progress_layout.addWidget(self.progress_bar)
         progress_layout.addWidget(self.status_label)
+        progress_layout.addWidget(self.metrics_label)
+        progress_layout.addWidget(self.trace_check)
         progress_layout.addWidget(self.log_text)
         progress_group.setLayout(progress_layout)
         layout.addWidget(progress_group)
@@ -268,9 +264,10 @@ class MainWindow(QMainWindow):
         layout.addLayout(control_layout)
 
         # Device info
-        device_label = QLabel(f"Device: {'CUDA' if torch.cuda.is_available() else 'CPU'}")
+        device_label = QLabel("Device: detecting...")
         device_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(device_label)
+        self.device_ready.connect(lambda device: device_label.setText(f"Device: {device.upper()}"))
 
         # Initial state
         self.encode_btn.setChecked(True)
@@ -330,28 +327,34 @@ class MainWindow(QMainWindow):
         # Start processing
         mode = "encode" if self.encode_btn.isChecked() else "decode"
         method = self.method_combo.currentText().lower()
+        output_file = self.output_path.text()
 
         self.processor = AudioProcessor(
             mode=mode,
             method=method,
             input_file=self.input_path.text(),
             secret_file=self.secret_path.text() if mode == "encode" else None,
-            output_file=self.output_path.text()
+            output_file=output_file,
+            trace_file=output_file + ".trace.json" if self.trace_check.isChecked() else None
         )
 
         self.processor.progress_updated.connect(self.update_progress)
         self.processor.status_updated.connect(self.update_status)
+        self.processor.metrics_updated.connect(self.update_metrics)
         self.processor.finished.connect(self.processing_finished)
+        self.processor.cancelled.connect(self.processing_cancelled)
         self.processor.error_occurred.connect(self.processing_error)
+        self.metrics_label.setText("")
 
         self.processor.start()
         self.start_btn.setEnabled(False)
 
     def stop_processing(self):
+        # Cooperative: the worker stops at the next chunk boundary and reports back through cancelled
         if self.processor and self.processor.isRunning():
-            self.processor.terminate()
-            self.start_btn.setEnabled(True)
-            self.update_status("Processing stopped")
+            self.processor.stop()
+            self.stop_btn.setEnabled(False)
+            self.update_status("Stopping at the next chunk boundary...")
 
     def clear_log(self):
         self.log_text.clear()
@@ -363,20 +366,46 @@ class MainWindow(QMainWindow):
         self.status_label.setText(message)
         self.log_text.append(f"{time.strftime('%H:%M:%S')} - {message}")
 
+    def update_metrics(self, metrics):
+        stages = sorted(metrics['stages'].items(), key=lambda item: -item[1]['seconds'])
+        busiest = ", ".join(f"{name} {stage['seconds']:.1f} s" for name, stage in stages[:3])
+        memory = f"peak RSS {metrics['peak_rss_mb']:.0f} MiB"
+        if metrics['peak_device_mb']:
+            memory += f", device {metrics['peak_device_mb']:.0f} MiB"
+        self.metrics_label.setText(
+            f"{metrics['frames_per_s'] / 1e3:.0f} k samples/s ({metrics['realtime_factor']:.1f}x real time) | "
+            f"{memory} | {busiest}")
+
+    def processing_cancelled(self, message):
+        self.start_btn.setEnabled(True)
+        self.stop_btn.setEnabled(True)
+        self.update_status(message)
+
     def processing_finished(self, message):
+        # Stop may have been pressed while the last chunk was being written
         self.start_btn.setEnabled(True)
+        self.stop_btn.setEnabled(True)
         self.update_status("Complete")
         QMessageBox.information(self, "Success", message)
 
     def processing_error(self, error):
         self.start_btn.setEnabled(True)
+        self.stop_btn.setEnabled(True)
         self.update_status("Error occurred")
         QMessageBox.critical(self, "Error", f"Processing failed: {error}")
 
+def warm_up(window):
+    # Import torch, detect the device and build the STFT plans while the window is already usable
+    device = default_device()
+    window.device_ready.emit(device)
+    from cpu.transform_cache import prewarm
+    prewarm(device=device)
+
 def main():
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
+    threading.Thread(target=warm_up, args=(window,), daemon=True).start()
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
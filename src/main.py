@@ -0,0 +1,7 @@
+"""Run the command line from a checkout: python src/main.py encode ... (installed as stegano-cli; see cpu.cli)"""
+import sys
+
+from cpu.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Load-test client for the stego server: N concurrent sessions, per-chunk latency.
+
+    python src/server/load_test.py --sessions 32 --chunks 100 --method fft
+Without --port/--unix an in-process server is started on a free port.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from functools import partial
+from typing import List
+
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from server.stego_server import ERROR, HEADER, StegoServer, pack_chunk
+
+
+async def read_frames(reader: asyncio.StreamReader) -> int:
+    (frames,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if frames == ERROR:
+        raise RuntimeError(json.loads(await reader.readline()).get('error'))
+    return frames
+
+
+async def run_session(connect, method: str, mode: str, chunks: int, chunk_size: int,
+                      sample_rate: int, latencies: List[float]):
+    reader, writer = await connect()
+    writer.write(json.dumps({
+        'mode': mode, 'method': method, 'sample_rate': sample_rate, 'channels': 1
+    }).encode() + b'\n')
+    await writer.drain()
+    reply = json.loads(await reader.readline())
+    if not reply.get('ok'):
+        raise RuntimeError(reply.get('error'))
+
+    cover = torch.randn(1, chunk_size) * 0.1
+    secret = torch.randn(1, chunk_size) * 0.1
+    request = pack_chunk(cover) + (pack_chunk(secret)[HEADER.size:] if mode == 'encode' else b'')
+
+    for _ in range(chunks):
+        start = time.perf_counter()
+        writer.write(request)
+        await writer.drain()
+        frames = await read_frames(reader)
+        await reader.readexactly(frames * 4)
+        latencies.append(time.perf_counter() - start)
+
+    writer.write(HEADER.pack(0))
+    await writer.drain()
+    while True:
+        frames = await read_frames(reader)
+        if frames == 0:
+            break
+        await reader.readexactly(frames * 4)
+    writer.close()
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def load_test(args):
+    server = None
+    if args.unix:
+        connect = partial(asyncio.open_unix_connection, args.unix)
+    else:
+        port = args.port
+        if port is None:
+            server = StegoServer(workers=args.workers, device='cpu')
+            listener = await server.start(port=0)
+            port = listener.sockets[0].getsockname()[1]
+        connect = partial(asyncio.open_connection, args.host, port)
+
+    latencies: List[float] = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(connect, args.method, args.mode, args.chunks, args.chunk_size, args.sample_rate, latencies)
+        for _ in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        await server.close()
+
+    audio_seconds = args.sessions * args.chunks * args.chunk_size / args.sample_rate
+    print(f"{args.sessions} sessions x {args.chunks} chunks of {args.chunk_size} ({args.mode} {args.method})")
+    print(f"  p50 {percentile(latencies, 0.50) * 1e3:.2f} ms  p99 {percentile(latencies, 0.99) * 1e3:.2f} ms"
+          f"  max {max(latencies) * 1e3:.2f} ms")
+    print(f"  {len(latencies) / elapsed:.1f} chunks/s, {audio_seconds / elapsed:.1f}x real time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--unix')
+    parser.add_argument('--workers', type=int, default=4, help="workers for the in-process server")
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--chunks', type=int, default=50)
+    parser.add_argument('--chunk-size', type=int, default=2048)
+    parser.add_argument('--sample-rate', type=int, default=16000)
+    parser.add_argument('--method', default='fft', choices=['lsb', 'fft', 'echo'])
+    parser.add_argument('--mode', default='encode', choices=['encode', 'decode'])
+    asyncio.run(load_test(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Asyncio embedding server: many concurrent stego sessions per process.
+
+Wire protocol (all integers little-endian):
+  client -> server  one JSON line: {"mode": "encode"|"decode", "method": "lsb"|"fft"|"echo",
+                                   "sample_rate": 16000, "channels": 1}
+  server -> client  one JSON line: {"ok": true} or {"ok": false, "error": "..."}
+  client -> server  per chunk: uint32 frames, then frames*channels float32 cover
+                    (frame-major, like interleaved PCM) and, when encoding, the
+                    same amount of secret. frames == 0 ends the stream;
+                    more than the server's max_chunk_frames is an error.
+  server -> client  per chunk: uint32 frames, then frames*channels float32.
+                    Streaming fft/echo sessions may return fewer frames than
+                    they were sent; the remainder follows the final request.
+                    If processing fails the server instead sends uint32
+                    0xFFFFFFFF and one JSON line {"ok": false, "error": "..."},
+                    then closes the session.
+"""
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from cpu.echo_engine import EchoEngine
+from cpu.stego_decode import Decode
+from cpu.stego_encode import Encode
+from cpu.stego_stream import StreamingFFTEmbedder, StreamingFFTExtractor
+
+HEADER = struct.Struct('<I')
+# Chunk header that announces an error line instead of samples
+ERROR = 0xFFFFFFFF
+METHODS = ('lsb', 'fft', 'echo')
+# Largest chunk a client may announce; the server buffers one whole chunk per direction
+DEFAULT_MAX_CHUNK_FRAMES = 1 << 18
+
+
+def pack_chunk(chunk: Optional[torch.Tensor]) -> bytes:
+    if chunk is None or chunk.shape[-1] == 0:
+        return HEADER.pack(0)
+    frames = chunk.t().contiguous().numpy().astype('<f4', copy=False)
+    return HEADER.pack(chunk.shape[-1]) + frames.tobytes()
+
+
+def unpack_chunk(payload: bytes, channels: int) -> torch.Tensor:
+    samples = np.frombuffer(payload, dtype='<f4').reshape(-1, channels)
+    return torch.from_numpy(samples.copy()).t()
+
+
+class Session:
+    """Per-connection embed/extract state, run on the worker pool"""
+
+    def __init__(self, mode: str, method: str, sample_rate: int, channels: int,
+                 encoder: Encode, decoder: Decode, device: str):
+        if mode not in ('encode', 'decode') or method not in METHODS:
+            raise ValueError(f"unsupported mode/method: {mode}/{method}")
+        if channels < 1 or sample_rate < 1:
+            raise ValueError(f"channels and sample_rate must be positive, got {channels} and {sample_rate}")
+        self.mode = mode
+        self.method = method
+        self.channels = channels
+        self.encoder = encoder
+        self.decoder = decoder
+        self.device = device
+        # Both directions carry STFT state across the client's chunks, so chunk edges leave no seam
+        stream = StreamingFFTEmbedder if mode == 'encode' else StreamingFFTExtractor
+        self.fft_stream = stream(encoder.frame_size, encoder.hop_length, device=device)
+        self.echo = EchoEngine(sample_rate=sample_rate, device=device)
+
+    def process(self, cover: torch.Tensor, secret: Optional[torch.Tensor]) -> torch.Tensor:
+        cover = cover.to(self.device)
+        if self.mode == 'encode':
+            secret = secret.to(self.device)
+            if self.method == 'lsb':
+                return self.encoder.lsb_embed(cover, secret).cpu()
+            if self.method == 'fft':
+                return self.fft_stream.push(cover, secret).cpu()
+            return self.echo.hide_chunk(cover, secret).cpu()
+
+        if self.method == 'lsb':
+            return self.decoder.decode_lsb(cover).cpu()
+        if self.method == 'fft':
+            return self.fft_stream.push(cover).cpu()
+        return self.echo.extract_chunk(cover).cpu()
+
+    def flush(self) -> Optional[torch.Tensor]:
+        if self.method == 'fft':
+            return self.fft_stream.flush().cpu()
+        if self.mode == 'decode' and self.method == 'echo':
+            return self.echo.flush_extract().cpu()
+        return None
+
+
+class StegoServer:
+    """Serves sessions over TCP or a Unix socket.
+
+    Encode/Decode work runs on a thread pool so the event loop only moves
+    bytes. At most max_inflight chunks are on the pool at once; sessions
+    waiting for a slot stop reading their sockets, so backpressure reaches
+    clients through TCP flow control instead of unbounded queues. A chunk
+    header above max_chunk_frames ends the session with an error before
+    anything is buffered.
+    """
+
+    def __init__(self, workers: int = 4, max_inflight: Optional[int] = None, device: str = 'cpu',
+                 max_chunk_frames: int = DEFAULT_MAX_CHUNK_FRAMES):
+        self.device = device
+        self.max_chunk_frames = max_chunk_frames
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='stego')
+        self.inflight = asyncio.Semaphore(max_inflight or 2 * workers)
+        self.encoder = Encode(device=device)
+        self.decoder = Decode(device=device)
+        self.sessions = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8765, unix_path: Optional[str] = None):
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self.handle, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self.handle, host, port)
+        return self._server
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.pool.shutdown(wait=True)
+
+    async def _run(self, fn, *args):
+        async with self.inflight:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.sessions += 1
+        try:
+            try:
+                config = json.loads(await reader.readline())
+                session = Session(
+                    config['mode'], config['method'], int(config.get('sample_rate', 16000)),
+                    int(config.get('channels', 1)), self.encoder, self.decoder, self.device
+                )
+            except (ValueError, KeyError, TypeError) as e:
+                writer.write(json.dumps({'ok': False, 'error': str(e)}).encode() + b'\n')
+                await writer.drain()
+                return
+            writer.write(b'{"ok": true}\n')
+            await writer.drain()
+
+            width = 4 * session.channels
+            while True:
+                (frames,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if frames == 0:
+                    tail = await self._run(session.flush)
+                    if tail is not None and tail.shape[-1] > 0:
+                        writer.write(pack_chunk(tail))
+                    writer.write(pack_chunk(None))
+                    await writer.drain()
+                    return
+                if frames > self.max_chunk_frames:
+                    raise ValueError(f"chunk of {frames} frames exceeds the server's {self.max_chunk_frames}")
+
+                cover = unpack_chunk(await reader.readexactly(frames * width), session.channels)
+                secret = None
+                if session.mode == 'encode':
+                    secret = unpack_chunk(await reader.readexactly(frames * width), session.channels)
+
+                result = await self._run(session.process, cover, secret)
+                writer.write(pack_chunk(result))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        except Exception as e:
+            # A failed chunk ends the session, but the client is told why instead of seeing a reset
+            writer.write(HEADER.pack(ERROR) + json.dumps({'ok': False, 'error': str(e)}).encode() + b'\n')
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+
+async def serve(args):
+    server = StegoServer(workers=args.workers, max_inflight=args.max_inflight, device=args.device,
+                         max_chunk_frames=args.max_chunk_frames)
+    await server.start(args.host, args.port, args.unix)
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Stego server listening on {where} with {args.workers} workers")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local asyncio embedding server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="serve on this Unix socket path instead of TCP")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--max-inflight', type=int)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--max-chunk-frames', type=int, default=DEFAULT_MAX_CHUNK_FRAMES,
+                        help="reject chunks announcing more frames than this")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
-from setuptools import setup, find_packages
+from setuptools import find_namespace_packages, setup
+
+# Run from src/: the code imports its packages top-level (cpu.*, gpu.*, ...) and they have no __init__.py.
+# src/main.py is only a checkout shortcut and is not installed; stegano-cli runs cpu.cli.
 
 setup(
     name="rtas",
     version="0.1",
-    packages=find_packages(where="src"),
-    package_dir={"": "src"},
+    packages=find_namespace_packages(include=["cpu", "gpu", "gui", "server"]),
     install_requires=[
         "torch",
         "torchaudio",
@@ -17,7 +19,7 @@ setup(
     ],
     entry_points={
         "console_scripts": [
-            "stegano-cli=main:main",
+            "stegano-cli=cpu.cli:main",
         ],
         "gui_scripts": [
             "stegano-gui=gui.main:main",
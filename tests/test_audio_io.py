@@ -0,0 +1,263 @@
+"""PCM-level building blocks: the int16 LSB engine, byte payload framing and sync, and resampling."""
+import os
+import sys
+import wave
+
+import numpy as np
+import pytest
+import torch
+import torchaudio
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.audio_io import AudioChunkReader
+from cpu.frame_sync import PREAMBLE_BITS, FrameSync, SyncedPayload, bits_to_symbols, symbols_to_bits
+from cpu.lsb_engine import LSBEngine
+from cpu.payload import (HEADER, PayloadError, PayloadReader, bytes_to_symbols, frame, plan_capacity,
+                         symbols_to_bytes, unframe)
+from cpu.resample import ResampledReader, StreamingResampler, resampled_length, resampler_cache
+from cpu.stego_decode import Decode
+from cpu.stego_encode import Encode
+from cpu.stego_file import embed_payload_file, extract_payload_file
+
+MESSAGE = bytes(range(256)) * 3 + b'tail'
+
+
+def pcm_noise(shape, seed: int) -> torch.Tensor:
+    return torch.from_numpy(np.random.default_rng(seed).integers(-32768, 32768, shape, dtype=np.int16))
+
+
+def write_pcm(path, pcm: torch.Tensor, sample_rate: int = 16000) -> str:
+    """(frames, channels) int16 to a WAV"""
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(pcm.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.numpy().tobytes())
+    return str(path)
+
+
+@pytest.mark.parametrize('num_bits', [1, 2, 4, 8])
+def test_lsb_engine_round_trips_bytes_in_place(num_bits):
+    engine = LSBEngine(num_bits, max_samples=4096)
+    pcm = pcm_noise((2048, 2), 0)
+    original = pcm.clone()
+    payload = torch.from_numpy(np.random.default_rng(1).integers(0, 256, 700, dtype=np.uint8))
+
+    written = engine.embed_bytes_(pcm, payload)
+    assert written == min(700, pcm.numel() * num_bits // 8)
+    # Written into the caller's buffer, touching only the low num_bits of each sample
+    assert not torch.equal(pcm, original)
+    assert torch.equal(pcm & ~engine.mask, original & ~engine.mask)
+    assert torch.equal(engine.extract_bytes(pcm, written), payload[:written])
+
+
+def test_lsb_engine_reuses_its_scratch_buffers():
+    engine = LSBEngine(2, max_samples=4096)
+    symbols, packed = engine._symbols.data_ptr(), engine._bytes.data_ptr()
+    for seed in range(3):
+        pcm = pcm_noise(4096, seed)
+        engine.embed_bytes_(pcm, torch.arange(256, dtype=torch.uint8).repeat(4))
+        engine.extract_bytes(pcm)
+    assert (engine._symbols.data_ptr(), engine._bytes.data_ptr()) == (symbols, packed)
+
+
+@pytest.mark.parametrize('num_bits', [1, 2, 4, 8])
+def test_symbols_round_trip_msb_first(num_bits):
+    symbols = bytes_to_symbols(MESSAGE, num_bits)
+    assert len(symbols) == len(MESSAGE) * 8 // num_bits
+    assert symbols.max() < 1 << num_bits
+    # 0xA5 = 10100101
+    assert bytes_to_symbols(b'\xa5', num_bits).tolist() == {
+        1: [1, 0, 1, 0, 0, 1, 0, 1], 2: [2, 2, 1, 1], 4: [10, 5], 8: [165]}[num_bits]
+    assert symbols_to_bytes(symbols, num_bits) == MESSAGE
+
+
+def test_symbols_reject_widths_that_do_not_divide_a_byte():
+    with pytest.raises(ValueError, match='divide 8'):
+        bytes_to_symbols(MESSAGE, 3)
+
+
+def test_unframe_rejects_damaged_frames():
+    framed = frame(MESSAGE)
+    assert unframe(framed) == MESSAGE
+    with pytest.raises(PayloadError, match='magic'):
+        unframe(b'XXXX' + framed[4:])
+    with pytest.raises(PayloadError, match='checksum'):
+        unframe(framed[:-1] + bytes([framed[-1] ^ 1]))
+    with pytest.raises(PayloadError, match='truncated'):
+        unframe(framed[:-1])
+    with pytest.raises(PayloadError, match='header'):
+        unframe(framed[:HEADER.size - 1])
+
+
+@pytest.mark.parametrize('chunk', [1, 3, 7, 1000])
+def test_payload_reader_reassembles_any_chunking(chunk):
+    # Chunks that split bytes leave symbols over for the next push
+    symbols = np.concatenate((bytes_to_symbols(frame(MESSAGE), 2), np.zeros(50, dtype=np.uint8)))
+    reader = PayloadReader(2)
+    for start in range(0, len(symbols), chunk):
+        if reader.push(symbols[start:start + chunk]):
+            break
+    assert reader.done and reader.symbols_needed == 0
+    # Stops as soon as the frame is in, before the trailing carrier
+    assert start < len(symbols) - 50
+    assert reader.result() == MESSAGE
+
+
+def test_payload_reader_reports_bad_magic_once_the_header_is_in():
+    reader = PayloadReader(2)
+    symbols = bytes_to_symbols(b'XXXX' + frame(MESSAGE)[4:], 2)
+    assert not reader.push(symbols[:HEADER.size * 4 - 1])
+    with pytest.raises(PayloadError, match='magic'):
+        reader.push(symbols[HEADER.size * 4 - 1:])
+
+
+def test_plan_capacity():
+    plan = plan_capacity(16000, 2, 16000, 'lsb', {'num_bits': 4})
+    assert plan.bits == 16000 * 2 * 4
+    assert plan.payload_bytes == plan.bits // 8 - HEADER.size
+    assert plan.bits_per_second == 128000
+    assert plan_capacity(1, 1, 16000, 'lsb', {'num_bits': 2}).payload_bytes == 0
+    assert plan_capacity(16000, 2, 16000, 'lsb').bits == 16000 * 2 * 2
+    for method in ('fft', 'echo'):
+        assert plan_capacity(16000, 2, 16000, method).payload_bytes == 0
+    with pytest.raises(ValueError, match='Unknown method'):
+        plan_capacity(16000, 2, 16000, 'dct', {})
+
+
+@pytest.mark.parametrize('num_bits', [1, 2, 4, 8])
+def test_lsb_bytes_round_trip(num_bits):
+    cover = pcm_noise((2, 6000), 0).float() / 32767
+    stego = Encode(device='cpu').lsb_embed_bytes(cover, MESSAGE, num_bits)
+    assert Decode(device='cpu').decode_lsb_bytes(stego, num_bits) == MESSAGE
+    with pytest.raises(ValueError, match='capacity'):
+        Encode(device='cpu').lsb_embed_bytes(cover[:, :100], MESSAGE, num_bits)
+
+
+@pytest.mark.parametrize('chunk_frames', [64, 1000, 1 << 18])
+def test_payload_file_round_trip(tmp_path, chunk_frames):
+    cover = pcm_noise((5000, 2), 0)
+    cover_path = write_pcm(tmp_path / 'cover.wav', cover)
+    payload_path, recovered_path = tmp_path / 'payload.bin', tmp_path / 'recovered.bin'
+    payload_path.write_bytes(MESSAGE)
+    stego_path = str(tmp_path / 'stego.wav')
+
+    assert embed_payload_file(cover_path, str(payload_path), stego_path, 2, chunk_frames=chunk_frames) == len(MESSAGE)
+    with wave.open(stego_path, 'rb') as f:
+        stego = torch.from_numpy(np.frombuffer(bytearray(f.readframes(f.getnframes())), dtype=np.int16).reshape(-1, 2))
+    # Only the low two bits change, and only under the frame
+    assert torch.equal(stego & ~3, cover & ~3)
+    used = -(-len(frame(MESSAGE)) * 4 // 2)
+    assert torch.equal(stego[used:], cover[used:])
+
+    assert extract_payload_file(stego_path, str(recovered_path), 2, chunk_frames=chunk_frames) == len(MESSAGE)
+    assert recovered_path.read_bytes() == MESSAGE
+
+
+def test_payload_file_rejects_oversized_payload(tmp_path):
+    cover_path = write_pcm(tmp_path / 'cover.wav', pcm_noise((100, 1), 0))
+    payload_path = tmp_path / 'payload.bin'
+    payload_path.write_bytes(MESSAGE)
+    with pytest.raises(ValueError, match='at most'):
+        embed_payload_file(cover_path, str(payload_path), str(tmp_path / 'stego.wav'))
+    assert not os.path.exists(tmp_path / 'stego.wav')
+
+
+def synced_stream(data: bytes, repeats: int, num_bits: int = 2, flips=()) -> np.ndarray:
+    """repeats of preamble + frame as symbols, with the given stream bits flipped"""
+    source = SyncedPayload(data, num_bits)
+    bits = symbols_to_bits(source.take(repeats * source.pattern.shape[0]), num_bits)
+    bits[list(flips)] ^= 1
+    return bits_to_symbols(bits, num_bits)
+
+
+def push_chunks(sync: FrameSync, symbols: np.ndarray, chunk: int = 500):
+    payloads, buffered = [], 0
+    for start in range(0, symbols.shape[0], chunk):
+        payloads += sync.push(symbols[start:start + chunk])
+        buffered = max(buffered, sync._bits.shape[0])
+    return payloads, buffered
+
+
+def test_frame_sync_locks_mid_stream():
+    message = MESSAGE[:100]
+    # Join 37 symbols into the first repetition
+    payloads, _ = push_chunks(FrameSync(2), synced_stream(message, 4)[37:])
+    assert payloads == [message] * 3
+
+
+@pytest.mark.parametrize('learned', [False, True])
+def test_frame_sync_recovers_from_a_corrupted_length(learned):
+    message = MESSAGE[:100]
+    repetition = PREAMBLE_BITS + len(frame(message)) * 8
+    # The second-highest length bit asks for a 1 GB frame; the lowest asks for one byte more
+    bit = PREAMBLE_BITS + 32 + (31 if learned else 1)
+    corrupted = repetition * (1 if learned else 0) + bit
+    sync = FrameSync(2, max_payload=1024)
+    payloads, buffered = push_chunks(sync, synced_stream(message, 5, flips=[corrupted]))
+
+    # Only the corrupted repetition is lost: the lock drops at its header and the next preamble restores it
+    assert payloads == [message] * 4
+    assert sync.stats.lost == 1 and sync.stats.locks == 2
+    assert buffered < repetition + 500 * 2
+
+
+def test_frame_sync_follows_a_sender_that_changes_its_payload():
+    first, second = MESSAGE[:100], MESSAGE[:40]
+    sync = FrameSync(2)
+    payloads, _ = push_chunks(sync, np.concatenate((synced_stream(first, 3), synced_stream(second, 4))))
+    # The first frame of the new length drops the lock; the next preamble restores it
+    assert payloads == [first] * 3 + [second] * 3
+    assert sync.stats.lost == 1
+
+
+def test_frame_sync_search_resumes_at_the_buffer_head():
+    message = MESSAGE[:100]
+    sync = FrameSync(2)
+    sync._bits = symbols_to_bits(synced_stream(message, 2), 2)
+    sync.locked = True
+    sync._lose_lock()
+    # The preamble starting at the head is not skipped
+    assert sync.push(np.empty(0, dtype=np.uint8)) == [message] * 2
+
+
+RATE_PAIRS = [(44100, 16000), (16000, 44100), (48000, 16000), (22050, 16000)]
+
+
+@pytest.mark.parametrize('orig_freq, new_freq', RATE_PAIRS)
+@pytest.mark.parametrize('chunk', [1, 97, 4096, 20000])
+def test_streaming_resampler_matches_functional_resample(orig_freq, new_freq, chunk):
+    signal = pcm_noise((2, 20000), 0).float() / 32767
+    expected = torchaudio.functional.resample(signal, orig_freq, new_freq)
+    resampler = StreamingResampler(orig_freq, new_freq)
+    pieces = [resampler.push(signal[:, start:start + chunk]) for start in range(0, signal.shape[-1], chunk)]
+    streamed = torch.cat(pieces + [resampler.flush()], dim=-1)
+    assert streamed.shape == expected.shape == (2, resampled_length(20000, orig_freq, new_freq))
+    torch.testing.assert_close(streamed, expected, rtol=0, atol=1e-5)
+
+
+def test_streaming_resampler_is_reusable_after_flush_and_shares_its_kernel():
+    cache = resampler_cache()
+    signal = pcm_noise((1, 5000), 1).float() / 32767
+    expected = torchaudio.functional.resample(signal, 44100, 16000)
+    first = StreamingResampler(44100, 16000)
+    hits = cache.hits
+    second = StreamingResampler(44100, 16000)
+    assert cache.hits == hits + 1 and second.resampler is first.resampler
+    for _ in range(2):
+        out = torch.cat((first.push(signal), first.flush()), dim=-1)
+        torch.testing.assert_close(out, expected, rtol=0, atol=1e-5)
+
+
+@pytest.mark.parametrize('read_frames', [333, 4096])
+def test_resampled_reader_streams_the_resampled_file(tmp_path, read_frames):
+    pcm = pcm_noise((30000, 2), 2)
+    path = write_pcm(tmp_path / 'secret.wav', pcm, sample_rate=44100)
+    expected = torchaudio.functional.resample(pcm.t().float() / 32767, 44100, 16000)
+
+    with AudioChunkReader(path, 1000) as source:
+        reader = ResampledReader(source, 16000)
+        assert reader.num_frames == expected.shape[-1]
+        chunks = list(iter(lambda: reader.read(read_frames), None))
+    assert all(chunk.shape[-1] == read_frames for chunk in chunks[:-1])
+    torch.testing.assert_close(torch.cat(chunks, dim=-1), expected, rtol=0, atol=1e-5)
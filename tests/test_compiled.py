@@ -0,0 +1,121 @@
+"""Compiled kernels: parity with eager, the per-kernel compile limit and the eager fallback."""
+import os
+import sys
+
+import pytest
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.compiled import KERNELS, KernelCache, compile_available
+from cpu.stego_decode import Decode
+from cpu.stego_encode import Encode
+
+pytestmark = pytest.mark.skipif(not compile_available(), reason="torch.compile is not available")
+
+SAMPLE_RATE = 16000
+
+
+def noise(channels, frames, scale, seed):
+    generator = torch.Generator().manual_seed(seed)
+    return scale * torch.rand(channels, frames, generator=generator) * 2 - scale
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    """A private KernelCache for Encode/Decode(compiled=True), so counts start at zero"""
+    cache = KernelCache()
+    monkeypatch.setattr('cpu.stego_encode.kernel_cache', lambda: cache)
+    monkeypatch.setattr('cpu.stego_decode.kernel_cache', lambda: cache)
+    return cache
+
+
+@pytest.mark.parametrize('method', ['lsb', 'fft', 'echo'])
+def test_compiled_methods_match_eager(fresh_cache, method):
+    cover, secret = noise(2, 8192, 0.5, 0), noise(2, 8192, 0.5, 1)
+    eager_encoder = Encode(device='cpu', sample_rate=SAMPLE_RATE)
+    eager_decoder = Decode(device='cpu', sample_rate=SAMPLE_RATE)
+    encoder = Encode(device='cpu', sample_rate=SAMPLE_RATE, compiled=True)
+    decoder = Decode(device='cpu', sample_rate=SAMPLE_RATE, compiled=True)
+    embed, extract = {
+        'lsb': ('lsb_embed', 'decode_lsb'),
+        'fft': ('fft_embed', 'decode_fft'),
+        'echo': ('echo_hide', 'decode_echo'),
+    }[method]
+
+    with torch.no_grad():
+        expected = getattr(eager_encoder, embed)(cover, secret)
+        stego = getattr(encoder, embed)(cover, secret)
+        torch.testing.assert_close(stego, expected, atol=1e-5, rtol=1e-5)
+        torch.testing.assert_close(getattr(decoder, extract)(stego), getattr(eager_decoder, extract)(expected),
+                                   atol=1e-4, rtol=1e-4)
+
+    assert fresh_cache.misses == 2
+    assert fresh_cache.fallbacks == 0
+
+
+def test_keys_past_max_per_kernel_run_eagerly(monkeypatch):
+    compiled_calls = []
+
+    def fake_compile(fn, **options):
+        def compiled(*args):
+            compiled_calls.append(args[0].shape)
+            return fn(*args)
+        return compiled
+
+    monkeypatch.setattr(torch, 'compile', fake_compile)
+    cache = KernelCache(max_per_kernel=1)
+    small, large = noise(1, 256, 0.5, 0), noise(1, 512, 0.5, 1)
+
+    cache('decode_lsb', small, constants=(2,))
+    cache('decode_lsb', small, constants=(2,))
+    out = cache('decode_lsb', large, constants=(2,))
+
+    assert compiled_calls == [small.shape, small.shape]
+    torch.testing.assert_close(out, KERNELS['decode_lsb'](large, 2))
+    assert (cache.hits, cache.misses, cache.fallbacks, len(cache)) == (1, 1, 0, 1)
+    # The limit is per kernel: another kernel still gets its own compile
+    cache('echo_extract', small, constants=(4, 0.3))
+    assert len(cache) == 2
+
+
+def test_compile_failure_falls_back_to_eager_for_good(monkeypatch):
+    from torch._inductor.exc import CppCompileError
+    attempts = []
+
+    def failing_compile(fn, **options):
+        def compiled(*args):
+            attempts.append(fn)
+            raise CppCompileError(['cc'], 'no toolchain')
+        return compiled
+
+    monkeypatch.setattr(torch, 'compile', failing_compile)
+    cache = KernelCache()
+    cover, secret = noise(1, 256, 0.5, 0), noise(1, 256, 0.5, 1)
+
+    for _ in range(3):
+        out = cache('echo_hide', cover, secret, constants=(4, 0.3, 0.1))
+        torch.testing.assert_close(out, KERNELS['echo_hide'](cover, secret, 4, 0.3, 0.1))
+
+    assert len(attempts) == 1
+    assert cache.fallbacks == 1
+    cache.clear()
+    cache('echo_hide', cover, secret, constants=(4, 0.3, 0.1))
+    assert len(attempts) == 2
+
+
+def test_errors_that_are_not_compile_failures_propagate(monkeypatch):
+    def compile_then_fail(fn, **options):
+        def compiled(*args):
+            raise RuntimeError("out of memory")
+        return compiled
+
+    monkeypatch.setattr(torch, 'compile', compile_then_fail)
+    cache = KernelCache()
+    stego = noise(1, 256, 0.5, 0)
+
+    with pytest.raises(RuntimeError, match="out of memory"):
+        cache('decode_lsb', stego, constants=(2,))
+    assert cache.fallbacks == 0
+    # Not marked broken: the next call goes to the compiled kernel again
+    with pytest.raises(RuntimeError, match="out of memory"):
+        cache('decode_lsb', stego, constants=(2,))
@@ -0,0 +1,367 @@
+"""File-level encode/decode behaviour: chunked processing must match one whole-signal pass."""
+import asyncio
+import json
+import os
+import sys
+import wave
+
+import numpy as np
+import pytest
+import torch
+import torchaudio
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.audio_io import AudioChunkReader
+from cpu.batch import Job, run_batch
+from cpu.echo_engine import EchoEngine
+from cpu.instrument import Cancelled
+from cpu.multichannel import ChannelGatherer, gather, spread
+from cpu.sharding import sharded_decode_file, sharded_encode_file
+from cpu.stego_decode import UNKNOWN, Decode
+from cpu.stego_encode import Encode
+from cpu.stego_file import decode_file, encode_file
+from cpu.stego_stream import StreamingFFTEmbedder, StreamingFFTExtractor
+from cpu import stego_numpy
+from gpu.batching import MicroBatcher
+from gpu.config import GPUConfig
+from server.stego_server import ERROR, HEADER, StegoServer, pack_chunk, unpack_chunk
+
+SAMPLE_RATE = 16000
+# One int16 step of rounding either side of the float reference
+LSB = 1.5 / 32767
+
+EMBED = {'lsb': 'lsb_embed', 'fft': 'fft_embed', 'echo': 'echo_hide'}
+EXTRACT = {'lsb': 'decode_lsb', 'fft': 'decode_fft', 'echo': 'decode_echo'}
+
+
+def write_wav(path, audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> str:
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(audio.shape[0])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes((np.clip(audio, -1, 1).T * 32767).round().astype(np.int16).tobytes())
+    return str(path)
+
+
+def read_wav(path) -> torch.Tensor:
+    with AudioChunkReader(str(path)) as reader:
+        return reader.read(reader.num_frames)
+
+
+def noise(channels: int, frames: int, scale: float, seed: int) -> np.ndarray:
+    return (np.random.default_rng(seed).standard_normal((channels, frames)) * scale).astype(np.float32)
+
+
+@pytest.mark.parametrize('method', ['lsb', 'fft', 'echo'])
+@pytest.mark.parametrize('frames', [3 * 4096, 3 * 4096 + 500, 3 * 4096 + 1])
+def test_chunked_file_matches_whole_signal(tmp_path, method, frames):
+    # The odd lengths leave final chunks shorter than the fft's reflect padding
+    cover_path = write_wav(tmp_path / 'cover.wav', noise(2, frames, 0.1, 0))
+    secret_path = write_wav(tmp_path / 'secret.wav', noise(2, frames, 0.1, 1))
+    stego_path, recovered_path = tmp_path / 'stego.wav', tmp_path / 'recovered.wav'
+
+    assert encode_file(cover_path, secret_path, str(stego_path), method, chunk_frames=4096) == frames
+    cover, secret, stego = read_wav(cover_path), read_wav(secret_path), read_wav(stego_path)
+    whole = getattr(Encode(device='cpu'), EMBED[method])(cover, secret).clamp(-1, 1)
+    assert stego.shape == whole.shape
+    assert (stego - whole).abs().max() <= LSB
+
+    assert decode_file(str(stego_path), str(recovered_path), method, chunk_frames=4096) == frames
+    recovered = read_wav(recovered_path)
+    whole = getattr(Decode(device='cpu'), EXTRACT[method])(stego).clamp(-1, 1)
+    assert recovered.shape == whole.shape
+    assert (recovered - whole).abs().max() <= LSB
+
+
+@pytest.mark.parametrize('method', ['lsb', 'fft', 'echo'])
+def test_sharded_file_matches_whole_signal(tmp_path, method):
+    # Several shards per worker, each only twice its halo, and a last shard that is not a whole hop
+    frames = 5 * 4096 + 300
+    cover_path = write_wav(tmp_path / 'cover.wav', noise(2, frames, 0.1, 0))
+    secret_path = write_wav(tmp_path / 'secret.wav', noise(2, frames, 0.1, 1))
+    stego_path, recovered_path = tmp_path / 'stego.wav', tmp_path / 'recovered.wav'
+
+    assert sharded_encode_file(cover_path, secret_path, str(stego_path), method, workers=2,
+                               shard_frames=4096) == frames
+    stego = read_wav(stego_path)
+    whole = getattr(Encode(device='cpu'), EMBED[method])(read_wav(cover_path), read_wav(secret_path))
+    assert (stego - whole.clamp(-1, 1)).abs().max() <= LSB
+
+    assert sharded_decode_file(str(stego_path), str(recovered_path), method, workers=2, shard_frames=4096) == frames
+    whole = getattr(Decode(device='cpu'), EXTRACT[method])(stego)
+    assert (read_wav(recovered_path) - whole.clamp(-1, 1)).abs().max() <= LSB
+
+
+# Secret phases within float32 rounding of +/-pi wrap to opposite signs in the two FFTs, and fft_embed
+# scales that 2 pi jump by strength, so a few bins of an embed can differ by up to strength * 2 pi rad
+FFT_EMBED_TOLERANCE = 256 / 32767
+
+
+@pytest.mark.parametrize('method', ['lsb', 'fft', 'echo'])
+def test_numpy_backend_matches_torch_backend(tmp_path, method):
+    frames = 5 * 4096 + 300
+    cover_path = write_wav(tmp_path / 'cover.wav', noise(2, frames, 0.1, 0))
+    secret_path = write_wav(tmp_path / 'secret.wav', noise(2, frames, 0.1, 1))
+    paths = {name: str(tmp_path / f'{name}.wav') for name in ('torch', 'numpy', 'torch_out', 'numpy_out')}
+
+    encode_file(cover_path, secret_path, paths['torch'], method, chunk_frames=4096)
+    stego_numpy.encode_file(cover_path, secret_path, paths['numpy'], method, chunk_frames=4096)
+    tolerance = FFT_EMBED_TOLERANCE if method == 'fft' else LSB
+    assert (read_wav(paths['numpy']) - read_wav(paths['torch'])).abs().max() <= tolerance
+
+    # Both decode the same stego, so only the decoders are compared
+    decode_file(paths['torch'], paths['torch_out'], method, chunk_frames=4096)
+    stego_numpy.decode_file(paths['torch'], paths['numpy_out'], method, chunk_frames=4096)
+    assert (read_wav(paths['numpy_out']) - read_wav(paths['torch_out'])).abs().max() <= LSB
+
+
+def test_numpy_echo_defaults_match_gpu_config():
+    echo = GPUConfig.ALGORITHM_PARAMS['echo']
+    assert (stego_numpy.ECHO_DELAY, stego_numpy.ECHO_DECAY) == (echo['delay'], echo['decay'])
+    assert stego_numpy.ECHO_GAIN == EchoEngine().gain
+
+
+def test_spread_then_gather_is_the_identity():
+    secret = torch.randn(1, 3 * 2048 * 3 + 777)
+    lanes = spread(secret, 3, block=2048)
+    assert lanes.shape == (3, 4 * 2048)
+    assert torch.equal(gather(lanes, secret.shape[-1], block=2048), secret)
+    # Chunks of any length, e.g. a lagging decoder's, reassemble to the same stream
+    gatherer = ChannelGatherer(block=2048)
+    pieces = [gatherer.push(part) for part in lanes.split(1500, dim=-1)] + [gatherer.flush()]
+    assert torch.equal(torch.cat(pieces, dim=-1)[:, :secret.shape[-1]], secret)
+
+
+@pytest.mark.parametrize('method', ['lsb', 'echo'])
+def test_spread_channels_file_matches_whole_signal(tmp_path, method):
+    frames = 3 * 4096 + 500
+    cover_path = write_wav(tmp_path / 'cover.wav', noise(2, frames, 0.1, 0))
+    # Twice the cover's length: the two channels carry it between them
+    secret_path = write_wav(tmp_path / 'secret.wav', noise(1, 2 * frames, 0.1, 1))
+    stego_path, recovered_path = tmp_path / 'stego.wav', tmp_path / 'recovered.wav'
+
+    # 3000-frame chunks are rounded up to whole blocks
+    encode_file(cover_path, secret_path, str(stego_path), method, chunk_frames=3000, spread_channels=True)
+    cover, secret, stego = read_wav(cover_path), read_wav(secret_path), read_wav(stego_path)
+    lanes = spread(secret, 2, frames=frames)
+    whole = getattr(Encode(device='cpu'), EMBED[method])(cover, lanes).clamp(-1, 1)
+    assert (stego - whole).abs().max() <= LSB
+
+    decode_file(str(stego_path), str(recovered_path), method, chunk_frames=3000, spread_channels=True)
+    recovered = read_wav(recovered_path)
+    whole = gather(getattr(Decode(device='cpu'), EXTRACT[method])(stego)).clamp(-1, 1)
+    assert recovered.shape[0] == 1 and recovered.shape[-1] >= 2 * frames
+    assert (recovered[:, :2 * frames] - whole[:, :2 * frames]).abs().max() <= LSB
+
+
+def test_fft_rejects_file_shorter_than_one_frame(tmp_path):
+    cover_path = write_wav(tmp_path / 'cover.wav', noise(1, 700, 0.1, 0))
+    with pytest.raises(ValueError, match='too short'):
+        encode_file(cover_path, cover_path, str(tmp_path / 'stego.wav'), 'fft')
+
+
+def test_batch_passes_params_and_resumes_from_its_journal(tmp_path):
+    cover_path = write_wav(tmp_path / 'cover.wav', noise(1, 3 * 4096, 0.1, 0))
+    secret_path = write_wav(tmp_path / 'secret.wav', noise(1, 3 * 4096, 0.1, 1))
+    jobs = [
+        Job(cover_path, str(tmp_path / 'out' / 'lsb.wav'), secret_path, 'lsb', params={'num_bits': 4}),
+        Job(cover_path, str(tmp_path / 'out' / 'echo.wav'), secret_path, 'echo', params={'decay': 0.5}),
+        Job(cover_path, str(tmp_path / 'out' / 'missing.wav'), str(tmp_path / 'missing.wav'), 'fft'),
+    ]
+    journal = str(tmp_path / 'jobs.journal')
+
+    summary = run_batch(jobs, journal, log=None)
+    assert (summary.completed, summary.skipped, summary.failed) == (2, 0, 1)
+    # The failed job leaves nothing behind, not even a partial file
+    assert sorted(os.listdir(tmp_path / 'out')) == ['echo.wav', 'lsb.wav']
+    cover, secret = read_wav(cover_path), read_wav(secret_path)
+    encoder = Encode(device='cpu')
+    assert (read_wav(jobs[0].output) - encoder.lsb_embed(cover, secret, num_bits=4)).abs().max() <= LSB
+    assert (read_wav(jobs[1].output) - encoder.echo_hide(cover, secret, decay=0.5)).abs().max() <= LSB
+
+    # Only the failed job reruns. The journal ends in a torn line, as a crash mid-write leaves it,
+    # which must not swallow the record of the job that now succeeds
+    with open(journal, 'a') as f:
+        f.write('{"id": "')
+    write_wav(tmp_path / 'missing.wav', noise(1, 3 * 4096, 0.1, 2))
+    summary = run_batch(jobs, journal, log=None)
+    assert (summary.completed, summary.skipped, summary.failed) == (1, 2, 0)
+    summary = run_batch(jobs, journal, log=None)
+    assert (summary.completed, summary.skipped, summary.failed) == (0, 3, 0)
+
+    # A finished job whose output has gone is redone
+    os.remove(jobs[0].output)
+    summary = run_batch(jobs, journal, log=None)
+    assert (summary.completed, summary.skipped, summary.failed) == (1, 2, 0)
+
+
+def test_batch_rejects_params_of_another_method():
+    with pytest.raises(ValueError, match='num_bits'):
+        Job('cover.wav', 'out.wav', 'secret.wav', 'fft', params={'num_bits': 4})
+
+
+@pytest.mark.parametrize('failure', [Cancelled, RuntimeError])
+def test_interrupted_encode_leaves_no_output(tmp_path, failure):
+    cover_path = write_wav(tmp_path / 'cover.wav', noise(1, 3 * 4096, 0.1, 0))
+    stego_path = tmp_path / 'stego.wav'
+    stego_path.write_bytes(b'previous run')
+
+    def fail_after_first_chunk(done, total):
+        raise failure('stop')
+
+    with pytest.raises(failure):
+        encode_file(cover_path, cover_path, str(stego_path), 'lsb', chunk_frames=4096,
+                    progress=fail_after_first_chunk)
+    # Neither a short WAV that looks complete nor a leftover partial file; the old output is untouched
+    assert stego_path.read_bytes() == b'previous run'
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['cover.wav', 'stego.wav']
+
+
+CHUNKS = [1, 500, 1024, 3000, 9000, 6475]
+
+
+def stream(pushes, flush):
+    return torch.cat([*pushes, flush()], dim=-1)
+
+
+def test_streaming_fft_matches_whole_signal():
+    torch.manual_seed(0)
+    cover, secret = torch.randn(2, sum(CHUNKS)) * 0.1, torch.randn(2, sum(CHUNKS)) * 0.3
+    encoder, decoder = Encode(device='cpu'), Decode(device='cpu')
+    offsets = np.cumsum([0] + CHUNKS)
+
+    embedder = StreamingFFTEmbedder(device='cpu')
+    stego = stream((embedder.push(cover[:, a:b], secret[:, a:b]) for a, b in zip(offsets, offsets[1:])),
+                   embedder.flush)
+    assert torch.allclose(stego, encoder.fft_embed(cover, secret), atol=1e-6)
+
+    # A precomputed SecretPayload takes the place of the secret chunks
+    payload = encoder.secret_payload(secret)
+    embedder = StreamingFFTEmbedder(device='cpu')
+    from_payload = stream((embedder.push(cover[:, a:b], payload) for a, b in zip(offsets, offsets[1:])),
+                          embedder.flush)
+    assert torch.allclose(from_payload, stego, atol=1e-6)
+
+    extractor = StreamingFFTExtractor(device='cpu')
+    recovered = stream((extractor.push(stego[:, a:b]) for a, b in zip(offsets, offsets[1:])), extractor.flush)
+    assert torch.allclose(recovered, decoder.decode_fft(stego), atol=1e-5)
+
+
+@pytest.mark.parametrize('method', ['lsb', 'fft', 'echo'])
+def test_batched_streams_match_whole_signal(method):
+    torch.manual_seed(0)
+    streams, chunks, size = 3, 5, 1500
+    covers, secrets = torch.randn(streams, 2, chunks * size) * 0.1, torch.randn(streams, 2, chunks * size) * 0.3
+    encoder = Encode(device='cpu')
+
+    with MicroBatcher(method, device='cpu', batch_size=2, encoder=encoder) as batcher:
+        # Submitted all at once, so batches mix streams and a stream's later chunks must wait their turn
+        futures = [[batcher.submit(i, covers[i, :, c * size:(c + 1) * size], secrets[i, :, c * size:(c + 1) * size])
+                    for c in range(chunks)] + [batcher.finish(i)] for i in range(streams)]
+        outputs = [torch.cat([future.result() for future in stream], dim=-1) for stream in futures]
+
+    for i, stego in enumerate(outputs):
+        whole = getattr(encoder, EMBED[method])(covers[i], secrets[i])
+        assert torch.allclose(stego, whole, atol=1e-6)
+
+
+def serve_session(config, chunks, **server_options):
+    """Run one session against an in-process server; returns (reply, output or error message)"""
+    async def session():
+        server = StegoServer(workers=1, **server_options)
+        listener = await server.start(port=0)
+        reader, writer = await asyncio.open_connection('127.0.0.1', listener.sockets[0].getsockname()[1])
+        writer.write(json.dumps(config).encode() + b'\n')
+        reply = json.loads(await reader.readline())
+        output = []
+        if reply['ok']:
+            for chunk in chunks:
+                writer.write(pack_chunk(chunk))
+            writer.write(HEADER.pack(0))
+            # One reply per chunk (possibly empty), then the flushed tail and an empty end-of-stream chunk
+            replies = 0
+            while True:
+                (frames,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+                if frames == ERROR:
+                    output = json.loads(await reader.readline())['error']
+                    break
+                replies += 1
+                if frames == 0 and replies > len(chunks):
+                    output = torch.cat(output, dim=-1)
+                    break
+                output.append(unpack_chunk(await reader.readexactly(frames * 4 * chunk.shape[0]), chunk.shape[0]))
+        writer.close()
+        await server.close()
+        return reply, output
+
+    return asyncio.run(session())
+
+
+def test_server_streams_fft_decode_and_reports_errors():
+    torch.manual_seed(0)
+    stego = torch.randn(2, sum(CHUNKS)) * 0.1
+    offsets = np.cumsum([0] + CHUNKS)
+    config = {'mode': 'decode', 'method': 'fft', 'channels': 2}
+
+    reply, recovered = serve_session(config, [stego[:, a:b] for a, b in zip(offsets, offsets[1:])])
+    assert reply['ok']
+    assert torch.allclose(recovered, Decode(device='cpu').decode_fft(stego), atol=1e-5)
+
+    # Too short for one STFT frame: the flush fails and the client gets an error frame, not a reset
+    reply, error = serve_session(config, [stego[:, :700]])
+    assert reply['ok'] and 'too short' in error
+
+    reply, _ = serve_session({**config, 'channels': 0}, [])
+    assert not reply['ok'] and 'channels' in reply['error']
+
+    # An oversized chunk header is refused before its samples are buffered
+    reply, error = serve_session(config, [stego[:, :2048]], max_chunk_frames=1024)
+    assert reply['ok'] and '2048 frames exceeds' in error
+
+
+def fftconvolve_echo(cover, secret, delay_samples, decay):
+    """The original Encode.echo_hide / Decode.decode_echo, as fftconvolve with a two-tap kernel"""
+    taps = torch.zeros(1, delay_samples + 1)
+    taps[:, 0], taps[:, -1] = 1.0, decay
+    hidden = cover + 0.1 * torchaudio.functional.fftconvolve(secret, taps)[..., :cover.shape[-1]]
+    taps[:, 0], taps[:, -1] = 1.0, -decay
+    extracted = torchaudio.functional.fftconvolve(hidden, taps, mode='same') / (1 + decay)
+    return hidden, extracted
+
+
+@pytest.mark.parametrize('delay', [0.0, 0.001, 0.1])
+def test_echo_engine_matches_fftconvolve(delay):
+    torch.manual_seed(0)
+    cover, secret = torch.randn(2, 20000) * 0.1, torch.randn(2, 20000) * 0.3
+    engine = EchoEngine(delay=delay, decay=0.3, sample_rate=SAMPLE_RATE, device='cpu')
+    hidden, extracted = fftconvolve_echo(cover, secret, engine.delay_samples, 0.3)
+
+    assert torch.allclose(engine.hide(cover, secret), hidden, atol=1e-5)
+    assert torch.allclose(engine.extract(hidden), extracted, atol=1e-5)
+
+    offsets = np.cumsum([0] + CHUNKS[:-1] + [20000 - sum(CHUNKS[:-1])])
+    pairs = list(zip(offsets, offsets[1:]))
+    chunked = torch.cat([engine.hide_chunk(cover[:, a:b], secret[:, a:b]) for a, b in pairs], dim=-1)
+    assert torch.allclose(chunked, hidden, atol=1e-5)
+    chunked = stream((engine.extract_chunk(hidden[:, a:b]) for a, b in pairs), engine.flush_extract)
+    assert torch.allclose(chunked, extracted, atol=1e-5)
+
+
+def test_detect_method_names_lsb_and_echo_and_nothing_else():
+    torch.manual_seed(0)
+    t = torch.arange(4 * SAMPLE_RATE) / SAMPLE_RATE
+    cover = (0.3 * torch.sin(2 * torch.pi * 440 * t) + 0.01 * torch.randn_like(t))[None]
+    cover = torch.round(cover * 32767) / 32767
+    secret = torch.randn_like(cover) * 0.3
+    encoder, decoder = Encode(device='cpu'), Decode(device='cpu')
+
+    def detect(audio):
+        return decoder.detect_method(torch.round(audio.clamp(-1, 1) * 32767) / 32767)[:2]
+
+    assert detect(cover) == (UNKNOWN, 0.0)
+    # Phase embedding has no blind signature, so it must not be confused with a clean cover's score
+    assert detect(encoder.fft_embed(cover, secret)) == (UNKNOWN, 0.0)
+    method, confidence = detect(encoder.lsb_embed(cover, secret))
+    assert method == 'lsb' and confidence > 0.9
+    method, confidence = detect(encoder.echo_hide(cover, secret))
+    assert method == 'echo' and confidence > 0.9
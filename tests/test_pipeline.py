@@ -0,0 +1,195 @@
+"""Real-time path: ring buffers, overrun and drop accounting, latency mapping and deterministic replay."""
+import os
+import sys
+import threading
+
+import pytest
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu import pipeline, replay as replay_module
+from cpu.audio_io import FileSource, NullSink, SimulatedClock
+from cpu.pipeline import RealTimePipeline, RingBuffer
+from cpu.replay import replay, replay_method
+
+CHUNK = 100
+
+
+class ListSink:
+    def __init__(self, gate: threading.Event = None):
+        self.blocks = []
+        self.gate = gate
+        self.closed = False
+
+    def write(self, block: torch.Tensor):
+        if self.gate is not None:
+            self.gate.wait()
+        self.blocks.append(block.clone())
+
+    def close(self):
+        self.closed = True
+
+    @property
+    def output(self) -> torch.Tensor:
+        return torch.cat(self.blocks, dim=-1) if self.blocks else torch.zeros(1, 0)
+
+
+def ramp(chunks: int, channels: int = 1):
+    signal = torch.arange(chunks * CHUNK, dtype=torch.float32).repeat(channels, 1)
+    return signal, list(signal.split(CHUNK, dim=-1))
+
+
+def paced(chunks, processed: threading.Semaphore):
+    """Yield each chunk once the previous one has been processed, like a device that never outruns the embedder"""
+    for index, chunk in enumerate(chunks):
+        if index:
+            processed.acquire()
+        yield chunk
+
+
+def pacing_process(processed: threading.Semaphore):
+    def process(block):
+        processed.release()
+        return block * 2
+    return process
+
+
+def test_ring_buffer_wraps_around():
+    ring = RingBuffer(2, 8)
+    out = torch.empty(2, 6)
+    first = torch.arange(10, dtype=torch.float32).reshape(2, 5)
+    assert ring.write(first) and ring.read(out[:, :5]) == 5
+    assert torch.equal(out[:, :5], first)
+    # Starts at slot 5, so 3 samples land at the end and 3 at the front
+    second = torch.arange(12, dtype=torch.float32).reshape(2, 6) + 100
+    assert ring.write(second) and ring.depth == 6
+    assert ring.read(out) == 6
+    assert torch.equal(out, second)
+    assert ring.max_depth == 6 and ring.overruns == 0
+
+
+def test_ring_buffer_counts_overruns_and_underruns_and_drains_when_closed():
+    ring = RingBuffer(1, 8)
+    assert ring.write(torch.ones(1, 6))
+    assert not ring.write(torch.ones(1, 3))
+    assert ring.overruns == 1 and ring.depth == 6
+
+    out = torch.empty(1, 8)
+    assert ring.read(out, timeout=0.01) == 0
+    assert ring.underruns == 1
+    ring.close()
+    assert ring.read(out) == 6
+    assert ring.read(out) == 0
+
+
+def test_pipeline_plays_every_frame_in_order():
+    signal, chunks = ramp(10, channels=2)
+    sink, processed = ListSink(), threading.Semaphore(0)
+    stats = RealTimePipeline(paced(chunks, processed), pacing_process(processed), sink, channels=2,
+                             chunk_frames=CHUNK).run()
+    assert torch.equal(sink.output, signal * 2)
+    assert sink.closed
+    assert stats.chunks == 10 and stats.overruns == 0 and stats.dropped_frames == 0
+    assert len(stats.latencies) == 10
+
+
+def test_pipeline_counts_capture_overruns():
+    # Embedding stalls on its first block until every chunk has been captured into a two-chunk ring
+    captured = threading.Event()
+
+    def source():
+        yield from ramp(10)[1]
+        captured.set()
+
+    def process(block):
+        captured.wait()
+        return block.clone()
+
+    sink = ListSink()
+    stats = RealTimePipeline(source(), process, sink, chunk_frames=CHUNK, ring_chunks=2).run()
+    assert stats.capture_overruns > 0
+    assert stats.chunks + stats.capture_overruns == 10
+    # The small playback ring may drop some of the burst that follows too
+    assert sink.output.shape[-1] + stats.dropped_frames == stats.chunks * CHUNK
+
+
+def test_pipeline_counts_dropped_output():
+    # Playback stalls on its first block until embedding is done, so the two-chunk playback ring overflows
+    embedded, processed = threading.Event(), threading.Semaphore(0)
+    sink = ListSink(gate=embedded)
+    stats = RealTimePipeline(paced(ramp(10)[1], processed), pacing_process(processed), sink, chunk_frames=CHUNK,
+                             ring_chunks=2, finish=embedded.set).run()
+    assert stats.chunks == 10 and stats.capture_overruns == 0
+    assert stats.playback_overruns > 0
+    assert stats.dropped_frames == stats.playback_overruns * CHUNK
+    assert sink.output.shape[-1] + stats.dropped_frames == 10 * CHUNK
+
+
+def test_pipeline_raises_errors_from_process():
+    def process(block):
+        raise RuntimeError('embed failed')
+
+    sink = ListSink()
+    with pytest.raises(RuntimeError, match='embed failed'):
+        RealTimePipeline(ramp(3)[1], process, sink, chunk_frames=CHUNK).run()
+    assert sink.closed
+
+
+def test_latency_maps_played_frames_back_through_dropped_output(monkeypatch):
+    pipe = RealTimePipeline([], lambda block: block, ListSink(), chunk_frames=CHUNK, sample_rate=1000, ring_chunks=1)
+    # Three 100-frame capture blocks delivered at 1.0, 1.1 and 1.2 s
+    pipe._captured.extend([(100, 1.0), (200, 1.1), (300, 1.2)])
+    block = torch.empty(1, CHUNK)
+
+    pipe._emit(torch.zeros(1, CHUNK))
+    pipe._emit(torch.zeros(1, CHUNK))
+    assert pipe.stats.dropped_frames == CHUNK
+    pipe.playback_ring.read(block)
+    pipe._emit(torch.zeros(1, CHUNK))
+
+    monkeypatch.setattr(pipeline.time, 'perf_counter', lambda: 2.0)
+    pipe._record_latency(CHUNK)
+    pipe._record_latency(CHUNK)
+    # Output frame 0 embeds input frame 0, which arrived at 0.9 s; the second played block is output
+    # frame 200, since 100-199 were dropped, and input frame 200 arrived at 1.1 s
+    assert pipe.stats.latencies == pytest.approx([1.1, 0.9])
+
+
+def test_simulated_replay_counts_deadline_misses(monkeypatch):
+    # Processing cost is scripted on a fake perf_counter, so the simulated schedule is exact
+    now = [0.0]
+    monkeypatch.setattr(replay_module.time, 'perf_counter', lambda: now[0])
+    costs = iter([0.01, 0.15, 0.01, 0.01, 0.01])
+
+    def process(chunk):
+        now[0] += next(costs)
+        return chunk
+
+    clock = SimulatedClock()
+    source = FileSource(torch.zeros(2, 480), CHUNK, sample_rate=1000, clock=clock)
+    sink = NullSink()
+    stats = replay(source, process, sink, clock, method='copy', finish=lambda: torch.zeros(2, 30))
+
+    assert stats.chunks == 5 and stats.period == pytest.approx(0.1)
+    # Chunk 2 arrives at 0.2 s and finishes at 0.35 s, past its 0.3 s deadline; chunk 3 catches up
+    assert stats.deadline_misses == 1
+    assert stats.lateness == pytest.approx([-0.09, 0.05, -0.04, -0.09, -0.09])
+    assert stats.intervals == pytest.approx([0.24, 0.01, 0.05, 0.10])
+    assert (sink.chunks, sink.frames) == (6, 480 + 30)
+    assert '1 deadline misses' in stats.summary()
+
+
+@pytest.mark.parametrize('method', ['lsb', 'fft', 'echo'])
+def test_replay_method_plays_the_whole_cover(method):
+    cover, secret = torch.randn(1, 8000) * 0.1, torch.randn(1, 8000) * 0.1
+    sink = NullSink()
+    stats = replay_method(method, cover, secret, chunk_frames=1024, sink=sink)
+    assert stats.chunks == 8 and sink.frames == 8000
+
+
+def test_replay_method_rejects_bytes_for_waveform_methods():
+    cover = torch.randn(1, 8000) * 0.1
+    assert replay_method('lsb', cover, b'message', chunk_frames=1024).chunks == 8
+    for method in ('fft', 'echo'):
+        with pytest.raises(ValueError, match='byte payload'):
+            replay_method(method, cover, b'message')
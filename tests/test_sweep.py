@@ -0,0 +1,133 @@
+"""Parameter sweep: mergeable metrics, the Pareto frontier and an end-to-end sweep on a generated WAV."""
+import os
+import sys
+import wave
+
+import numpy as np
+import pytest
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.audio_io import AudioChunkReader, float_to_pcm16, pcm16_to_float
+from cpu.metrics import StreamingCorrelation, StreamingSNR, payload_accuracy, snr_db
+from cpu.stego_decode import Decode
+from cpu.stego_encode import Encode
+from cpu.sweep import SweepPoint, pareto_frontier, sweep
+
+SAMPLE_RATE = 16000
+
+
+def test_streaming_snr_merge_equals_one_pass():
+    torch.manual_seed(0)
+    reference = torch.randn(2, 6400)
+    test = reference + torch.randn(3, 2, 6400) * torch.tensor([0.01, 0.1, 1.0]).view(3, 1, 1)
+    whole = StreamingSNR(3)
+    whole.update(reference, test)
+
+    # Split on a segment boundary, in uneven chunks, as two files would be
+    first, second = StreamingSNR(3), StreamingSNR(3)
+    for a, b in ((0, 1000), (1000, 3200)):
+        first.update(reference[:, a:b], test[..., a:b])
+    for a, b in ((3200, 3201), (3201, 6400)):
+        second.update(reference[:, a:b], test[..., a:b])
+    first.merge(second)
+
+    assert first.segments == whole.segments == 2 * 6400 // 320
+    assert torch.allclose(first.snr_db(), whole.snr_db())
+    assert torch.allclose(first.seg_snr_db(), whole.seg_snr_db())
+    assert first.snr_db()[1].item() == pytest.approx(snr_db(reference, test[1]), abs=1e-4)
+
+
+def test_streaming_correlation_merge_equals_one_pass():
+    torch.manual_seed(1)
+    secret = torch.randn(2, 5000)
+    recovered = secret + torch.randn(2, 2, 5000) * torch.tensor([0.5, 3.0]).view(2, 1, 1)
+    whole = StreamingCorrelation(2)
+    whole.update(secret, recovered)
+    first, second = StreamingCorrelation(2), StreamingCorrelation(2)
+    first.update(secret[:, :1234], recovered[..., :1234])
+    second.update(secret[:, 1234:], recovered[..., 1234:])
+    first.merge(second)
+
+    assert first.count == whole.count
+    assert torch.allclose(first.value(), whole.value())
+    for point in range(2):
+        assert first.value()[point].item() == pytest.approx(payload_accuracy(secret, recovered[point]), abs=1e-9)
+    # Anti-correlated output is floored at 0, like payload_accuracy
+    negative = StreamingCorrelation(1)
+    negative.update(secret, -secret.unsqueeze(0))
+    assert negative.value().item() == 0.0
+
+
+def point(method, capacity, seg_snr, snr=None, name=''):
+    return SweepPoint(method, {'name': name}, snr if snr is not None else seg_snr, seg_snr, 1.0, capacity, 1.0)
+
+
+def test_pareto_frontier_keeps_only_undominated_points():
+    best_low = point('lsb', 10, 30, name='best_low')
+    dominated = point('lsb', 8, 25, name='dominated')
+    high = point('lsb', 40, 20, name='high')
+    same_capacity_worse = point('lsb', 40, 15, name='same_capacity_worse')
+    twin = point('lsb', 40, 20, name='twin')
+    # Same capacity and segSNR as best_low, broken by plain SNR
+    tie_broken = point('lsb', 10, 30, snr=45, name='tie_broken')
+    # Less capacity for the same quality is dominated
+    same_quality_less = point('lsb', 5, 30, name='same_quality_less')
+    other = point('fft', 1, 5, name='other')
+    points = [best_low, dominated, high, same_capacity_worse, twin, tie_broken, same_quality_less, other]
+
+    frontier = pareto_frontier(points)
+    assert [p.params['name'] for p in frontier['lsb']] == ['tie_broken', 'high']
+    assert frontier['fft'] == [other]
+    assert {p.params['name'] for p in points if p.pareto} == {'tie_broken', 'high', 'other'}
+
+    by_snr = pareto_frontier(points, quality='snr_db')
+    assert [p.params['name'] for p in by_snr['lsb']] == ['tie_broken', 'high']
+
+
+def write_noise(path, frames: int, channels: int = 2) -> str:
+    audio = (np.random.default_rng(0).standard_normal((frames, channels)) * 3000).astype(np.int16)
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(audio.tobytes())
+    return str(path)
+
+
+def test_sweep_scores_match_the_whole_signal_encode_and_decode(tmp_path):
+    # A short final chunk, which must be scored and counted too
+    frames, chunk_frames = 3 * 4096 + 700, 4096
+    path = write_noise(tmp_path / 'cover.wav', frames)
+    grid = {'lsb': {'num_bits': [1, 4]}, 'fft': {'strength': [0.01, 0.1]}, 'echo': {'delay': [0.05], 'decay': [0.3]}}
+    results = sweep([path], grid, chunk_frames=chunk_frames, seed=7)
+    assert [(p.method, p.params) for p in results] == [
+        ('lsb', {'num_bits': 1}), ('lsb', {'num_bits': 4}),
+        ('fft', {'strength': 0.01}), ('fft', {'strength': 0.1}), ('echo', {'delay': 0.05, 'decay': 0.3})]
+    assert all(p.seconds == pytest.approx(frames / SAMPLE_RATE) for p in results)
+
+    # int16 round trips are lossless, so lsb recovers every bit at its raw rate
+    for p in results[:2]:
+        assert p.accuracy == 1.0
+        assert p.capacity_bps == pytest.approx(2 * SAMPLE_RATE * p.params['num_bits'])
+
+    # The fft points are what one whole-signal Encode/Decode pass gives: no chunk seams, nothing dropped
+    with AudioChunkReader(path) as reader:
+        cover = reader.read(reader.num_frames)
+    generator = torch.Generator().manual_seed(7)
+    secret = torch.cat([0.3 * torch.randn(2, min(chunk_frames, frames - start), generator=generator)
+                        for start in range(0, frames, chunk_frames)], dim=-1)
+    for p in results[2:4]:
+        strength = p.params['strength']
+        stego = pcm16_to_float(float_to_pcm16(Encode(device='cpu').fft_embed(cover, secret, strength)))
+        recovered = Decode(device='cpu').decode_fft(stego, strength)
+        assert p.snr_db == pytest.approx(snr_db(cover, stego), abs=0.01)
+        assert p.accuracy == pytest.approx(payload_accuracy(secret, recovered), abs=1e-4)
+
+
+def test_sweep_rejects_unknown_methods_and_missing_files(tmp_path):
+    path = write_noise(tmp_path / 'cover.wav', 4096)
+    with pytest.raises(ValueError, match='Unknown method'):
+        sweep([path], {'dct': {'strength': [0.1]}})
+    with pytest.raises(FileNotFoundError):
+        sweep([str(tmp_path / 'missing.wav')], {'lsb': {'num_bits': [2]}})
@@ -0,0 +1,60 @@
+"""STFT plan cache: sharing, LRU eviction, counters and prewarming."""
+import os
+import sys
+
+import pytest
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+from cpu.transform_cache import PlanCache, get_plan, plan_cache, prewarm
+
+
+def test_same_key_returns_the_same_plan():
+    cache = PlanCache()
+    plan = cache.get(512)
+    # hop_length defaults to frame_size // 4, so both spell the same key
+    assert cache.get(512, 128) is plan
+    assert cache.get(512, 256) is not plan
+    assert cache.get(512, window='hamming') is not plan
+    assert (cache.hits, cache.misses, len(cache)) == (1, 3, 3)
+
+
+def test_least_recently_used_plan_is_evicted_at_max_plans():
+    cache = PlanCache(max_plans=2)
+    first, second = cache.get(256), cache.get(512)
+    assert cache.get(256) is first
+    cache.get(1024)
+    assert len(cache) == 2
+    # 512 was the least recently used, so it is rebuilt; 256 survived
+    assert cache.get(256) is first
+    assert cache.get(512) is not second
+    assert (cache.hits, cache.misses) == (2, 4)
+
+    cache.clear()
+    assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
+
+
+def test_plan_round_trips_a_signal():
+    plan = PlanCache().get(512)
+    signal = torch.randn(2, 4000)
+    restored = plan.inverse_spectrogram(plan.spectrogram(signal), length=signal.shape[-1])
+    assert torch.allclose(restored, signal, atol=1e-5)
+
+
+def test_unknown_window_is_rejected_and_not_cached():
+    cache = PlanCache()
+    with pytest.raises(ValueError, match='Unknown window'):
+        cache.get(512, window='kaiser')
+    assert len(cache) == 0
+
+
+def test_prewarm_fills_the_process_cache():
+    cache = plan_cache()
+    cache.clear()
+    prewarm((384, 768))
+    assert len(cache) == 2 and cache.misses == 2
+    assert get_plan(384).warm and get_plan(768).warm
+    assert cache.hits == 2
+    # Warm plans are not run again
+    prewarm((384,))
+    assert cache.misses == 2